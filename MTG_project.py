@@ -26,23 +26,23 @@
 # ## Libraries
 
 # %%
-import requests
-import re
-from bs4 import BeautifulSoup
 from pathlib import Path
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
-import datetime
-import seaborn as sns
 from statistics import mean
-import scipy.stats as ss
 import os
+from mtg.scraping import scrape_incremental
+from mtg.cache import ResponseCache
+from mtg.storage import load_csv_table
+from mtg.cleaning import apply_corrections, coalesce_lands, drop_events, load_corrections
+from mtg.datasets import load_clean, save_clean
+from mtg import plots, resampling, stats
 
 # %% [markdown]
 # ## Data set
 # 
-# To collect the data we need, we scrape the webpage [www.mtgtop8.com](https://www.mtgtop8.com/) and we save the outcome in a csv file called `raw_magic.csv`.
+# To collect the data we need, we scrape the webpage [www.mtgtop8.com](https://www.mtgtop8.com/) (downloading the pages concurrently) and we save the outcome in a csv file called `raw_magic.csv`. When the file already exists, it is used as it is; with `update = True`, only the years and the decks it does not contain yet are scraped and appended to it.
 
 # %%
 folder = os.getcwd()
@@ -50,97 +50,25 @@ data_dir = Path(folder, "data")
 Path(data_dir).mkdir(parents=True, exist_ok=True)
 data_file = Path(data_dir, "raw_magic.csv")
 
-if not data_file.exists() :
-    print(f"{data_file} does not exists. Creating it...")
-
-    players = pd.DataFrame(columns = ["Deck", "Player", "Format", "Event", "Level", "Rank", "Date"])
-    decks = pd.DataFrame()
-
-    for year in range(1994,2023,1) :
-        # we skip year 2023 because there are decks with empty name field and
-        # the command < data = row.text.strip().split("\n\t\t  ") >
-        # produces a list which is shorter than the others,
-        # running into the error
-        # < ValueError: cannot set a row with mismatched columns >
-        print(f"I am scraping year {year}")
-
-        my_status = 200
-        deck_rows = ["some rows..."]
-        page = 1
-
-        while my_status == 200 and deck_rows != [] :
-            # gets the content of the page corresponding to
-            # searching with the parameters given below
-            url = "https://www.mtgtop8.com/"
-            parameters = {"current_page" : f"{page}", 
-                        "event_titre" : "world",
-                        "format" : "ST",
-                        "compet_check[P]" : "1",
-                        "date_start" : f"01/01/{year}",
-                        "date_end" : f"31/12/{year}"}
-            response = requests.get(url + "search", params = parameters)
-            my_status = response.status_code
-
-            if my_status == 200 :
-
-                soup = BeautifulSoup(response.text, "html5lib")
-
-                deck_rows = soup.find_all("tr", class_ = "hover_tr")
-
-                if deck_rows == [] :
-                    print(f"Finished with year {year}. Moving to the next...")
-
-                else :
-                    # extract the table on the given page
-                    # and concatenates it to the "players"
-                    for row in deck_rows :
-                        data = row.text.strip().split("\n\t\t  ")
-                        players.loc[len(players)] = data
-
-                    # extracts the links to the decks on the given page
-                    deck_links = soup.find_all("a", href = re.compile(".*&d=.*"))
-
-                    # for each link, it scrapes the info about the deck
-                    # and concatenats it to the "decks"
-                    deck_cards = []
-
-                    for link in deck_links :
-                        print(f"I am scraping year {year}, deck : {link.text}")
-                        new_deck_url = url + link["href"]
-                        response_new_deck = requests.get(new_deck_url)
-                        soup_new_deck = BeautifulSoup(response_new_deck.text, "html5lib")
-                        details_new_deck = soup_new_deck.find_all("div", class_ = "O14")
-                        new_deck = {}
-                        for elem in details_new_deck :
-                            text_string = elem.text
-                            text_string_list = text_string.split()
-                            name = ""
-                            value = 0
-                            for text in text_string_list :
-                                if text.isdigit() :
-                                    value = int(text)
-                                else :
-                                    name = name + text + "_"
-                            new_deck[f"{name.strip("_")}"] = value
-
-                        deck_cards.append(pd.DataFrame(new_deck, index = [0]))
-                
-                    deck_cards = pd.concat(deck_cards, ignore_index=True)
-                    decks = pd.concat([decks, deck_cards], ignore_index=True)
-
-                    page += 1
-
-            else :
-                print(f"Status code page {page} or year {year} : {my_status}.")
-
-    df = pd.concat([players,decks], axis=1)
-    df.to_csv("data/raw_magic.csv", index=False)
-    print("File created.")
-
-else :
-    print("File already existing. Scraping skipped.")
-
-df = pd.read_csv(data_file)
+# we stop at 2022, the last year whose ranks we checked by hand (see the
+# corrections below). The rows of the search pages are read cell by cell and
+# matched to their deck by its id (see mtg/parsing.py), so the decks with an
+# empty name field of 2023 no longer shift the columns of the table.
+# The search pages of all the years and the deck pages they link to
+# are downloaded concurrently. The downloaded pages are kept in
+# data/http_cache, so that a rebuild (or a change in the parsing,
+# with offline = True) does not need to download them again.
+# Only the years (and the decks) which are not yet in the file are scraped:
+# the ones already ingested are listed in data/raw_magic.manifest.json.
+# An existing file is used as it is, unless update is True.
+update = False
+if update or not data_file.exists() :
+    cache = ResponseCache(Path(data_dir, "http_cache"))
+    scrape_incremental(data_file, range(1994,2023,1), cache = cache)
+
+# the csv is loaded through a typed columnar copy (see mtg/storage.py),
+# rebuilt only when the csv changes
+df = load_csv_table(data_file, Path(data_dir, "store", "raw_magic"))
 
 # %% [markdown]
 # ## Data cleaning
@@ -151,7 +79,6 @@ df.head()
 # %%
 data = df.copy()
 data = data.drop(labels = ["Level","SIDEBOARD",'Format'], axis = 1)
-data["Date"] = data["Date"].apply(lambda date : datetime.datetime.strptime(date, "%d/%m/%y"))
 print("\n".join(data.Event.unique()))
 
 # %% [markdown]
@@ -174,9 +101,7 @@ print("\n".join(data.Event.unique()))
 # We are only interested in the Top 8.
 
 # %%
-data = data[~data['Event'].str.contains('Cup')]
-data = data[~data['Event'].str.contains('Undefeated')]
-data = data[~data['Event'].str.contains('15 points')]
+data = drop_events(data, ['Cup', 'Undefeated', '15 points'])
 print("\n".join(data.Event.unique()))
 
 # %% [markdown]
@@ -231,12 +156,21 @@ for date in data[data['Rank'] == 'Other'].Date.unique() :
 # - *Japan Yuuya Watanabe (Pro Point leader Japan)*
 # - *Japan Kentaro Yamamoto (8th most Pro Points of otherwise unqualified)*
 
+# %% [markdown]
+# Moreover, in many years the 3rd and the 4th places are both reported as `3-4`:
+
 # %%
-data.loc[data['Date'].dt.year == 2014,'Rank'] = np.NaN
-data.loc[(data['Date'].dt.year == 2014) & (data['Player'] == 'Shahar Shenhar'),'Rank'] = '1'
-data.loc[(data['Date'].dt.year == 2014) & (data['Player'] == 'Patrick Chapin'),'Rank'] = '2'
-data.loc[(data['Date'].dt.year == 2014) & (data['Player'] == 'Yuuya Watanabe'),'Rank'] = '3'
-data.loc[(data['Date'].dt.year == 2014) & (data['Player'] == 'Kentaro Yamamoto'),'Rank'] = '4'
+data[data['Rank'] == '3-4'].Date.dt.year.value_counts().sort_index()
+
+# %% [markdown]
+# We fix them by hands checking on [Wikipedia 13/05/2024](https://en.wikipedia.org/w/index.php?title=Magic:_The_Gathering_World_Championship&oldid=1214619541) (and we also correct two typos in the player names).
+# 
+# All these corrections are collected in the table `data/rank_corrections.csv`, keyed by year and player, which we join to the data in a single operation (see `mtg/cleaning.py`). Ranks are only corrected among the top 4, except in 2014, where all the ranks but the corrected ones are discarded.
+
+# %%
+corrections = load_corrections(Path(data_dir, "rank_corrections.csv"))
+data = apply_corrections(data, corrections, reset_years = [2014])
+corrections
 
 # %% [markdown]
 # We can now proceed to select only the observations of interest:
@@ -255,40 +189,13 @@ print(", ".join(data.columns))
 # 
 
 # %%
-lands_columns = [col for col in data.columns if "LANDS" in col]
-
-for i in data.index :
-    for col in lands_columns :
-        if not pd.isna(data.loc[i,col]) : 
-            data.loc[i,"Lands"] = data.loc[i,col]
-
-data = data.drop(labels = lands_columns, axis = 1)
-data = data.rename(columns = {"CREATURES" : "Creatures",
-                          "INSTANTS_and_SORC." : "Instants_Sorceries", 
-                          "OTHER_SPELLS" : "Other_spells"})
+data = coalesce_lands(data)
 
 # %% [markdown]
 # Commenting the previous Python script and uncommenting the underlying Python script will consider them as lands.
 
 # %%
-# for i in data.index :
-#     if not pd.isna(data.loc[i,'LANDS_(26)']) :
-#         data.loc[i,"Lands"] = 26
-#     elif not pd.isna(data.loc[i,'LANDS_(27)']) :
-#         data.loc[i,"Lands"] = 27
-#     elif not pd.isna(data.loc[i,'LANDS_(28)']) :
-#         data.loc[i,"Lands"] = 28
-#     elif not pd.isna(data.loc[i,'LANDS_(29)']) :
-#         data.loc[i,"Lands"] = 29
-#     else :
-#         data.loc[i,"Lands"] = data.loc[i,"LANDS"]
-
-# lands_columns = [col for col in data.columns if "LANDS" in col]
-
-# data = data.drop(labels = lands_columns, axis = 1)
-# data = data.rename(columns = {"CREATURES" : "Creatures",
-#                           "INSTANTS_and_SORC." : "Instants_Sorceries", 
-#                           "OTHER_SPELLS" : "Other_spells"})
+# data = coalesce_lands(data, as_lands = True)
 
 # %% [markdown]
 # To proceed with the data cleaning phase, let us seek additional `NaN`'s.
@@ -322,80 +229,20 @@ data[pd.isna(data['Other_spells'])]
 data = data.fillna(0)
 
 # %% [markdown]
-# To conclude, we need to adjust the rankings:
+# To conclude, we check the rankings, now that the `3-4` ones have been split:
 
 # %%
-data.value_counts(subset = ["Rank"])
-
-# %% [markdown]
-# We have 43 `3-4` rankings. we add them by hands checking on [Wikipedia 13/05/2024](https://en.wikipedia.org/w/index.php?title=Magic:_The_Gathering_World_Championship&oldid=1214619541) (and we also correct two typos in the player names).
-
-# %%
-data.loc[(data['Date'].dt.year == 1994) & (data['Player'] == 'Dominic Symens'),'Rank'] = '3'
-data.loc[(data['Date'].dt.year == 1994) & (data['Player'] == 'Cyrille de Foucaud'),'Rank'] = '4'
-data.loc[(data['Date'].dt.year == 1995) & (data['Player'] == 'Henry Stern'),'Rank'] = '3'
-data.loc[(data['Date'].dt.year == 1996) & (data['Player'] == 'Henry Stern'),'Rank'] = '3'
-data.loc[(data['Date'].dt.year == 1996) & (data['Player'] == 'Olle Råde'),'Rank'] = '4'
-data.loc[(data['Date'].dt.year == 1997) & (data['Player'] == 'Paul McCabe'),'Rank'] = '3'
-data.loc[(data['Date'].dt.year == 1997) & (data['Player'] == 'Svend Sparre Geertsen'),'Rank'] = '4'
-data.loc[(data['Date'].dt.year == 1998) & (data['Player'] == 'Jon Finkel'),'Rank'] = '3'
-data.loc[(data['Date'].dt.year == 1998) & (data['Player'] == 'Raphael Levy'),'Rank'] = '4'
-data.loc[(data['Date'].dt.year == 1999) & (data['Player'] == 'Raffaele Lo Moro'),'Rank'] = '3'
-data.loc[(data['Date'].dt.year == 1999) & (data['Player'] == 'Matt Linde'),'Rank'] = '4'
-
-data.loc[(data['Date'].dt.year == 2000) & (data['Player'] == 'Dominik Hothow'),'Rank'] = '3'
-data.loc[(data['Date'].dt.year == 2000) & (data['Player'] == 'Benedikt Klauser'),'Rank'] = '4'
-data.loc[(data['Date'].dt.year == 2001) & (data['Player'] == 'Antoine Ruel'),'Rank'] = '3'
-data.loc[(data['Date'].dt.year == 2001) & (data['Player'] == 'Andrea Santin'),'Rank'] = '4'
-data.loc[(data['Date'].dt.year == 2002) & (data['Player'] == 'Diego Ostrovich'),'Rank'] = '3'
-data.loc[(data['Date'].dt.year == 2002) & (data['Player'] == 'Dave Humpherys'),'Rank'] = '4'
-data.loc[(data['Date'].dt.year == 2003) & (data['Player'] == 'Tuomo Nieminen'),'Rank'] = '3'
-data.loc[(data['Date'].dt.year == 2003) & (data['Player'] == 'David Humpherys'),'Rank'] = '4'
-data.loc[(data['Date'].dt.year == 2004) & (data['Player'] == 'Ryou Ogura'),'Rank'] = '3'
-data.loc[(data['Date'].dt.year == 2004) & (data['Player'] == 'Manuel Bevand'),'Rank'] = '4'
-data.loc[(data['Date'].dt.year == 2005) & (data['Player'] == 'Tomohiro Kaji'),'Rank'] = '3'
-data.loc[(data['Date'].dt.year == 2005) & (data['Player'] == 'Akira Asahara'),'Rank'] = '4'
-
-data.loc[(data['Date'].dt.year == 2006) & (data['Player'] == 'Nicholas Lovett'),'Rank'] = '3'
-data.loc[(data['Date'].dt.year == 2006) & (data['Player'] == 'Gabriel Nassif'),'Rank'] = '4'
-data.loc[(data['Date'].dt.year == 2007) & (data['Player'] == 'Gabriel Nassif'),'Rank'] = '3'
-data.loc[(data['Date'].dt.year == 2007) & (data['Player'] == 'Kotaro Otsuka'),'Rank'] = '4'
-data.loc[(data['Date'].dt.year == 2008) & (data['Player'] == 'Tsuyoshi Ikeda'),'Rank'] = '3'
-data.loc[(data['Date'].dt.year == 2008) & (data['Player'] == 'Hannes Kerem'),'Rank'] = '4'
-data.loc[(data['Date'].dt.year == 2009) & (data['Player'] == 'Terry Soh'),'Rank'] = '3'
-data.loc[(data['Date'].dt.year == 2009) & (data['Player'] == 'Bram Snepvangers'),'Rank'] = '4'
-data.loc[(data['Date'].dt.year == 2010) & (data['Player'] == 'Paulo Vitor Damo da Rosa'),'Rank'] = '3'
-data.loc[(data['Date'].dt.year == 2010) & (data['Player'] == 'Love Janse'),'Rank'] = '4'
-
-data.loc[(data['Date'].dt.year == 2011) & (data['Player'] == 'Conley Woods'),'Rank'] = '3'
-data.loc[(data['Date'].dt.year == 2011) & (data['Player'] == 'David Caplan'),'Rank'] = '4'
-data.loc[(data['Date'].dt.year == 2013) & (data['Player'] == 'Ben Stark'),'Rank'] = '3'
-data.loc[(data['Date'].dt.year == 2013) & (data['Player'] == 'Josh Utter-Leyton'),'Rank'] = '4'
-data.loc[(data['Date'].dt.year == 2016) & (data['Player'] == 'Oliver Tiu'),'Rank'] = '3'
-data.loc[(data['Date'].dt.year == 2016) & (data['Player'] == 'Shota Yasooka'),'Rank'] = '4'
-data.loc[(data['Date'].dt.year == 2017) & (data['Player'] == 'Josh Utter-leyton'),'Rank'] = '3'
-data.loc[(data['Date'].dt.year == 2017) & (data['Player'] == 'Kelvin Chew'),'Rank'] = '4'
-data.loc[(data['Date'].dt.year == 2018) & (data['Player'] == 'Benjamin Stark'),'Rank'] = '3'
-data.loc[(data['Date'].dt.year == 2018) & (data['Player'] == 'Shahar Shenhar'),'Rank'] = '4'
-
-data.loc[(data['Date'].dt.year == 2013) & (data['Player'] == 'Ben Stark'),'Player'] = 'Benjamin Stark'
-data.loc[(data['Date'].dt.year == 2017) & (data['Player'] == 'Josh Utter-leyton'),'Player'] = 'Josh Utter-Leyton'
-
-data['Rank'] = data['Rank'].astype('category')
+data['Rank'] = data['Rank'].astype(int).astype('category')
 data.value_counts(subset = ["Rank"])
 
 # %% [markdown]
 # We can now work with our cleaned data set:
 
 # %%
-data.to_csv("data/magic.csv", index=False)
-
-folder = os.getcwd()
-cleaned_data = Path(folder, "data", "magic.csv")
-data = pd.read_csv(cleaned_data)
-
-data["Date"] = data["Date"].apply(lambda date : datetime.datetime.strptime(date, "%Y-%m-%d"))
-data['Rank'] = data['Rank'].astype('category')
+# besides the csv, the cleaned data are saved in a typed columnar store:
+# reading them back needs no parsing of dates nor casting of the ranks
+save_clean(data, data_dir)
+data = load_clean(data_dir = data_dir)
 
 # %% [markdown]
 # ## Exploratory data analysis
@@ -410,38 +257,14 @@ data.describe()
 # A first interesting question is to see the evolution of the composition of decks along time.
 
 # %%
-data_mean_byYear = data[['Date','Creatures','Instants_Sorceries','Other_spells','Lands']].groupby('Date', observed=False).mean()
-figure, axis = plt.subplots(2, 2, figsize=(12,8)) 
-
-axis[0,0].plot(data_mean_byYear["Lands"], 'r.-', label='Lands')
-axis[0,0].set(xlabel='Lands',ylabel='Count')
-axis[0,1].plot(data_mean_byYear["Creatures"], 'b.-', label='Creatures')
-axis[0,1].set(xlabel='Creatures',ylabel='Count')
-axis[1,0].plot(data_mean_byYear["Instants_Sorceries"], 'g.-', label='Instants & Sorceries')
-axis[1,0].set(xlabel='Instants & Sorceries',ylabel='Count')
-axis[1,1].plot(data_mean_byYear["Other_spells"], 'y.-', label='Other spells')
-axis[1,1].set(xlabel='Other spells',ylabel='Count')
-
+plots.year_means(data)
 plt.show()
 
 # %% [markdown]
 # Another interesting question is to see the evolution of the composition of the top ranked decks over time.
 
 # %%
-Champs = data[data["Rank"] == 1]
-Champs = Champs.reset_index().drop(['index','Rank'], axis=1)
-
-figure, axis = plt.subplots(2, 2, figsize=(12,8)) 
-
-axis[0,0].plot(Champs["Date"], Champs["Lands"], 'r.-', label='Lands')
-axis[0,0].set(xlabel='Lands',ylabel='Count')
-axis[0,1].plot(Champs["Date"], Champs["Creatures"], 'b.-', label='Creatures')
-axis[0,1].set(xlabel='Creatures',ylabel='Count')
-axis[1,0].plot(Champs["Date"], Champs["Instants_Sorceries"], 'g.-', label='Instants & Sorceries')
-axis[1,0].set(xlabel='Instants & Sorceries',ylabel='Count')
-axis[1,1].plot(Champs["Date"], Champs["Other_spells"], 'y.-', label='Other spells')
-axis[1,1].set(xlabel='Other spells',ylabel='Count')
-
+plots.champions(data)
 plt.show()
 
 # %% [markdown]
@@ -450,38 +273,14 @@ plt.show()
 # Then we use violin plots to visualise the distribution of the four groups.
 
 # %%
-figure, axis = plt.subplots(2, 2, figsize=(12,8)) 
-
-sns.violinplot(x='Rank', y='Lands', data=data, fill=False, inner='quart', ax=axis[0,0])
-sns.stripplot(x='Rank', y='Lands', data=data, alpha=0.3, color='navy', jitter=0.05, ax=axis[0,0])
-axis[0,0].set(xlabel='Rank',ylabel='Lands')
-sns.violinplot(x='Rank', y='Creatures', data=data, fill=False, inner='quart', ax=axis[1,0])
-sns.stripplot(x='Rank', y='Creatures', data=data, alpha=0.3, color='navy', jitter=0.05, ax=axis[1,0])
-axis[1,0].set(xlabel='Rank',ylabel='Creatures')
-sns.violinplot(x='Rank', y='Instants_Sorceries', data=data, fill=False, inner='quart', ax=axis[0,1])
-sns.stripplot(x='Rank', y='Instants_Sorceries', data=data, alpha=0.3, color='navy', jitter=0.05, ax=axis[0,1])
-axis[0,1].set(xlabel='Rank',ylabel='Instants & Sorceries')
-sns.violinplot(x='Rank', y='Other_spells', data=data, fill=False, inner='quart', ax=axis[1,1])
-sns.stripplot(x='Rank', y='Other_spells', data=data, alpha=0.3, color='navy', jitter=0.05, ax=axis[1,1])
-axis[1,1].set(xlabel='Rank',ylabel='Other spells')
-
+plots.violins(data)
 plt.show()
 
 # %% [markdown]
 # Apparently, there is no difference, on average, in the composition of the decks. A box plot can confirm this claim, by also giving a more reasonable output (we cannot expect a negative number of cards in a deck).
 
 # %%
-figure, axis = plt.subplots(2, 2, figsize=(12,8)) 
-
-sns.boxplot(x='Rank', y='Lands', data=data, ax=axis[0,0])
-axis[0,0].set(xlabel='Rank',ylabel='Lands')
-sns.boxplot(x='Rank', y='Creatures', data=data, ax=axis[1,0])
-axis[1,0].set(xlabel='Rank',ylabel='Creatures')
-sns.boxplot(x='Rank', y='Instants_Sorceries', data=data, ax=axis[0,1])
-axis[0,1].set(xlabel='Rank',ylabel='Instants & Sorceries')
-sns.boxplot(x='Rank', y='Other_spells', data=data, ax=axis[1,1])
-axis[1,1].set(xlabel='Rank',ylabel='Other spells')
-
+plots.boxes(data)
 plt.show()
 
 # %% [markdown]
@@ -502,87 +301,53 @@ plt.show()
 # In each case, we need to divide the data of interest into 4 different groups according to the ranking. Let us perform this.
 
 # %%
-Lands_groups = []
-for i in range(4) :
-    Lands_groups.append(data[data['Rank'] == (i+1)]['Lands'])
-
-Creature_groups = []
-for i in range(4) :
-    Creature_groups.append(data[data['Rank'] == (i+1)]['Creatures'])
-
-IandS_groups = []
-for i in range(4) :
-    IandS_groups.append(data[data['Rank'] == (i+1)]['Instants_Sorceries'])
-
-Others_groups = []
-for i in range(4) :
-    Others_groups.append(data[data['Rank'] == (i+1)]['Other_spells'])
+# the data are split only once, into an array type x rank x deck
+# (see mtg/stats.py): all the tests below are computed on it at once
+samples = stats.pivot(data)
+samples.counts
 
 # %% [markdown]
 # Then let us check the homoscedasticity assumption by printing a table of variances:
 
 # %%
-data[['Rank','Creatures','Instants_Sorceries','Other_spells','Lands']].groupby('Rank',observed=False).apply(np.var, (0))
+stats.variances(data)
 
 # %% [markdown]
 # Therefore we cannot rely on homoscedasticity, but we may still perform the ANOVA test, for the sake of seeing the outcomes.
 
 # %%
-long_data = pd.melt(frame=data,
-                    id_vars=['Deck','Player','Event','Rank','Date'],
-                    value_vars=['Creatures','Instants_Sorceries','Other_spells','Lands'],
-                    var_name='Type',
-                    value_name='Count')
-
-for name_group in long_data.groupby('Type',observed=False):
-    samples = [condition[1] for condition in name_group[1].groupby('Rank',observed=False)['Count']]
-    f_val, p_val = ss.f_oneway(*samples)
-    print(f'Type: {name_group[0]},\nF value: {f_val:.3f},\np value: {p_val:.3f}\n')
+for test in stats.anova(data).itertuples() :
+    print(f'Type: {test.Type},\nF value: {test.F:.3f},\np value: {test.p:.3f}\n')
 
 # %% [markdown]
 # Thus, apparently, there is no significant difference. We could apply a t-test to confirm the conclusion, but there is an additional issue to address: in general, data are not normally distributed.
 
 # %%
-for name_group in long_data.groupby(by=['Type','Rank'], observed=False):
-    samples = [condition for condition in name_group[1]['Count']]
-    w_val, p_val = ss.shapiro(samples)
-    print(f'Type: {name_group[0][0]},\nRank: {name_group[0][1]}\nW value: {w_val:.3f},\np value: {p_val:.3f}\n')
+for test in stats.normality(data).itertuples() :
+    print(f'Type: {test.Type},\nRank: {test.Rank}\nW value: {test.W:.3f},\np value: {test.p:.3f}\n')
 
 # %% [markdown]
 # The following frequency plot confirms what we already observed.
 
 # %%
-figure, axis = plt.subplots(4,4, figsize=(12,12)) 
-
-for i,group in enumerate([Lands_groups,Creature_groups,IandS_groups,Others_groups]) :
-    for j in range(4) :
-        axis[i,j].hist(group[j], density=True)
-        mu, std = ss.norm.fit(group[j]) 
-        xmin, xmax = axis[i,j].get_xlim()
-        x = np.linspace(xmin, xmax, 100)
-        p = ss.norm.pdf(x, mu, std)
-        axis[i,j].plot(x, p, 'k', linewidth=2)
-        axis[i,j].get_yaxis().set_ticks([])
-
-axis[0,0].set(ylabel='Lands', title='Rank 1')
-axis[0,1].set(title='Rank 2')
-axis[0,2].set(title='Rank 3')
-axis[0,3].set(title='Rank 4')
-axis[1,0].set(ylabel='Creatures')
-axis[2,0].set(ylabel='Instants & Sorceries')
-axis[3,0].set(ylabel='Others')
-
+plots.histograms(data)
 plt.show()
 
 # %% [markdown]
 # This might be due to a low number of observations or to a trend we cannot identify at present. Nevertheless, we expect our data to be normally distributed (possibly with unequal variances) and thus we apply Welch's t-test as discussed.
 
 # %%
-for i,group in enumerate([Creature_groups,IandS_groups,Others_groups,Lands_groups]) :
-    for j in range(4) :
-        if i != j :
-            t_val, p_val = ss.ttest_ind(group[i], group[j], equal_var = False)
-            print(f'Type : {data.columns[i+5]}\nRank {i+1} vs Rank {j+1}\nT statistic : {t_val:.3f}\np value : {p_val:.3f}\n')
+for test in stats.welch(data).itertuples() :
+    print(f'Type : {test.Type}\nRank {test.Rank} vs Rank {test.Other_rank}\nT statistic : {test.T:.3f}\np value : {test.p:.3f}\n')
+
+# %% [markdown]
+# Since normality fails for several groups, we also check the conclusions without assuming it: a permutation ANOVA (the ranks are randomly reassigned to the decks, to see how often the F statistic is at least as large as the observed one) and bootstrap confidence intervals for the difference of the means of every pair of ranks (see `mtg/resampling.py`).
+
+# %%
+for test in resampling.permutation_anova(data, resamples = 20000).itertuples() :
+    print(f'Type: {test.Type},\nF value: {test.F:.3f},\npermutation p value: {test.p:.3f}\n')
+
+resampling.bootstrap_intervals(data, resamples = 10000)
 
 # %% [markdown]
 # ## Conclusions
@@ -595,43 +360,17 @@ for i,group in enumerate([Creature_groups,IandS_groups,Others_groups,Lands_group
 # It could be interesting to see how the number of Lands, Creatures, Instants & Sorceries, and Other spells evolved in time for all rankings (and not just the top one).
 
 # %%
-g = sns.relplot(kind='line', 
-                data=data, 
-                x='Date', 
-                y='Lands', 
-                hue='Rank', 
-                col='Rank', 
-                col_wrap=2, 
-                legend = False).set_axis_labels("Year", "Lands")
+plots.trends(data, 'Lands')
+plt.show()
 
 # %%
-g = sns.relplot(kind='line', 
-                data=data, 
-                x='Date', 
-                y='Creatures', 
-                hue='Rank', 
-                col='Rank', 
-                col_wrap=2, 
-                legend = False).set_axis_labels("Year", "Creatures")
+plots.trends(data, 'Creatures')
+plt.show()
 
 # %%
-g = sns.relplot(kind='line', 
-                data=data, 
-                x='Date', 
-                y='Instants_Sorceries', 
-                hue='Rank', 
-                col='Rank', 
-                col_wrap=2, 
-                legend = False).set_axis_labels("Year", "Instants & Sorceries")
+plots.trends(data, 'Instants_Sorceries')
+plt.show()
 
 # %%
-g = sns.relplot(kind='line', 
-                data=data, 
-                x='Date', 
-                y='Other_spells', 
-                hue='Rank', 
-                col='Rank', 
-                col_wrap=2, 
-                legend = False).set_axis_labels("Year", "Others")
-
-
+plots.trends(data, 'Other_spells')
+plt.show()
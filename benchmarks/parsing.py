@@ -0,0 +1,64 @@
+"""Compare the streaming parsers of mtg/parsing.py with the html5lib ones.
+
+For every recorded page in fixtures/mtgtop8 we time both parsers and
+measure their peak memory (with tracemalloc), after checking that they
+extract the same data. Run from the root of the repository:
+
+    python -m benchmarks.parsing [--repeat 50]
+"""
+
+import argparse
+import time
+import tracemalloc
+from pathlib import Path
+
+from mtg import parsing
+from mtg.testing import FIXTURES_DIR
+
+PARSERS = {"search" : (parsing.parse_search_page_soup, parsing.parse_search_page),
+           "deck" : (parsing.parse_deck_page_soup, parsing.parse_deck_page)}
+
+
+def measure(parser, html, repeat) :
+    """Mean time (in ms) and peak memory (in KiB) of `parser` on `html`."""
+    start = time.perf_counter()
+    for _ in range(repeat) :
+        parser(html)
+    elapsed = (time.perf_counter() - start) / repeat * 1000
+
+    tracemalloc.start()
+    parser(html)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1024
+
+
+def main(directory = FIXTURES_DIR, repeat = 50) :
+    totals = {}
+    print(f"{'page':<22}{'html5lib ms':>12}{'stream ms':>11}{'speed-up':>10}{'html5lib KiB':>14}{'stream KiB':>12}")
+    for file in sorted(Path(directory).glob("*.html")) :
+        kind = file.name.split("_")[0]
+        reference, fast = PARSERS[kind]
+        html = file.read_text(encoding = "utf-8")
+        assert reference(html) == fast(html), f"the parsers disagree on {file.name}"
+
+        ref_time, ref_peak = measure(reference, html, repeat)
+        fast_time, fast_peak = measure(fast, html, repeat)
+        total = totals.setdefault(kind, [0, 0, 0])
+        total[0] += 1
+        total[1] += ref_time
+        total[2] += fast_time
+        print(f"{file.name:<22}{ref_time:>12.3f}{fast_time:>11.3f}{ref_time / fast_time:>9.1f}x"
+              f"{ref_peak:>14.1f}{fast_peak:>12.1f}")
+
+    for kind, (pages, ref_time, fast_time) in totals.items() :
+        print(f"{kind} pages : {pages}, mean html5lib {ref_time / pages:.3f} ms, "
+              f"mean stream {fast_time / pages:.3f} ms ({ref_time / fast_time:.1f}x faster)")
+
+
+if __name__ == "__main__" :
+    parser = argparse.ArgumentParser(description = __doc__.splitlines()[0])
+    parser.add_argument("--directory", default = FIXTURES_DIR)
+    parser.add_argument("--repeat", type = int, default = 50)
+    args = parser.parse_args()
+    main(args.directory, args.repeat)
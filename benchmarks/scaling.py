@@ -0,0 +1,155 @@
+"""Time the stages of the pipeline on synthetic corpora of growing size.
+
+For every scale (number of decks) we draw a raw data set with
+`benchmarks.synthetic` and run, one after the other, the stages a crawl of
+that size goes through:
+- parsing the search pages and the deck pages (of the first `--max-pages`
+  decks only: the parsing of a page does not depend on the others),
+- collecting the records of the decks in a `mtg.records.ColumnBuffer`,
+- appending them to the raw csv, 500 at a time as `mtg.scraping.ingest` does,
+- loading the csv through its columnar copy (`mtg.storage`),
+- the cleaning (`mtg.cleaning.clean`), with synthetic rank corrections,
+- all the tests of `mtg.stats`, overall and year by year.
+Every stage is run once under tracemalloc, for its peak memory (and to
+leave the imports out of the time), then timed.
+Between two scales we report the exponent of the growth of the time
+(1 for a linear stage): a stage clearly above 1 is flagged as super-linear.
+Run from the root of the repository:
+
+    python -m benchmarks.scaling [--scales 1000 10000 100000] [--max-pages 20000] [--json scaling.json]
+"""
+
+import argparse
+import gc
+import json
+import math
+import tempfile
+import time
+import tracemalloc
+import warnings
+from pathlib import Path
+
+from benchmarks.synthetic import corrections, deck_pages, raw_rows, search_pages
+from mtg import stats
+from mtg.cleaning import clean
+from mtg.manifest import append_rows
+from mtg.parsing import parse_deck_page, parse_search_page
+from mtg.records import ColumnBuffer, deck_record
+from mtg.storage import load_csv_table
+
+# rows appended to the csv at once, as `ingest` does by default
+CHUNK_SIZE = 500
+
+# growth exponent of the time above which a stage is flagged
+SUPER_LINEAR = 1.3
+
+
+def _records(raw) :
+    """The records of the decks of `raw`, as the scraper builds them."""
+    player_columns = ["Deck", "Player", "Format", "Event", "Level", "Rank", "Date"]
+    counts = [column for column in raw.columns if column not in player_columns]
+    records = []
+    for number, row in enumerate(raw.itertuples(index = False, name = None)) :
+        values = dict(zip(raw.columns, row))
+        cells = [values[column] for column in player_columns]
+        deck = {column : values[column] for column in counts if values[column] == values[column]}
+        records.append((cells, deck, number))
+    return records
+
+
+def stages(raw, max_pages, directory) :
+    """The stages to time on `raw`: name -> (number of items, function)."""
+    pages = search_pages(raw.iloc[:max_pages])
+    decks = deck_pages(raw.iloc[:max_pages])
+    records = _records(raw)
+    table = corrections(raw)
+
+    def parse_search() :
+        for page in pages :
+            parse_search_page(page)
+
+    def parse_decks() :
+        for page in decks :
+            parse_deck_page(page)
+
+    def buffer() :
+        records_buffer = ColumnBuffer()
+        for cells, deck, number in records :
+            records_buffer.append(deck_record(cells, deck, "synthetic", 1 + number // 25, str(number)))
+        return records_buffer.to_frame(keys = False)
+
+    def append() :
+        csv_file = Path(tempfile.mkdtemp(dir = directory), "raw_magic.csv")
+        for start in range(0, len(raw), CHUNK_SIZE) :
+            append_rows(csv_file, raw.iloc[start:start + CHUNK_SIZE])
+        return csv_file
+
+    csv_file = append()
+
+    def load() :
+        store = Path(tempfile.mkdtemp(dir = directory))
+        return load_csv_table(csv_file, store)
+
+    loaded = load()
+    cleaned = clean(loaded, table)
+    by_year = cleaned.assign(Year = cleaned["Date"].dt.year)
+    return {"parse search pages" : (len(pages), parse_search),
+            "parse deck pages" : (len(decks), parse_decks),
+            "buffer records" : (len(raw), buffer),
+            "append to csv" : (len(raw), append),
+            "load raw" : (len(raw), load),
+            "clean" : (len(raw), lambda : clean(loaded, table)),
+            "tests" : (len(cleaned), lambda : stats.tests(cleaned)),
+            "tests by year" : (len(cleaned), lambda : stats.tests(by_year, by = ["Year"]))}
+
+
+def measure(function) :
+    """Time (in s) and peak memory (in MiB) of `function`."""
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start, peak / 2 ** 20
+
+
+def main(scales = (1000, 10000, 100000), max_pages = 20000, output = None) :
+    results = []
+    previous = {}
+    print(f"{'decks':>8}  {'stage':<20}{'items':>9}{'ms':>11}{'items/s':>12}{'peak MiB':>10}{'growth':>8}")
+    with tempfile.TemporaryDirectory() as directory, warnings.catch_warnings() :
+        warnings.simplefilter("ignore")
+        for scale in scales :
+            raw = raw_rows(scale)
+            timed = stages(raw, max_pages, directory)
+            # the inputs are never collected: the collector must not scan them at every stage
+            gc.collect()
+            gc.freeze()
+            for name, (items, function) in timed.items() :
+                elapsed, peak = measure(function)
+                growth = None
+                if name in previous and previous[name][0] != items :
+                    before_items, before_elapsed = previous[name]
+                    growth = math.log(elapsed / before_elapsed) / math.log(items / before_items)
+                previous[name] = (items, elapsed)
+                flag = " super-linear" if growth is not None and growth > SUPER_LINEAR else ""
+                print(f"{scale:>8}  {name:<20}{items:>9}{elapsed * 1000:>11.1f}{items / elapsed:>12.0f}{peak:>10.1f}"
+                      + (f"{growth:>8.2f}" if growth is not None else f"{'':>8}") + flag)
+                results.append({"decks" : scale, "stage" : name, "items" : items, "seconds" : elapsed,
+                                "throughput" : items / elapsed, "peak_mib" : peak, "growth" : growth})
+            del timed
+            gc.unfreeze()
+    if output :
+        Path(output).write_text(json.dumps(results, indent = 1))
+        print(f"Results written to {output}.")
+    return results
+
+
+if __name__ == "__main__" :
+    parser = argparse.ArgumentParser(description = __doc__.splitlines()[0])
+    parser.add_argument("--scales", type = int, nargs = "+", default = [1000, 10000, 100000])
+    parser.add_argument("--max-pages", type = int, default = 20000)
+    parser.add_argument("--json", help = "also write the results to this file")
+    args = parser.parse_args()
+    main(args.scales, args.max_pages, args.json)
@@ -0,0 +1,73 @@
+"""Time the MinHash/LSH index of mtg/similarity.py on synthetic decklists.
+
+We draw `--decks` decks from `--archetypes` random archetypes of 20 cards
+(each deck swapping a few cards and playing 2 to 4 copies of each), index
+them and time a top-k query through the LSH buckets against a vectorized
+cosine over all the decks, then the clustering into archetypes, checking
+how well it recovers the ones the decks were drawn from. Run from the root
+of the repository:
+
+    python -m benchmarks.similarity [--decks 50000] [--archetypes 200]
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from mtg.cards import CardBuffer
+from mtg.similarity import SimilarityIndex
+
+
+def corpus(decks, archetypes, cards = 5000, seed = 0) :
+    """Synthetic decklists, and the archetype every deck was drawn from."""
+    generator = np.random.default_rng(seed)
+    lists = [generator.choice(cards, 20, replace = False) for _ in range(archetypes)]
+    buffer = CardBuffer()
+    truth = generator.integers(0, archetypes, decks)
+    for number, archetype in enumerate(truth) :
+        deck = lists[archetype].copy()
+        swapped = generator.integers(0, 4)
+        deck[:swapped] = generator.choice(cards, swapped)
+        buffer.append("synthetic", 1, number, [("md", int(copies), f"card {card}")
+                                               for card, copies in zip(deck, generator.integers(2, 5, 20))])
+    return buffer.to_matrix(), truth
+
+
+def timed(function, *args, **kwargs) :
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main(decks = 50000, archetypes = 200, queries = 100) :
+    matrix, truth = corpus(decks, archetypes)
+    index, build_time = timed(SimilarityIndex, matrix)
+    print(f"{decks} decks, {len(matrix.names)} cards : index built in {build_time:.0f} ms")
+
+    lsh_time = exhaustive_time = 0
+    agree = 0
+    for deck in matrix.deck_ids[:queries] :
+        lsh, elapsed = timed(index.query, deck, 10)
+        lsh_time += elapsed
+        exhaustive, elapsed = timed(index.query, deck, 10, True)
+        exhaustive_time += elapsed
+        agree += len(set(lsh["deck_id"]) & set(exhaustive["deck_id"]))
+    print(f"top-10 query : LSH {lsh_time / queries:.2f} ms, exhaustive cosine {exhaustive_time / queries:.2f} ms, "
+          f"{agree / queries / 10:.0%} of the exhaustive neighbours found")
+
+    labels, cluster_time = timed(index.archetypes, 0.5)
+    frame = pd.DataFrame({"found" : labels, "truth" : truth})
+    purity = frame.groupby("found")["truth"].agg(lambda values : values.value_counts().iat[0]).sum() / decks
+    print(f"archetypes : {labels.max() + 1} found in {cluster_time:.0f} ms "
+          f"({archetypes} drawn), purity {purity:.1%}, "
+          f"{frame.groupby('truth')['found'].nunique().mean():.2f} clusters per drawn archetype")
+
+
+if __name__ == "__main__" :
+    parser = argparse.ArgumentParser(description = __doc__.splitlines()[0])
+    parser.add_argument("--decks", type = int, default = 50000)
+    parser.add_argument("--archetypes", type = int, default = 200)
+    args = parser.parse_args()
+    main(args.decks, args.archetypes)
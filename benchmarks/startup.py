@@ -0,0 +1,68 @@
+"""Compare the start-up time of the stats API with the monolithic script's imports.
+
+Every measure runs in a fresh interpreter, so that nothing is already
+imported. Besides the time, we check which heavy libraries end up in
+`sys.modules`: importing `mtg.stats` (and loading the cleaned data) must
+not load matplotlib, seaborn, bs4 nor httpx. Run from the root of the
+repository:
+
+    python -m benchmarks.startup [--repeat 5]
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+HEAVY = ["matplotlib", "seaborn", "bs4", "html5lib", "httpx", "scipy"]
+
+CASES = {"MTG_project.py imports" : "import numpy, pandas, matplotlib.pyplot, seaborn, scipy.stats, "
+                                    "bs4, html5lib, httpx",
+         "import mtg" : "import mtg",
+         "import mtg.stats" : "import mtg.stats",
+         "mtg.stats + load_clean" : "import mtg.stats; from mtg.datasets import load_clean; load_clean()",
+         "mtg.stats.anova" : "import mtg.stats; from mtg.datasets import load_clean; "
+                             "mtg.stats.anova(load_clean())"}
+
+# forbidden libraries, by case
+MUST_NOT_LOAD = {"import mtg" : HEAVY,
+                 "import mtg.stats" : HEAVY,
+                 "mtg.stats + load_clean" : HEAVY,
+                 "mtg.stats.anova" : ["matplotlib", "seaborn", "bs4", "html5lib", "httpx"]}
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+{code}
+elapsed = time.perf_counter() - start
+print(json.dumps([elapsed, sorted(name for name in {heavy!r} if name in sys.modules)]))
+"""
+
+
+def measure(code) :
+    """Time (in ms) of `code` in a fresh interpreter, and the heavy libraries it loaded."""
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", PROBE.format(code = code, heavy = HEAVY)],
+                            check = True, capture_output = True, text = True).stdout
+    total = time.perf_counter() - start
+    elapsed, loaded = json.loads(output.splitlines()[-1])
+    return elapsed * 1000, total * 1000, loaded
+
+
+def main(repeat = 5) :
+    print(f"{'case':<26}{'import ms':>10}{'process ms':>12}  heavy libraries loaded")
+    for case, code in CASES.items() :
+        runs = [measure(code) for _ in range(repeat)]
+        elapsed = min(run[0] for run in runs)
+        total = min(run[1] for run in runs)
+        loaded = runs[-1][2]
+        print(f"{case:<26}{elapsed:>10.1f}{total:>12.1f}  {', '.join(loaded) or '-'}")
+        forbidden = set(loaded) & set(MUST_NOT_LOAD.get(case, []))
+        assert not forbidden, f"{case} loads {', '.join(sorted(forbidden))}"
+
+
+if __name__ == "__main__" :
+    parser = argparse.ArgumentParser(description = __doc__.splitlines()[0])
+    parser.add_argument("--repeat", type = int, default = 5)
+    main(parser.parse_args().repeat)
@@ -0,0 +1,84 @@
+"""Compare the batched tests of mtg/stats.py with the groupby loops of the script.
+
+The cleaned data set is replicated into `--formats` fake formats (with the
+card counts jittered), and the full test grid (ANOVA, Shapiro-Wilk and
+Welch's t-test of every card type, for every format and five-year period)
+is run both ways: looping over the groups with one scipy call per test, as
+MTG_project.py used to, and with `mtg.stats.tests`. We check that they
+agree before timing them. Run from the root of the repository:
+
+    python -m benchmarks.stats [--formats 20]
+"""
+
+import argparse
+import time
+import warnings
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+import scipy.stats as ss
+
+from mtg import stats
+from mtg.datasets import CARD_COUNTS, load_clean
+
+
+def corpus(formats, seed = 0) :
+    data = load_clean(columns = ["Date", "Rank"] + CARD_COUNTS)
+    rng = np.random.default_rng(seed)
+    copies = []
+    for number in range(formats) :
+        copy = data.assign(Format = f"F{number:03d}", Period = data["Date"].dt.year // 5 * 5)
+        copy[CARD_COUNTS] = copy[CARD_COUNTS] + rng.integers(0, 3, size = (len(copy), len(CARD_COUNTS)))
+        copies.append(copy)
+    return pd.concat(copies, ignore_index = True)
+
+
+def looped(data, by) :
+    """The test grid with a groupby pass and a scipy call per test."""
+    rows = []
+    for key, group in data.groupby(by, observed = True) :
+        long_data = pd.melt(group, id_vars = by + ["Rank"], value_vars = CARD_COUNTS,
+                            var_name = "Type", value_name = "Count")
+        for kind, by_type in long_data.groupby("Type", sort = False) :
+            samples = dict(list(by_type.groupby("Rank", observed = False)["Count"]))
+            rows.append((*key, kind, "ANOVA", *ss.f_oneway(*samples.values())))
+            for rank, sample in samples.items() :
+                # as in the batched version, too small samples have no test
+                result = ss.shapiro(sample) if len(sample) >= 3 else (np.nan, np.nan)
+                rows.append((*key, kind, "Shapiro-Wilk", *result))
+            for first, second in combinations(samples, 2) :
+                rows.append((*key, kind, "Welch",
+                             *ss.ttest_ind(samples[first], samples[second], equal_var = False)))
+    return rows
+
+
+def timed(function, *args, **kwargs) :
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main(formats = 20) :
+    data = corpus(formats)
+    by = ["Format", "Period"]
+    with warnings.catch_warnings() :
+        warnings.simplefilter("ignore")
+        rows, loop_time = timed(looped, data, by)
+        table, batch_time = timed(stats.tests, data, by = by)
+    ordered = table.sort_values(by + ["Type", "Test"], kind = "stable")
+    assert len(rows) == len(table), "the two grids have a different number of tests"
+    expected = pd.DataFrame(rows, columns = by + ["Type", "Test", "Statistic", "p"]) \
+                 .sort_values(by + ["Type", "Test"], kind = "stable")
+    assert np.allclose(expected[["Statistic", "p"]].to_numpy(float), ordered[["Statistic", "p"]].to_numpy(float),
+                       equal_nan = True), "the two grids disagree"
+    groups = data.groupby(by).ngroups
+    print(f"{len(data)} decks, {groups} groups, {len(table)} tests")
+    print(f"groupby loops : {loop_time * 1000:10.1f} ms")
+    print(f"batched       : {batch_time * 1000:10.1f} ms ({loop_time / batch_time:.1f}x faster)")
+
+
+if __name__ == "__main__" :
+    parser = argparse.ArgumentParser(description = __doc__.splitlines()[0])
+    parser.add_argument("--formats", type = int, default = 20)
+    main(parser.parse_args().formats)
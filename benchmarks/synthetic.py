@@ -0,0 +1,143 @@
+"""Synthetic decks with the schema of raw_magic.csv, and their mtgtop8 pages.
+
+The real data set only has a few hundred decks; to see how the pipeline
+behaves on larger crawls we draw as many decks as needed with the quirks of
+the real ones:
+- ranks as reported by mtgtop8, including "3-4", "5-8", "17-32",
+  "Day 1 undefeated", "Other" and missing ones,
+- team events (World Magic Cup) and partial standings ("15 points") that
+  the cleaning drops,
+- missing card type counts (mostly Other spells and Creatures),
+- decks with double-faced land/non-land cards, whose lands are reported in
+  a `LANDS_(NN)` column instead of `LANDS`,
+- the dates as dd/mm/yy strings.
+`corrections` draws the table of rank corrections settling the "3-4" ranks,
+as data/rank_corrections.csv does for the real decks.
+`search_pages` and `deck_pages` render the decks as the pages of mtgtop8
+read by `mtg.parsing`, in the format of the recorded ones of
+fixtures/mtgtop8.
+
+    from benchmarks.synthetic import raw_rows
+    raw = raw_rows(100000)
+    data = mtg.cleaning.clean(raw, corrections(raw))
+"""
+
+import numpy as np
+import pandas as pd
+
+# ranks and how often they appear in raw_magic.csv ("" for the missing ones)
+RANK_WEIGHTS = {"1" : 41, "2" : 70, "3" : 18, "4" : 28, "3-4" : 46, "5" : 18, "6" : 22, "7" : 18, "8" : 17,
+                "5-8" : 69, "9" : 5, "10" : 5, "11" : 5, "12" : 5, "13" : 5, "14" : 5, "15" : 5, "16" : 5,
+                "17-32" : 8, "Day 1 undefeated" : 41, "Other" : 31, "" : 65}
+
+# the events of a year, and how often
+EVENTS = {"Worlds {year}" : 0.85, "{year} World Magic Cup" : 0.1, "Worlds Standard (15 points and original)" : 0.05}
+
+DECK_NAMES = ["RG Aggro", "Wug Control", "Zoo", "Mono Red", "Esper Midrange", "Jund", "UW Tron", "Affinity",
+              "Mardu Vehicles", "Temur Energy", "Izzet Phoenix", "Golgari Midrange"]
+
+# fraction of the decks missing a card type count
+MISSING = {"CREATURES" : 0.04, "INSTANTS_and_SORC." : 0.01, "OTHER_SPELLS" : 0.17}
+
+# the indentation of the cells of a row of the search table on mtgtop8
+ROW_SEPARATOR = "\n\t\t  "
+
+# fraction of the decks with double-faced land/non-land cards
+DOUBLE_FACED = 0.03
+
+DOUBLE_FACED_LANDS = [26, 27, 28, 29]
+
+
+def raw_rows(decks, seed = 0, start = 1994, end = 2022) :
+    """`decks` rows of a raw data set (the columns of raw_magic.csv), in random order."""
+    generator = np.random.default_rng(seed)
+    year = generator.integers(start, end + 1, decks)
+    event = generator.choice(list(EVENTS), decks, p = list(EVENTS.values()))
+    weights = np.array(list(RANK_WEIGHTS.values()), dtype = float)
+    rank = generator.choice(list(RANK_WEIGHTS), decks, p = weights / weights.sum())
+
+    lands = np.clip(np.round(generator.normal(24, 2, decks)), 15, 28)
+    creatures = generator.integers(0, 34, decks).astype(float)
+    instants = generator.integers(2, 38, decks).astype(float)
+    others = np.maximum(60 - lands - creatures - instants, 1)
+    frame = pd.DataFrame({"Deck" : generator.choice(DECK_NAMES, decks),
+                          "Player" : pd.Series(generator.integers(0, max(decks // 4, 1), decks)).map("Player {}".format),
+                          "Format" : "Standard",
+                          "Event" : [pattern.format(year = value) for pattern, value in zip(event, year)],
+                          "Level" : np.nan,
+                          "Rank" : rank,
+                          "Date" : pd.to_datetime(pd.DataFrame({"year" : year, "month" : generator.integers(1, 13, decks),
+                                                                "day" : generator.integers(1, 29, decks)}))
+                                     .dt.strftime("%d/%m/%y"),
+                          "LANDS" : lands,
+                          "CREATURES" : creatures,
+                          "INSTANTS_and_SORC." : instants,
+                          "OTHER_SPELLS" : others,
+                          "SIDEBOARD" : 0.0})
+    frame["Rank"] = frame["Rank"].replace("", np.nan)
+    for column, fraction in MISSING.items() :
+        frame.loc[generator.random(decks) < fraction, column] = np.nan
+
+    # the lands of the double-faced decks are in the column of their NN
+    double_faced = generator.random(decks) < DOUBLE_FACED
+    nn = generator.choice(DOUBLE_FACED_LANDS, decks)
+    for value in DOUBLE_FACED_LANDS :
+        frame[f"LANDS_({value})"] = np.where(double_faced & (nn == value), lands - 4, np.nan)
+    frame.loc[double_faced, "LANDS"] = np.nan
+    return frame
+
+
+def corrections(raw, seed = 0) :
+    """A table of corrections (as data/rank_corrections.csv) giving a rank 3 or 4 to the "3-4" decks of `raw`."""
+    generator = np.random.default_rng(seed)
+    tied = raw[raw["Rank"] == "3-4"]
+    table = pd.DataFrame({"Year" : pd.to_datetime(tied["Date"], format = "%d/%m/%y").dt.year,
+                          "Player" : tied["Player"]}).drop_duplicates()
+    return table.assign(Rank = generator.choice(["3", "4"], len(table)), Corrected_player = np.nan) \
+                .reset_index(drop = True)
+
+
+def _cells(row) :
+    """The cells of a row of the search table."""
+    return [row["Deck"], row["Player"], row["Format"], row["Event"], "", "" if pd.isna(row["Rank"]) else row["Rank"],
+            row["Date"]]
+
+
+def search_pages(raw, rows_per_page = 25, first_id = 100000) :
+    """The search pages listing the decks of `raw` (their ids start at `first_id`)."""
+    pages = []
+    for start in range(0, len(raw), rows_per_page) :
+        lines = ["<html><head><title>MTGTOP8 Search</title></head><body>", "<table class=Stable>"]
+        for number, (_, row) in enumerate(raw.iloc[start:start + rows_per_page].iterrows(), first_id + start) :
+            deck, player, form, event, level, rank, date = _cells(row)
+            cells = [f'<input type=checkbox name="deck_check[]" value="{number}">',
+                     f'<a href="event?e=1&d={number}&f=ST">{deck}</a>',
+                     f'<a href="search?player={player}">{player}</a>',
+                     form, f'<a href="event?e=1&f=ST">{event}</a>', level, rank, date]
+            lines.append("<tr class=hover_tr>" + "".join(ROW_SEPARATOR + f"<td class=S12>{cell}</td>"
+                                                          for cell in cells) + "\n\t\t</tr>")
+        lines.append("</table>\n</body></html>")
+        pages.append("\n".join(lines))
+    return pages
+
+
+def deck_pages(raw) :
+    """The deck page of every deck of `raw`, with its card type blocks and its card lines."""
+    labels = {column : column.replace("_", " ") for column in raw.columns if column.startswith("LANDS")}
+    labels.update({"CREATURES" : "CREATURES", "INSTANTS_and_SORC." : "INSTANTS and SORC.",
+                   "OTHER_SPELLS" : "OTHER SPELLS"})
+    pages = []
+    for _, row in raw.iterrows() :
+        lines = [f"<html><head><title>{row['Deck']}</title></head><body>",
+                 f"<div class=event_title>{row['Event']}</div>"]
+        for column, label in labels.items() :
+            if pd.isna(row[column]) :
+                continue
+            count = int(row[column])
+            lines.append(f"<div class=O14>{count} {label}</div>")
+            for card in range(0, count, 4) :
+                lines.append(f'<div id=md{card} class="deck_line hover_tr">{min(4, count - card)} '
+                             f'<span class=L14>{label} {card // 4}</span></div>')
+        lines.append("<div class=O14>SIDEBOARD</div>\n</body></html>")
+        pages.append("\n".join(lines))
+    return pages
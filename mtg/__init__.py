@@ -0,0 +1,27 @@
+"""Helpers for the analysis of the top ranked decks in MTG World Championships.
+
+The literate analysis lives in `MTG_project.py`; this package collects the
+pieces of it that are worth importing on their own (the scraper, the
+cleaning, the statistical tests, the figures), and `python -m mtg` runs
+them as separate steps (see `mtg/__main__.py`).
+
+Submodules are imported on first use (`mtg.stats` after `import mtg`), and
+each of them only imports the libraries it needs: loading the cleaned data
+and running a test never pays for matplotlib, seaborn or the scraper.
+"""
+
+import importlib
+
+SUBMODULES = ["archive", "artifacts", "cache", "cards", "cleaning", "crawl", "datasets", "manifest", "parsing",
+              "pipeline", "players", "plots", "profiling", "records", "rendering", "report", "resampling", "scraping",
+              "service", "similarity", "stats", "storage", "testing", "trends", "validation"]
+
+
+def __getattr__(name) :
+    if name in SUBMODULES :
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() :
+    return sorted(list(globals()) + SUBMODULES)
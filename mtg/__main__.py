@@ -0,0 +1,337 @@
+"""The steps of the analysis from the command line.
+
+    python -m mtg scrape            # append the missing decks to raw_magic.csv
+    python -m mtg scrape --cards    # ... and collect their decklists in data/cards
+    python -m mtg scrape --clean    # ... and append them, cleaned, to magic.csv as they come
+    python -m mtg crawl --formats ST MO --events "" --start 2015 --workers 4  # other formats -> data/crawl
+    python -m mtg crawl --ttl 86400 # ... revalidating the cached pages older than a day
+    python -m mtg reparse --workers 4  # the pages kept in data/archive -> raw_magic.reparsed.csv
+    python -m mtg clean             # raw_magic.csv -> magic.csv
+    python -m mtg clean --chunk-size 10000  # the same, 10000 rows at a time
+    python -m mtg players           # the spellings of a player merged by `clean --resolve-players`
+    python -m mtg validate          # the anomalies of magic.csv (ranks, podiums, deck sizes)
+    python -m mtg validate --raw    # ... of the individual events of raw_magic.csv, before the corrections
+    python -m mtg stats             # the tests of MTG_project.py
+    python -m mtg stats --by Year   # all of them, year by year, in one table
+    python -m mtg stats --resamples 20000 --workers 4  # with permutations and bootstrap
+    python -m mtg trends --window 3 # means and variances by year and rank, updated with the new decks
+    python -m mtg plots -o figures  # its figures, as png files (only the ones whose data changed)
+    python -m mtg plots --format png svg --workers 4  # ... in two formats, four at a time
+    python -m mtg archetypes        # the decklists of data/cards clustered in archetypes
+    python -m mtg run               # all of the above, re-running only what changed
+    python -m mtg run tests --force raw  # look for new decks, then test again
+    python -m mtg serve --port 8050 # answer queries on magic.csv over HTTP (see mtg/service.py)
+    python -m mtg report -o report  # MTG_project.py as report/MTG_project.html, running the changed cells
+
+Every step only imports what it needs: `stats` never loads matplotlib nor
+the scraper. With `--profile FILE`, the time, requests, rows and memory of
+the step are written to FILE (see `mtg.profiling`):
+
+    python -m mtg --profile scrape.json scrape --offline
+"""
+
+import argparse
+from pathlib import Path
+
+
+def scrape(args) :
+    from mtg.archive import PageArchive
+    from mtg.cache import ResponseCache
+    from mtg.datasets import ARCHIVE_DIR, CACHE_DIR, CARDS_DIR, CLEAN_FILE, RAW_FILE
+    from mtg.scraping import scrape_incremental
+    on_rows = None
+    if args.clean :
+        from mtg.cleaning import StreamingCleaner
+        on_rows = StreamingCleaner(CLEAN_FILE, as_lands = args.as_lands)
+    scrape_incremental(RAW_FILE, range(args.start, args.end + 1), cards_dir = CARDS_DIR if args.cards else None,
+                       on_rows = on_rows, cache = ResponseCache(CACHE_DIR), offline = args.offline,
+                       archive = None if args.no_archive else PageArchive(ARCHIVE_DIR))
+    if on_rows is not None :
+        print(f"{on_rows.written} decks added to {CLEAN_FILE.name}.")
+
+
+def crawl(args) :
+    from mtg.crawl import CrawlSpec, crawl
+    from mtg.datasets import CACHE_DIR, CRAWL_DIR
+    spec = CrawlSpec(tuple(args.formats), tuple(args.events), tuple(args.levels), args.start, args.end, args.window)
+    cache_options = {"ttl" : args.ttl}
+    if args.cache_max_bytes is not None :
+        cache_options["max_bytes"] = args.cache_max_bytes
+    if args.cache_max_age is not None :
+        cache_options["max_age"] = args.cache_max_age
+    crawl(spec, args.output or CRAWL_DIR, workers = args.workers, refresh = args.refresh, cache_dir = CACHE_DIR,
+          cache_options = cache_options, rate = args.rate, offline = args.offline)
+
+
+def reparse(args) :
+    from mtg.archive import PageArchive, reparse
+    from mtg.datasets import ARCHIVE_DIR, RAW_FILE
+    from mtg.scraping import worlds_shard
+    shards = {year : worlds_shard(year) for year in range(args.start, args.end + 1)}
+    output = args.output or RAW_FILE.with_name("raw_magic.reparsed.csv")
+    reparse(PageArchive(ARCHIVE_DIR), shards, workers = args.workers).to_csv(output, index = False)
+    print(f"Raw table written to {output}.")
+
+
+def clean(args) :
+    if args.chunk_size :
+        from mtg.cleaning import clean_csv
+        from mtg.datasets import CLEAN_FILE, RAW_FILE
+        written = clean_csv(RAW_FILE, CLEAN_FILE, args.chunk_size, as_lands = args.as_lands)
+        print(f"{written} decks in the cleaned data set.")
+        return
+    from mtg.cleaning import clean
+    from mtg.datasets import load_raw, save_clean
+    data = clean(load_raw(), as_lands = args.as_lands, resolve = args.resolve_players)
+    save_clean(data)
+    print(f"{len(data)} decks in the cleaned data set.")
+
+
+def players(args) :
+    from mtg.datasets import load_raw
+    from mtg.players import player_clusters
+    clusters = player_clusters(load_raw()["Player"], args.threshold)
+    merged = clusters[clusters.duplicated("Resolved", keep = False)]
+    print(merged.to_string(index = False))
+    print(f"{clusters['Player'].nunique()} spellings of {clusters['Resolved'].nunique()} players.")
+
+
+def validate(args) :
+    from mtg.validation import CLEAN_SCHEMA, EVENTS_SCHEMA, validate
+    if args.raw :
+        from mtg.cleaning import select_events
+        from mtg.datasets import load_raw
+        report = validate(select_events(load_raw()), EVENTS_SCHEMA)
+    else :
+        from mtg.datasets import load_clean
+        report = validate(load_clean(), CLEAN_SCHEMA)
+    if len(report) :
+        print(report.to_string(index = False), end = "\n\n")
+        print("Anomalies :", report.groupby("Check").size().to_string(), sep = "\n")
+    else :
+        print("No anomalies.")
+    if args.strict and len(report) :
+        raise SystemExit(1)
+
+
+def stats(args) :
+    from mtg import stats
+    from mtg.datasets import CARD_COUNTS, load_clean
+    if args.by :
+        # the year is not a column of magic.csv, but it is worth grouping by
+        columns = ["Date" if column == "Year" else column for column in args.by]
+        data = load_clean(columns = list(dict.fromkeys(["Rank"] + columns + CARD_COUNTS)))
+        if "Year" in args.by :
+            data["Year"] = data["Date"].dt.year
+        table = stats.tests(data, by = args.by)
+        print(table.to_string(index = False, float_format = "{:.3f}".format))
+        return
+    data = load_clean(columns = ["Rank"] + CARD_COUNTS)
+    print("Variances :", stats.variances(data), sep = "\n", end = "\n\n")
+    for test in (stats.anova, stats.normality, stats.welch) :
+        print(test.__doc__, test(data).to_string(index = False, float_format = "{:.3f}".format),
+              sep = "\n", end = "\n\n")
+    if args.resamples :
+        from mtg import resampling
+        for test in (resampling.permutation_anova, resampling.bootstrap_intervals) :
+            table = test(data, resamples = args.resamples, workers = args.workers, seed = args.seed)
+            print(test.__doc__.splitlines()[0], table.to_string(index = False, float_format = "{:.3f}".format),
+                  sep = "\n", end = "\n\n")
+
+
+def trends(args) :
+    from mtg.datasets import CLEAN_FILE, TRENDS_FILE
+    from mtg.trends import TrendEngine
+    engine = TrendEngine.load(TRENDS_FILE)
+    added = engine.refresh(CLEAN_FILE)
+    engine.save(TRENDS_FILE)
+    print(f"{added} new decks, {len(engine)} in the trends.", end = "\n\n")
+    print("Means by year :", engine.means("Year").to_string(float_format = "{:.2f}".format), sep = "\n", end = "\n\n")
+    print("Variances :", engine.variances().to_string(float_format = "{:.3f}".format), sep = "\n", end = "\n\n")
+    if args.window :
+        print(f"Over {args.window} years :",
+              engine.rolling(args.window).to_string(index = False, float_format = "{:.2f}".format), sep = "\n")
+
+
+def plots(args) :
+    import matplotlib
+    matplotlib.use("Agg")
+    from mtg.datasets import load_clean
+    from mtg.rendering import render_figures
+    render_figures(load_clean(), args.output, formats = args.format, workers = args.workers, force = args.force)
+
+
+def archetypes(args) :
+    import numpy as np
+    from mtg.datasets import load_decklists
+    from mtg.similarity import SimilarityIndex
+    matrix = load_decklists()
+    labels = SimilarityIndex(matrix).archetypes(args.threshold)
+    sizes = np.bincount(labels[labels >= 0])
+    print(f"{len(matrix)} decks in {len(sizes)} archetypes.")
+    for archetype in range(min(args.top, len(sizes))) :
+        cards = matrix.take(np.flatnonzero(labels == archetype)).summary()["Card"].head(args.cards)
+        print(f"{archetype} ({sizes[archetype]} decks) : {', '.join(cards)}")
+
+
+def run(args) :
+    from mtg.datasets import CLEAN_FILE, save_clean
+    from mtg.pipeline import default_pipeline
+    if "figures" in (args.stages or ["figures"]) :
+        import matplotlib
+        matplotlib.use("Agg")
+    pipeline = default_pipeline(years = range(args.start, args.end + 1), as_lands = args.as_lands,
+                                offline = args.offline)
+    results = pipeline.run(args.stages or None, force = args.force)
+    ran = {name for name, status, _ in pipeline.runs if status == "ran"}
+    if "clean" in results and ("clean" in ran or not CLEAN_FILE.exists()) :
+        save_clean(results["clean"])
+    if "validate" in results and len(results["validate"]) :
+        print("Anomalies :", results["validate"].groupby(["Table", "Check"]).size().to_string(), sep = "\n")
+    if "tests" in results :
+        print(results["tests"].to_string(index = False, float_format = "{:.3f}".format))
+    if "figures" in results :
+        Path(args.output).mkdir(parents = True, exist_ok = True)
+        for name, image in results["figures"].items() :
+            path = Path(args.output, name + ".png")
+            if not path.exists() or path.read_bytes() != image :
+                path.write_bytes(image)
+    pipeline.report()
+
+
+def serve(args) :
+    from mtg.service import serve
+    serve(args.host, args.port, cache_size = args.cache_size)
+
+
+def report(args) :
+    from mtg.report import build_report
+    build_report(args.notebook, args.output, force = args.force)
+
+
+def main(argv = None) :
+    parser = argparse.ArgumentParser(prog = "python -m mtg", description = __doc__.splitlines()[0])
+    parser.add_argument("--profile", metavar = "FILE",
+                        help = "write a timing report (JSON trace events, worker processes included) to FILE")
+    commands = parser.add_subparsers(dest = "command", required = True)
+
+    command = commands.add_parser("scrape", help = "scrape the Worlds missing from raw_magic.csv")
+    command.add_argument("--start", type = int, default = 1994)
+    command.add_argument("--end", type = int, default = 2022)
+    command.add_argument("--offline", action = "store_true", help = "only use the cached pages")
+    command.add_argument("--cards", action = "store_true", help = "also collect the decklists in data/cards")
+    command.add_argument("--clean", action = "store_true",
+                         help = "also append the new decks, cleaned, to magic.csv as they are scraped")
+    command.add_argument("--as-lands", action = "store_true",
+                         help = "with --clean, count the double-faced cards land/non-land as lands")
+    command.add_argument("--no-archive", action = "store_true", help = "do not keep the pages in data/archive")
+    command.set_defaults(run = scrape)
+
+    command = commands.add_parser("crawl", help = "scrape other formats, events and levels in parallel shards")
+    command.add_argument("--formats", nargs = "+", default = ["ST"], help = "e.g. ST MO PI LE")
+    command.add_argument("--events", nargs = "+", default = ["world"],
+                         help = "the words of the event titles (\"\" for any event)")
+    command.add_argument("--levels", nargs = "+", default = ["P"], help = "P, M, C or R")
+    command.add_argument("--start", type = int, default = 1994)
+    command.add_argument("--end", type = int, default = 2022)
+    command.add_argument("--window", choices = ["year", "month"], default = "year", help = "the dates of a shard")
+    command.add_argument("--workers", type = int, default = 4)
+    command.add_argument("--rate", type = float, default = 4.0, help = "requests per second, for all the workers")
+    command.add_argument("--refresh", action = "store_true", help = "walk again the shards already complete")
+    command.add_argument("--offline", action = "store_true", help = "only use the cached pages")
+    command.add_argument("--ttl", type = float, help = "revalidate the cached pages older than this (seconds)")
+    command.add_argument("--cache-max-bytes", type = int, help = "the size the cache is trimmed to after every shard")
+    command.add_argument("--cache-max-age", type = float,
+                         help = "drop the cached pages not used for this long (seconds)")
+    command.add_argument("-o", "--output", help = "the directory of the shards (data/crawl by default)")
+    command.set_defaults(run = crawl)
+
+    command = commands.add_parser("reparse", help = "parse the pages of data/archive again into a raw table")
+    command.add_argument("--start", type = int, default = 1994)
+    command.add_argument("--end", type = int, default = 2022)
+    command.add_argument("--workers", type = int, default = 1)
+    command.add_argument("-o", "--output", help = "the csv file to write (data/raw_magic.reparsed.csv by default)")
+    command.set_defaults(run = reparse)
+
+    command = commands.add_parser("clean", help = "clean raw_magic.csv into magic.csv")
+    command.add_argument("--as-lands", action = "store_true",
+                         help = "count the double-faced cards land/non-land as lands")
+    command.add_argument("--chunk-size", type = int, default = 0,
+                         help = "clean the rows this many at a time, with a bounded memory use")
+    command.add_argument("--resolve-players", action = "store_true",
+                         help = "write every player with a single spelling (not with --chunk-size)")
+    command.set_defaults(run = clean)
+
+    command = commands.add_parser("players", help = "list the spellings of the players merged into one")
+    command.add_argument("--threshold", type = float, default = 0.92,
+                         help = "similarity above which two names are the same player")
+    command.set_defaults(run = players)
+
+    command = commands.add_parser("validate", help = "check magic.csv against its schema and list the anomalies")
+    command.add_argument("--raw", action = "store_true",
+                         help = "check the individual events of raw_magic.csv instead, before the corrections")
+    command.add_argument("--strict", action = "store_true", help = "exit with status 1 if there are anomalies")
+    command.set_defaults(run = validate)
+
+    command = commands.add_parser("stats", help = "run the statistical tests on magic.csv")
+    command.add_argument("--by", nargs = "+", metavar = "COLUMN",
+                         help = "run all the tests for every value of these columns (e.g. Year)")
+    command.add_argument("--resamples", type = int, default = 0,
+                         help = "also run the permutation ANOVA and the bootstrap intervals")
+    command.add_argument("--workers", type = int, default = 1)
+    command.add_argument("--seed", type = int, default = 0)
+    command.set_defaults(run = stats)
+
+    command = commands.add_parser("trends", help = "means and variances by year and rank, updated with the new decks")
+    command.add_argument("--window", type = int, default = 0, help = "also print them over rolling windows of years")
+    command.set_defaults(run = trends)
+
+    command = commands.add_parser("plots", help = "save the figures of the analysis")
+    command.add_argument("-o", "--output", default = "figures")
+    command.add_argument("--format", nargs = "+", default = ["png"], help = "e.g. png svg pdf")
+    command.add_argument("--workers", type = int, default = 1)
+    command.add_argument("--force", action = "store_true", help = "draw again the figures whose data did not change")
+    command.set_defaults(run = plots)
+
+    command = commands.add_parser("archetypes", help = "cluster the decklists of data/cards into archetypes")
+    command.add_argument("--threshold", type = float, default = 0.5,
+                         help = "estimated similarity linking two decks")
+    command.add_argument("--top", type = int, default = 20, help = "archetypes to print")
+    command.add_argument("--cards", type = int, default = 8, help = "most played cards to print")
+    command.set_defaults(run = archetypes)
+
+    command = commands.add_parser("run", help = "run the stages of the analysis whose inputs changed")
+    command.add_argument("stages", nargs = "*", metavar = "STAGE",
+                         help = "raw, events, corrections, clean, validate, tests or figures (all by default)")
+    command.add_argument("--force", nargs = "+", default = [], metavar = "STAGE",
+                         help = "run these stages even if cached (e.g. raw, to look for new decks)")
+    command.add_argument("--start", type = int, default = 1994)
+    command.add_argument("--end", type = int, default = 2022)
+    command.add_argument("--offline", action = "store_true", help = "only use the cached pages")
+    command.add_argument("--as-lands", action = "store_true",
+                         help = "count the double-faced cards land/non-land as lands")
+    command.add_argument("-o", "--output", default = "figures")
+    command.set_defaults(run = run)
+
+    command = commands.add_parser("serve", help = "answer queries on magic.csv with a local HTTP/JSON service")
+    command.add_argument("--host", default = "127.0.0.1")
+    command.add_argument("--port", type = int, default = 8050)
+    command.add_argument("--cache-size", type = int, default = 256, help = "answers kept in the cache")
+    command.set_defaults(run = serve)
+
+    command = commands.add_parser("report", help = "write the HTML report of MTG_project.py, running the changed cells")
+    command.add_argument("notebook", nargs = "?", default = "MTG_project.py")
+    command.add_argument("-o", "--output", default = "report")
+    command.add_argument("--force", action = "store_true", help = "run all the cells, even the cached ones")
+    command.set_defaults(run = report)
+
+    args = parser.parse_args(argv)
+    from mtg import profiling
+    if args.profile :
+        profiling.profile_to(args.profile)
+    with profiling.span(args.command) :
+        args.run(args)
+
+
+if __name__ == "__main__" :
+    main()
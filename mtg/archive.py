@@ -0,0 +1,201 @@
+"""Append-only archive of the pages downloaded from mtgtop8, to parse them again offline.
+
+The raw table is only as good as the parsing of the pages: a change in how
+the `div.O14` blocks become columns (e.g. `LANDS_(29)`) should not need the
+website again. The `Fetcher` of `mtg.scraping` therefore writes every page
+it gets to a `PageArchive`:
+- the pages are appended to segments `segment-NNNNN.gz` of at most
+  `segment_bytes`, every page being a gzip member of its own (a segment is
+  a valid gzip file, `zcat` reads it) holding the request key (see
+  `mtg.cache.request_key`) on its first line and the page after it,
+- `index.bin` has a fixed-size record per page: a hash of the request key
+  and of the page, the segment, offset and length of the member
+  (a page already archived with the same content is not written again).
+  It is read as a memory-mapped numpy array; the last record of a key is
+  the current version of its page.
+
+`reparse` rebuilds the raw table of some shards from the archive alone: the
+segments are decompressed and parsed by a pool of processes, one segment
+per task, then the rows of the search pages are joined to their deck pages
+by request key, without touching the network.
+
+    archive = PageArchive("data/archive")
+    scrape_incremental("data/raw_magic.csv", range(1994, 2023), archive = archive)
+    raw = reparse(archive, {year : worlds_shard(year) for year in range(1994, 2023)}, workers = 4)
+"""
+
+import gzip
+import hashlib
+import mmap
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from mtg.cache import request_key
+from mtg.parsing import parse_deck_page, parse_search_page
+from mtg.profiling import collect, count, span, traced
+from mtg.records import ColumnBuffer, deck_record
+from mtg.scraping import BASE_URL
+
+INDEX_FILE = "index.bin"
+
+INDEX_DTYPE = np.dtype([("key", "<u8"), ("content", "<u8"), ("offset", "<u8"), ("segment", "<u4"),
+                        ("length", "<u4")])
+
+# size above which a new segment is started
+SEGMENT_BYTES = 64 * 2 ** 20
+
+
+def _hash(data) :
+    """A 64-bit hash of the bytes `data`."""
+    return int.from_bytes(hashlib.blake2b(data, digest_size = 8).digest(), "little")
+
+
+def _read_segment(path, members) :
+    """The (key, page) of the gzip `members` (offset, length) of the segment `path`."""
+    pages = []
+    with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ) as data :
+        for offset, length in members :
+            key, _, page = gzip.decompress(data[offset:offset + length]).partition(b"\n")
+            pages.append((key.decode(), page.decode("utf-8")))
+    return pages
+
+
+def _parse_segment(path, members) :
+    """Parse the pages of a segment: request key -> listing of a search page or counts of a deck page."""
+    parsed = {}
+    for key, page in _read_segment(path, members) :
+        url = urlsplit(key)
+        if url.path.endswith("/search") :
+            parsed[key] = parse_search_page(page)
+        elif "d=" in url.query :
+            parsed[key] = parse_deck_page(page)
+    return parsed
+
+
+class PageArchive :
+
+    def __init__(self, directory, segment_bytes = SEGMENT_BYTES) :
+        self.directory = Path(directory)
+        self.directory.mkdir(parents = True, exist_ok = True)
+        self.segment_bytes = segment_bytes
+        self.index_file = self.directory / INDEX_FILE
+        self.index_file.touch()
+        self._index = None
+        # key hash -> position of its last record in the index
+        keys = self.index["key"]
+        _, last = np.unique(keys[::-1], return_index = True)
+        positions = len(keys) - 1 - last
+        self._latest = dict(zip(keys[positions].tolist(), positions.tolist()))
+        self._segment = int(self.index["segment"].max()) if len(self.index) else 0
+
+    def __len__(self) :
+        return len(self._latest)
+
+    @property
+    def index(self) :
+        """The records of `index.bin`, memory-mapped."""
+        records = self.index_file.stat().st_size // INDEX_DTYPE.itemsize
+        if self._index is None or len(self._index) != records :
+            self._index = (np.memmap(self.index_file, dtype = INDEX_DTYPE, mode = "r", shape = (records,))
+                           if records else np.zeros(0, dtype = INDEX_DTYPE))
+        return self._index
+
+    def segment_path(self, segment) :
+        return self.directory / f"segment-{segment:05d}.gz"
+
+    def add(self, url, params, text) :
+        """Archive the page `text` of the request; returns whether it was written."""
+        key = request_key(url, params)
+        data = text.encode("utf-8")
+        key_hash, content = _hash(key.encode()), _hash(data)
+        position = self._latest.get(key_hash)
+        if position is not None and self.index[position]["content"] == content :
+            return False
+        member = gzip.compress(key.encode() + b"\n" + data, mtime = 0)
+        path = self.segment_path(self._segment)
+        if path.exists() and path.stat().st_size + len(member) > self.segment_bytes :
+            self._segment += 1
+            path = self.segment_path(self._segment)
+        offset = path.stat().st_size if path.exists() else 0
+        # the page is on disk before the index points to it
+        with open(path, "ab") as file :
+            file.write(member)
+        record = np.array([(key_hash, content, offset, self._segment, len(member))], dtype = INDEX_DTYPE)
+        with open(self.index_file, "ab") as file :
+            file.write(record.tobytes())
+        self._latest[key_hash] = self.index_file.stat().st_size // INDEX_DTYPE.itemsize - 1
+        count("pages_archived")
+        count("archive_bytes", len(member))
+        return True
+
+    def get(self, url, params = None) :
+        """The last archived version of the page of the request, or None."""
+        position = self._latest.get(_hash(request_key(url, params).encode()))
+        if position is None :
+            return None
+        record = self.index[position]
+        members = [(int(record["offset"]), int(record["length"]))]
+        return _read_segment(self.segment_path(int(record["segment"])), members)[0][1]
+
+    def segments(self) :
+        """The current pages by segment, as segment -> list of (offset, length)."""
+        current = np.zeros(len(self.index), dtype = bool)
+        current[list(self._latest.values())] = True
+        segments = {}
+        for record in self.index[current] :
+            segments.setdefault(int(record["segment"]), []).append((int(record["offset"]), int(record["length"])))
+        return segments
+
+    def parse(self, workers = 1) :
+        """Parse all the current pages, one segment per task: request key -> parsed page."""
+        segments = self.segments()
+        paths = [self.segment_path(segment) for segment in segments]
+        with span("parse_archive", segments = len(segments), workers = workers) :
+            if workers == 1 or len(segments) <= 1 :
+                results = list(map(_parse_segment, paths, segments.values()))
+            else :
+                with ProcessPoolExecutor(max_workers = min(workers, len(segments))) as pool :
+                    results = list(map(collect, pool.map(traced(_parse_segment), paths, segments.values())))
+        parsed = {}
+        for result in results :
+            parsed.update(result)
+        return parsed
+
+
+def reparse(archive, shards, base_url = BASE_URL, workers = 1, keys = False) :
+    """The raw table of `shards` (key -> `mtg.scraping.Shard`) parsed again from `archive`.
+
+    The decks are in the order of a scrape: shard by shard, page by page;
+    with `keys = True` the table also has the shard, page and id of every
+    deck (see `mtg.records.KEY_COLUMNS`), e.g. to rebuild the manifest.
+    The pages of a shard are followed until the empty page closing its
+    results, or until a page missing from the archive; the decks whose page
+    is missing are left out (and counted).
+    """
+    pages = archive.parse(workers)
+    records = ColumnBuffer()
+    missing = 0
+    with span("reparse", shards = len(shards)) :
+        for key, shard in shards.items() :
+            seen = set()
+            page = 1
+            while True :
+                listing = pages.get(request_key(base_url + "search", shard.parameters(page)))
+                if not listing :
+                    break
+                for identifier, (row, link) in listing.items() :
+                    if identifier in seen :
+                        continue
+                    seen.add(identifier)
+                    deck = pages.get(request_key(base_url + link))
+                    if deck is None :
+                        missing += 1
+                        continue
+                    records.append(deck_record(row, deck, key, page, identifier))
+                page += 1
+    print(f"{len(records)} decks parsed again from {archive.directory}"
+          + (f", {missing} decks missing from the archive." if missing else "."))
+    return records.to_frame(keys = keys)
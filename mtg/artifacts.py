@@ -0,0 +1,115 @@
+"""On-disk cache of the results of the pipeline stages (see `mtg.pipeline`).
+
+An artifact is any picklable result (a DataFrame, a table of tests, the
+bytes of the figures) stored under the key of the stage which produced it,
+i.e. the hash of everything the result depends on. Like the cache of the
+downloaded pages (`mtg.cache`), every artifact has a small JSON entry in
+`index/` (its size and when it was last used) next to its body in
+`objects/`, with the hash of that body: a stage whose result did not
+change leaves the keys of the stages downstream unchanged. `evict` keeps the cache within `max_bytes` by dropping the
+least recently used artifacts first.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import time
+from pathlib import Path
+
+
+def content_digest(artifact, data = None) :
+    """The sha256 of an artifact, given its pickle `data` if already computed.
+
+    The pickle of a DataFrame depends on its memory layout (e.g. a slice of a
+    bigger frame or the same rows loaded from the cache), not only on its
+    content: DataFrames are hashed by their columns, dtypes and values.
+    """
+    import pandas as pd
+    if isinstance(artifact, pd.DataFrame) :
+        digest = hashlib.sha256(repr(list(zip(artifact.columns, artifact.dtypes.astype(str)))).encode())
+        digest.update(pd.util.hash_pandas_object(artifact, index = True).to_numpy().tobytes())
+        return digest.hexdigest()
+    if data is None :
+        data = pickle.dumps(artifact, protocol = pickle.HIGHEST_PROTOCOL)
+    return hashlib.sha256(data).hexdigest()
+
+
+class ArtifactCache :
+
+    def __init__(self, directory, max_bytes = None) :
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.index_dir = self.directory / "index"
+        self.objects_dir = self.directory / "objects"
+        self.index_dir.mkdir(parents = True, exist_ok = True)
+        self.objects_dir.mkdir(parents = True, exist_ok = True)
+
+    def _write(self, path, data) :
+        # write to a temporary file first, so that readers never see half a file
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+    def _entry_path(self, key) :
+        return self.index_dir / (key + ".json")
+
+    def __contains__(self, key) :
+        return self._entry_path(key).exists() and (self.objects_dir / key).exists()
+
+    def entry(self, key) :
+        """The index entry of the artifact `key` (size, digest, times), or None."""
+        try :
+            entry = json.loads(self._entry_path(key).read_text())
+        except (FileNotFoundError, ValueError) :
+            return None
+        return entry if (self.objects_dir / key).exists() else None
+
+    def load(self, key) :
+        """The artifact stored under `key` (a `KeyError` if there is none), marked as recently used."""
+        try :
+            entry = json.loads(self._entry_path(key).read_text())
+            data = (self.objects_dir / key).read_bytes()
+        except (FileNotFoundError, ValueError) :
+            raise KeyError(key) from None
+        entry["used_at"] = time.time()
+        self._write(self._entry_path(key), json.dumps(entry).encode())
+        return pickle.loads(data)
+
+    def store(self, key, artifact, stage = None) :
+        """Save `artifact` under `key`; returns the digest of its content."""
+        data = pickle.dumps(artifact, protocol = pickle.HIGHEST_PROTOCOL)
+        digest = content_digest(artifact, data)
+        self._write(self.objects_dir / key, data)
+        now = time.time()
+        entry = {"key" : key, "stage" : stage, "size" : len(data), "digest" : digest,
+                 "created_at" : now, "used_at" : now}
+        self._write(self._entry_path(key), json.dumps(entry).encode())
+        if self.max_bytes is not None :
+            self.evict(keep = key)
+        return digest
+
+    def entries(self) :
+        for path in self.index_dir.glob("*.json") :
+            try :
+                yield path, json.loads(path.read_text())
+            except ValueError :
+                path.unlink(missing_ok = True)
+
+    def evict(self, keep = None) :
+        """Drop the least recently used artifacts beyond `max_bytes`; return how many.
+
+        The artifact `keep` (the one just stored) is never dropped.
+        """
+        entries = sorted(self.entries(), key = lambda item : (item[1]["key"] == keep, item[1]["used_at"]),
+                         reverse = True)
+        total = 0
+        dropped = 0
+        for path, entry in entries :
+            if self.max_bytes is not None and total + entry["size"] > self.max_bytes and entry["key"] != keep :
+                path.unlink(missing_ok = True)
+                (self.objects_dir / entry["key"]).unlink(missing_ok = True)
+                dropped += 1
+            else :
+                total += entry["size"]
+        return dropped
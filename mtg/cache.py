@@ -0,0 +1,160 @@
+"""On-disk cache of the raw responses of mtgtop8.
+
+Pages are stored content-addressed: the body of a response is saved once
+under the SHA-256 of its content in `objects/`, and a small JSON entry in
+`index/` maps the request (URL and query parameters) to that body together
+with its validators (ETag, Last-Modified). Identical pages, e.g. the empty
+search pages closing every year, are therefore stored only once.
+
+An entry younger than `ttl` seconds is served without touching the network;
+an older one is revalidated with a conditional request, so that an
+unchanged page costs a 304 instead of a download. With `ttl = None` entries
+never expire, which suits the results of past events; the search pages of
+the shards still ongoing are revalidated at every request whatever the
+`ttl` (see `mtg.scraping.Fetcher.get`), so that their new decks are found.
+`evict`, called after every scrape, keeps the cache within `max_bytes`
+(`MAX_BYTES` by default), dropping the least recently used pages first,
+and drops the entries not used for `max_age` seconds (`MAX_AGE`).
+"""
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from urllib.parse import urlencode
+
+
+# the default limits of the cache: the pages of some ten years of crawl, and a year without use
+MAX_BYTES = 2 * 2 ** 30
+MAX_AGE = 365 * 24 * 3600
+
+# the age (seconds) under which a body without entry is kept, as its entry may be being written
+ORPHAN_GRACE = 3600
+
+
+def request_key(url, params = None) :
+    """Canonical form of a request: the URL followed by its sorted parameters."""
+    if not params :
+        return url
+    return url + "?" + urlencode(sorted(params.items()))
+
+
+class ResponseCache :
+
+    def __init__(self, directory, ttl = None, max_bytes = MAX_BYTES, max_age = MAX_AGE) :
+        self.directory = Path(directory)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.index_dir = self.directory / "index"
+        self.objects_dir = self.directory / "objects"
+        self.index_dir.mkdir(parents = True, exist_ok = True)
+        self.objects_dir.mkdir(parents = True, exist_ok = True)
+
+    def _entry_path(self, key) :
+        return self.index_dir / (hashlib.sha256(key.encode()).hexdigest() + ".json")
+
+    def _write(self, path, data) :
+        # write to a temporary file first, so that readers never see half a file
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+    def _save_entry(self, entry) :
+        self._write(self._entry_path(entry["key"]), json.dumps(entry).encode())
+
+    def lookup(self, url, params = None) :
+        """Return the entry cached for the request, or None."""
+        path = self._entry_path(request_key(url, params))
+        try :
+            entry = json.loads(path.read_text())
+        except (FileNotFoundError, ValueError) :
+            return None
+        if not (self.objects_dir / entry["body"]).exists() :
+            return None
+        return entry
+
+    def is_fresh(self, entry) :
+        return self.ttl is None or time.time() - entry["validated_at"] < self.ttl
+
+    def validators(self, entry) :
+        """Headers of a conditional request revalidating `entry`."""
+        headers = {}
+        if entry.get("etag") :
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified") :
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def read(self, entry) :
+        """Return the text of the cached page and mark it as recently used."""
+        entry["used_at"] = time.time()
+        self._save_entry(entry)
+        return (self.objects_dir / entry["body"]).read_bytes().decode("utf-8")
+
+    def revalidated(self, entry) :
+        """Record that the server confirmed `entry` is still current (a 304)."""
+        entry["validated_at"] = time.time()
+        return self.read(entry)
+
+    def store(self, url, params, headers, text) :
+        """Cache the body `text` of a successful response to the request."""
+        data = text.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        body = self.objects_dir / digest
+        if not body.exists() :
+            self._write(body, data)
+        now = time.time()
+        entry = {"key" : request_key(url, params),
+                 "body" : digest,
+                 "size" : len(data),
+                 "etag" : headers.get("ETag"),
+                 "last_modified" : headers.get("Last-Modified"),
+                 "validated_at" : now,
+                 "used_at" : now}
+        self._save_entry(entry)
+        return entry
+
+    def entries(self) :
+        for path in self.index_dir.glob("*.json") :
+            try :
+                yield path, json.loads(path.read_text())
+            except FileNotFoundError :
+                # evicted meanwhile by another process sharing the cache
+                continue
+            except ValueError :
+                path.unlink(missing_ok = True)
+
+    def evict(self) :
+        """Apply the age and size limits; return the number of dropped entries."""
+        now = time.time()
+        entries = sorted(self.entries(), key = lambda item : item[1]["used_at"], reverse = True)
+        kept = {}
+        evicted = set()
+        total = 0
+        dropped = 0
+        for path, entry in entries :
+            too_old = self.max_age is not None and now - entry["used_at"] > self.max_age
+            # a body shared by several entries is counted once
+            size = 0 if entry["body"] in kept else entry["size"]
+            too_big = self.max_bytes is not None and total + size > self.max_bytes
+            if too_old or too_big :
+                path.unlink(missing_ok = True)
+                evicted.add(entry["body"])
+                dropped += 1
+            else :
+                kept[entry["body"]] = True
+                total += size
+        for body in self.objects_dir.iterdir() :
+            if body.name in kept or body.name.endswith(".tmp") :
+                continue
+            if body.name not in evicted :
+                # a body without entry may have been stored after the entries were listed (by another process)
+                try :
+                    if now - body.stat().st_mtime < ORPHAN_GRACE :
+                        continue
+                except FileNotFoundError :
+                    continue
+            body.unlink(missing_ok = True)
+        return dropped
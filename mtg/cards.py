@@ -0,0 +1,230 @@
+"""Decklists as sparse deck x card matrices.
+
+The cards of the scraped decks are not stored as one row per deck and card
+with the card names repeated, but interned: every distinct card name gets
+an integer id (its position in `names`) and the decklists of a board
+(mainboard or sideboard) are a matrix in CSR form, i.e. three arrays:
+- `indptr` (int64): the cards of the deck `i` are at positions
+  `indptr[i]:indptr[i + 1]` of the two arrays below,
+- `indices` (uint32): the ids of the cards,
+- `counts` (uint16): how many copies of them the deck plays.
+A deck costs 6 bytes per distinct card, so hundreds of thousands of decks
+fit in a few tens of MB, and aggregates over the cards are single numpy
+reductions (e.g. `np.bincount(indices, counts)` for the total copies of
+every card).
+
+The decklists are collected while scraping by a `CardBuffer` and saved,
+every `chunk_size` decks, as a new part of a card store directory (one
+directory per part, one `.npy` file per array, as in `mtg.storage`);
+`load_cards` merges the parts back into a single `CardMatrix`.
+"""
+
+import json
+import shutil
+from array import array
+from collections import namedtuple
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+BOARDS = ("md", "sb")
+
+CSR = namedtuple("CSR", ["indptr", "indices", "counts"])
+
+
+def _csr(indptr, indices, counts) :
+    return CSR(np.asarray(indptr, dtype = np.int64), np.asarray(indices, dtype = np.uint32),
+               np.asarray(counts, dtype = np.uint16))
+
+
+class CardMatrix :
+    """The decklists of the decks `deck_ids`: a `CSR` matrix per board
+    (`main`, `side`) over the card dictionary `names`."""
+
+    def __init__(self, deck_ids, names, main, side) :
+        self.deck_ids = np.asarray(deck_ids, dtype = str)
+        self.names = list(names)
+        self.main = main
+        self.side = side
+
+    def __len__(self) :
+        return len(self.deck_ids)
+
+    def board(self, board = "md") :
+        if board not in BOARDS :
+            raise ValueError(f"board must be one of {BOARDS}, not {board!r}")
+        return self.main if board == "md" else self.side
+
+    def card_ids(self, names) :
+        """The ids of the cards `names` (-1 for the cards never seen)."""
+        return pd.Index(self.names).get_indexer(list(names))
+
+    def copies(self, board = "md") :
+        """Total number of copies of every card, over all the decks."""
+        matrix = self.board(board)
+        return np.bincount(matrix.indices, matrix.counts, minlength = len(self.names)).astype(np.int64)
+
+    def decks(self, board = "md") :
+        """Number of decks playing every card."""
+        return np.bincount(self.board(board).indices, minlength = len(self.names))
+
+    def deck_sizes(self, board = "md") :
+        """Number of cards of every deck."""
+        matrix = self.board(board)
+        cumulative = np.concatenate([[0], np.cumsum(matrix.counts, dtype = np.int64)])
+        return cumulative[matrix.indptr[1:]] - cumulative[matrix.indptr[:-1]]
+
+    def summary(self, board = "md") :
+        """A table of the cards: number of decks playing them, copies and mean copies per deck."""
+        frame = pd.DataFrame({"Card" : self.names, "Decks" : self.decks(board), "Copies" : self.copies(board)})
+        frame["Copies_per_deck"] = frame["Copies"] / frame["Decks"].where(frame["Decks"] > 0)
+        return frame.sort_values(["Decks", "Copies"], ascending = False, kind = "stable").reset_index(drop = True)
+
+    def decklist(self, deck_id, board = "md") :
+        """The cards of `deck_id`, as a dictionary name -> copies."""
+        row = np.flatnonzero(self.deck_ids == str(deck_id))
+        if len(row) == 0 :
+            raise KeyError(deck_id)
+        matrix = self.board(board)
+        start, end = matrix.indptr[row[-1]], matrix.indptr[row[-1] + 1]
+        return {self.names[card] : int(count)
+                for card, count in zip(matrix.indices[start:end], matrix.counts[start:end])}
+
+    def select(self, deck_ids) :
+        """The decklists of `deck_ids` only, in their order (unknown ids are left out)."""
+        position = pd.Index(self.deck_ids).get_indexer(np.asarray(deck_ids, dtype = str))
+        return self.take(position[position >= 0])
+
+    def take(self, rows) :
+        """The decklists of the decks at the positions `rows`."""
+        rows = np.asarray(rows, dtype = np.int64)
+        boards = []
+        for matrix in (self.main, self.side) :
+            starts = matrix.indptr[rows]
+            lengths = matrix.indptr[rows + 1] - starts
+            indptr = np.concatenate([[0], np.cumsum(lengths)])
+            # the positions of the cards of the rows, in one go
+            take = np.arange(indptr[-1]) - np.repeat(indptr[:-1] - starts, lengths)
+            boards.append(_csr(indptr, matrix.indices[take], matrix.counts[take]))
+        return CardMatrix(self.deck_ids[rows], self.names, *boards)
+
+    def to_scipy(self, board = "md") :
+        """The board as a `scipy.sparse.csr_matrix` (decks x cards)."""
+        from scipy.sparse import csr_matrix
+        matrix = self.board(board)
+        return csr_matrix((matrix.counts, matrix.indices, matrix.indptr), shape = (len(self), len(self.names)))
+
+
+class CardBuffer :
+    """Accumulate decklists in compact arrays, interning the card names.
+
+    Like `mtg.records.ColumnBuffer`, every `chunk_size` decks the buffer is
+    turned into a `CardMatrix` and handed to `sink`, together with the keys
+    (shard, page, deck id) of the decks, then emptied.
+    """
+
+    def __init__(self, chunk_size = None, sink = None) :
+        self.chunk_size = chunk_size
+        self.sink = sink
+        self._clear()
+
+    def _clear(self) :
+        self.ids = {}
+        self.names = []
+        self.keys = []
+        self.boards = {board : (array("q", [0]), array("I"), array("H")) for board in BOARDS}
+
+    def __len__(self) :
+        return len(self.keys)
+
+    def intern(self, name) :
+        if name not in self.ids :
+            self.ids[name] = len(self.names)
+            self.names.append(name)
+        return self.ids[name]
+
+    def append(self, shard, page, deck_id, cards) :
+        """Add the `cards` (board, quantity, name) of a deck; a card listed twice is summed."""
+        decklist = {board : {} for board in BOARDS}
+        for board, quantity, name in cards :
+            if board in decklist :
+                card = self.intern(name)
+                decklist[board][card] = decklist[board].get(card, 0) + quantity
+        for board, (indptr, indices, counts) in self.boards.items() :
+            indices.extend(decklist[board].keys())
+            counts.extend(decklist[board].values())
+            indptr.append(len(indices))
+        self.keys.append((str(shard), page, str(deck_id)))
+        if self.sink is not None and self.chunk_size is not None and len(self) >= self.chunk_size :
+            self.flush()
+
+    def to_matrix(self) :
+        boards = [_csr(*self.boards[board]) for board in BOARDS]
+        return CardMatrix([deck for _, _, deck in self.keys], self.names, *boards)
+
+    def flush(self) :
+        """Hand the buffered decklists to the sink (if any) and empty the buffer."""
+        matrix, keys = self.to_matrix(), self.keys
+        if self.sink is not None and len(self) :
+            self.sink(matrix, keys)
+        self._clear()
+        return matrix
+
+
+def concat(matrices) :
+    """Stack the decks of several `CardMatrix`, merging their card dictionaries."""
+    matrices = list(matrices)
+    names = list(dict.fromkeys(name for matrix in matrices for name in matrix.names))
+    index = pd.Index(names)
+    boards = []
+    for board in BOARDS :
+        parts = [matrix.board(board) for matrix in matrices]
+        offsets = np.cumsum([0] + [len(part.indices) for part in parts[:-1]])
+        indptr = np.concatenate([[0]] + [part.indptr[1:] + offset for part, offset in zip(parts, offsets)])
+        # the ids of every matrix are translated into the merged dictionary
+        indices = np.concatenate([[]] + [index.get_indexer(matrix.names)[part.indices]
+                                          for matrix, part in zip(matrices, parts) if len(part.indices)])
+        counts = np.concatenate([[]] + [part.counts for part in parts])
+        boards.append(_csr(indptr, indices, counts))
+    return CardMatrix(np.concatenate([[]] + [matrix.deck_ids for matrix in matrices]).astype(str),
+                      names, *boards)
+
+
+ARRAYS = [(board, field) for board in BOARDS for field in CSR._fields]
+
+
+def save_cards(matrix, directory) :
+    """Save `matrix` as a new part of the card store `directory`."""
+    directory = Path(directory)
+    directory.mkdir(parents = True, exist_ok = True)
+    number = 1 + max((int(part.name.split("-")[1]) for part in directory.glob("part-*[0-9]")), default = 0)
+    part = directory / f"part-{number:06d}"
+    tmp = part.with_name(part.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors = True)
+    tmp.mkdir()
+    np.save(tmp / "deck_ids.npy", matrix.deck_ids, allow_pickle = False)
+    for board, field in ARRAYS :
+        np.save(tmp / f"{board}_{field}.npy", getattr(matrix.board(board), field), allow_pickle = False)
+    (tmp / "names.json").write_text(json.dumps(matrix.names, ensure_ascii = False))
+    tmp.rename(part)
+    return part
+
+
+def load_part(part) :
+    part = Path(part)
+    boards = [CSR(*(np.load(part / f"{board}_{field}.npy") for field in CSR._fields)) for board in BOARDS]
+    return CardMatrix(np.load(part / "deck_ids.npy"), json.loads((part / "names.json").read_text()), *boards)
+
+
+def load_cards(directory) :
+    """All the decklists of the card store `directory`, in a single `CardMatrix`.
+
+    A deck saved more than once (e.g. after a refresh) keeps its last decklist.
+    """
+    parts = sorted(path for path in Path(directory).glob("part-*") if not path.name.endswith(".tmp"))
+    matrix = concat(load_part(part) for part in parts)
+    _, last = np.unique(matrix.deck_ids[::-1], return_index = True)
+    if len(last) < len(matrix) :
+        matrix = matrix.take(np.sort(len(matrix) - 1 - last))
+    return matrix
@@ -0,0 +1,225 @@
+"""The cleaning of `raw_magic.csv` as a sequence of vectorized transforms.
+
+Every step works on whole columns at once, so that cleaning takes a fixed
+number of passes over the data whatever its size:
+- `drop_events` removes the team events and the partial standings,
+- `apply_corrections` joins the table of hand-made corrections
+  (`data/rank_corrections.csv`, keyed by year and player) to fix ranks and
+  player names in a single lookup; the players are matched by their
+  normalized names (see `mtg.players.player_key`), so that a correction
+  does not depend on how mtgtop8 spells them,
+- `coalesce_lands` merges the `LANDS` and `LANDS_(NN)` columns in one pass.
+
+`clean` chains them, as done step by step in MTG_project.py, through
+`select_events`, `correct_ranks` and `finish`, which are also the cleaning
+stages of `mtg.pipeline`. With `resolve = True` it also writes every
+player with a single spelling (see `mtg.players.resolve_players`).
+
+Every step only looks at one row at a time (the corrections are a lookup
+by year and player), so the raw rows can also be cleaned a chunk at a
+time, with a memory use that does not depend on the size of the data set:
+`clean_chunks` is a generator cleaning the chunks it is given,
+`clean_csv` cleans `raw_magic.csv` chunk by chunk and `StreamingCleaner`
+cleans the rows of the scraper as they are scraped (see
+`python -m mtg scrape --clean`).
+"""
+
+import os
+import re
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from mtg.datasets import CORRECTIONS_FILE
+from mtg.manifest import append_rows
+from mtg.players import player_keys, resolve_players
+from mtg.profiling import count, span
+
+# team events (World Magic Cup) and partial standings
+EXCLUDED_EVENTS = ["Cup", "Undefeated", "15 points"]
+
+# the ranks of the top 4, as reported by mtgtop8
+TOP_RANKS = ["1", "2", "3", "4", "3-4"]
+
+# years whose ranks on mtgtop8 are wrong: only the ones in the corrections are kept
+RESET_YEARS = [2014]
+
+CARD_TYPES = {"CREATURES" : "Creatures",
+              "INSTANTS_and_SORC." : "Instants_Sorceries",
+              "OTHER_SPELLS" : "Other_spells"}
+
+# the columns of raw_magic.csv a chunk of rows may lack (e.g. no deck of it has other spells)
+RAW_COLUMNS = ["Level", "Format", "LANDS", "CREATURES", "INSTANTS_and_SORC.", "OTHER_SPELLS", "SIDEBOARD"]
+
+# the columns of magic.csv
+CLEAN_COLUMNS = ["Deck", "Player", "Event", "Rank", "Date", "Creatures", "Instants_Sorceries", "Other_spells",
+                 "Lands"]
+
+
+def drop_events(data, patterns = EXCLUDED_EVENTS) :
+    """Drop the rows whose event contains one of `patterns`."""
+    pattern = "|".join(re.escape(text) for text in patterns)
+    return data[~data["Event"].str.contains(pattern)]
+
+
+def load_corrections(file = CORRECTIONS_FILE) :
+    corrections = pd.read_csv(file, dtype = {"Rank" : str})
+    keys = pd.DataFrame({"Year" : corrections["Year"], "Player" : player_keys(corrections["Player"])})
+    if keys.duplicated().any() :
+        raise ValueError(f"{file} has more than one correction for the same year and player")
+    return corrections
+
+
+def apply_corrections(data, corrections, reset_years = RESET_YEARS, ranks = TOP_RANKS) :
+    """Fix ranks and player names with the table `corrections`.
+
+    A row matching the (Year, Player) of a correction, the players being
+    compared by key (see `mtg.players.player_key`), gets its Rank and, if
+    given, its Corrected_player. As the corrections only concern the top 4,
+    ranks are only corrected on rows ranked in `ranks`, except in the
+    `reset_years`, whose ranks are all discarded but the corrected ones.
+    """
+    year = data["Date"].dt.year.to_numpy()
+    table = corrections.set_index([corrections["Year"], player_keys(corrections["Player"])])
+    position = table.index.get_indexer(pd.MultiIndex.from_arrays([year, player_keys(data["Player"])]))
+    matched = position >= 0
+
+    reset = np.isin(year, reset_years)
+    corrected = matched & (reset | data["Rank"].isin(ranks).to_numpy())
+    rank = np.where(corrected, table["Rank"].to_numpy()[position],
+                    np.where(reset, np.nan, data["Rank"].to_numpy(dtype = object)))
+
+    new_name = table["Corrected_player"].to_numpy()[position]
+    renamed = matched & pd.notna(new_name)
+    player = np.where(renamed, new_name, data["Player"].to_numpy(dtype = object))
+    return data.assign(Rank = rank, Player = player)
+
+
+def coalesce_lands(data, as_lands = False) :
+    """Merge the `LANDS` and `LANDS_(NN)` columns into a single `Lands` one.
+
+    The `LANDS_(NN)` columns count decks with double-faced cards one face of
+    which is a land. By default these cards are not lands and the count
+    reported is kept; with `as_lands = True` they are and the deck counts
+    NN lands (the smallest NN, if more than one column is filled).
+    """
+    lands_columns = [col for col in data.columns if "LANDS" in col]
+    if as_lands :
+        nn_columns = sorted((col for col in lands_columns if col != "LANDS"),
+                            key = lambda col : int(col.strip("LANDS_()")))
+        nn = np.array([int(col.strip("LANDS_()")) for col in nn_columns])
+        filled = data[nn_columns].notna().to_numpy()
+        lands = data["LANDS"]
+        if nn_columns :
+            lands = np.where(filled.any(axis = 1), nn[filled.argmax(axis = 1)], lands)
+    else :
+        # the last filled column wins, as the scraped columns never overlap
+        lands = data[lands_columns].ffill(axis = 1).iloc[:, -1]
+    return data.drop(labels = lands_columns, axis = 1).assign(Lands = lands).rename(columns = CARD_TYPES)
+
+
+def select_events(raw) :
+    """The individual events of the raw data set, without the unused columns."""
+    data = raw.drop(labels = ["Level", "SIDEBOARD", "Format"], axis = 1)
+    return drop_events(data)
+
+
+def correct_ranks(data, corrections) :
+    """Apply the `corrections` and keep the top 4 only."""
+    data = apply_corrections(data, corrections)
+    return data[data["Rank"].isin(TOP_RANKS)]
+
+
+def finish(data, as_lands = False) :
+    """Merge the land columns, drop the decks without lands and cast the ranks.
+
+    A rank shared by two places (e.g. "3-4") which no correction split
+    cannot be cast: those decks are dropped, with a warning.
+    """
+    data = coalesce_lands(data, as_lands)
+    data = data[data["Lands"].notna()]
+    data = data.fillna(0)
+    shared = ~data["Rank"].astype(str).str.fullmatch(r"\d+").to_numpy(dtype = bool)
+    if shared.any() :
+        count("shared_ranks_dropped", int(shared.sum()))
+        warnings.warn(f"{shared.sum()} decks ranked {sorted(set(data['Rank'][shared].astype(str)))} have no "
+                      f"correction in the rank corrections and were dropped", stacklevel = 2)
+        data = data[~shared]
+    data["Rank"] = data["Rank"].astype(int).astype("category")
+    return data
+
+
+def clean(raw, corrections = None, as_lands = False, resolve = False) :
+    """The cleaned data set `magic.csv` obtained from the raw one.
+
+    With `resolve = True` the spellings of a player are merged into one.
+    """
+    corrections = load_corrections() if corrections is None else corrections
+    count("rows_cleaned", len(raw))
+    with span("select_events", rows = len(raw)) :
+        data = select_events(raw)
+    with span("correct_ranks", rows = len(data)) :
+        data = correct_ranks(data, corrections)
+    with span("finish", rows = len(data)) :
+        data = finish(data, as_lands)
+    if resolve :
+        with span("resolve_players", rows = len(data)) :
+            data["Player"] = resolve_players(data["Player"])
+    return data
+
+
+def clean_chunk(raw, corrections, as_lands = False, date_format = "%d/%m/%y") :
+    """Clean some rows of raw_magic.csv, as read from the csv or scraped (dates as strings)."""
+    raw = raw.reindex(columns = list(dict.fromkeys(list(raw.columns) + RAW_COLUMNS)))
+    raw = raw.assign(Date = pd.to_datetime(raw["Date"], format = date_format),
+                     Rank = raw["Rank"].astype(object))
+    return clean(raw, corrections, as_lands)[CLEAN_COLUMNS]
+
+
+def clean_chunks(chunks, corrections = None, as_lands = False) :
+    """Generator of the cleaned `chunks` of raw rows (see `clean_chunk`)."""
+    corrections = load_corrections() if corrections is None else corrections
+    for chunk in chunks :
+        yield clean_chunk(chunk, corrections, as_lands)
+
+
+def clean_csv(raw_file, clean_file, chunk_size = 10000, corrections = None, as_lands = False) :
+    """Clean the csv `raw_file` into `clean_file`, `chunk_size` rows at a time; returns the rows written.
+
+    The result is the same as `clean` on the whole file. `clean_file` is
+    only replaced once complete.
+    """
+    clean_file = Path(clean_file)
+    tmp = clean_file.with_name(f"{clean_file.name}.{os.getpid()}.tmp")
+    chunks = pd.read_csv(raw_file, chunksize = chunk_size, dtype = {"Rank" : str, "Event" : str})
+    written = 0
+    for number, data in enumerate(clean_chunks(chunks, corrections, as_lands)) :
+        data.to_csv(tmp, mode = "w" if number == 0 else "a", header = number == 0, index = False)
+        written += len(data)
+    if not tmp.exists() :
+        pd.DataFrame(columns = CLEAN_COLUMNS).to_csv(tmp, index = False)
+    os.replace(tmp, clean_file)
+    return written
+
+
+class StreamingCleaner :
+    """A sink for the rows of the scraper (see `mtg.scraping.ingest`), appending
+    them to `clean_file` as soon as they are cleaned.
+
+    Only the rows given to it are cleaned: to start from a `clean_file`
+    consistent with `raw_magic.csv`, clean it once (`clean_csv`).
+    """
+
+    def __init__(self, clean_file, corrections = None, as_lands = False) :
+        self.clean_file = Path(clean_file)
+        self.corrections = load_corrections() if corrections is None else corrections
+        self.as_lands = as_lands
+        self.written = 0
+
+    def __call__(self, rows) :
+        data = clean_chunk(rows, self.corrections, self.as_lands)
+        if len(data) :
+            append_rows(self.clean_file, data)
+        self.written += len(data)
@@ -0,0 +1,109 @@
+"""Parallel crawl of mtgtop8 beyond the Standard Worlds.
+
+A `CrawlSpec` lists the formats, the event filters, the competition levels
+and the dates to crawl. It is split into independent shards (one per
+format, event filter and date window, see `mtg.scraping.Shard`), which a
+pool of processes scrapes in parallel. Every shard is written to its own
+csv file in the crawl directory, next to its manifest, which doubles as a
+checkpoint: when a crawl is interrupted, running it again skips the shards
+already complete and, within the others, the decks already saved.
+
+    spec = CrawlSpec(formats = ("ST", "MO", "PI", "LE"), events = ("",),
+                     levels = ("P", "M"), start = 2015, end = 2022)
+    crawl(spec, "data/crawl", workers = 4, cache_dir = "data/http_cache")
+    decks = load_crawl("data/crawl")
+
+or from the command line, `python -m mtg crawl --formats ST MO PI LE
+--events "" --levels P M --start 2015 --end 2022 --workers 4`. The
+responses are kept in the cache `cache_dir`, with the policy given by
+`cache_options` (the `ttl`, `max_bytes` and `max_age` of
+`mtg.cache.ResponseCache`).
+"""
+
+import datetime
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import pandas as pd
+
+from mtg.cache import ResponseCache
+from mtg.profiling import collect, traced
+from mtg.scraping import BASE_URL, Shard, ingest
+
+WINDOWS = ("year", "month")
+
+
+class CrawlSpec(namedtuple("CrawlSpec", ["formats", "events", "levels", "start", "end", "window"],
+                           defaults = [("ST",), ("world",), ("P",), 1994, 2022, "year"])) :
+    """What to crawl: the decks of every format in `formats` played in the
+    events whose title contains one of `events` ("" for any event), of the
+    competition levels `levels`, from year `start` to year `end` included,
+    in date windows of a "year" or a "month".
+    """
+
+    def windows(self) :
+        if self.window not in WINDOWS :
+            raise ValueError(f"window must be one of {WINDOWS}, not {self.window!r}")
+        for year in range(self.start, self.end + 1) :
+            if self.window == "year" :
+                yield datetime.date(year, 1, 1), datetime.date(year, 12, 31)
+                continue
+            for month in range(1, 13) :
+                first = datetime.date(year, month, 1)
+                following = datetime.date(year + month // 12, month % 12 + 1, 1)
+                yield first, following - datetime.timedelta(days = 1)
+
+    def shards(self) :
+        return [Shard(format, event, tuple(self.levels), date_start, date_end)
+                for format in self.formats
+                for event in self.events
+                for date_start, date_end in self.windows()]
+
+
+def crawl_shard(shard, directory, refresh = False, base_url = BASE_URL, cache_dir = None, cache_options = None,
+                **fetcher_options) :
+    """Scrape `shard` into `<directory>/<shard name>.csv`; return the new decks.
+
+    The responses are cached in `cache_dir`, with the `ResponseCache`
+    keyword arguments `cache_options`.
+    """
+    if cache_dir is not None :
+        fetcher_options["cache"] = ResponseCache(cache_dir, **(cache_options or {}))
+    data_file = Path(directory, shard.name + ".csv")
+    return ingest(data_file, {shard.name : shard}, refresh = refresh, base_url = base_url,
+                  **fetcher_options)
+
+
+def crawl(spec, directory, workers = 4, refresh = False, base_url = BASE_URL, cache_dir = None,
+          cache_options = None, rate = 4.0, **fetcher_options) :
+    """Crawl the shards of `spec` with a pool of `workers` processes.
+
+    `rate` is the total number of requests per second to mtgtop8, shared
+    among the workers. A shard that fails is reported and left to the next
+    run, the others go on. Returns a dictionary shard name -> new decks.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents = True, exist_ok = True)
+    fetcher_options["rate"] = rate / workers if rate else rate
+    added = {}
+    with ProcessPoolExecutor(max_workers = workers) as pool :
+        futures = {pool.submit(traced(crawl_shard), shard, directory, refresh, base_url, cache_dir,
+                               cache_options, **fetcher_options) : shard
+                   for shard in spec.shards()}
+        for future in as_completed(futures) :
+            shard = futures[future]
+            try :
+                added[shard.name] = collect(future.result())
+            except Exception as error :
+                print(f"Shard {shard.name} failed ({error!r}); it will resume on the next run.")
+    print(f"Crawl finished : {sum(added.values())} new decks in {len(added)} shards.")
+    return added
+
+
+def load_crawl(directory) :
+    """All the decks scraped in the crawl `directory`, in a single DataFrame."""
+    files = sorted(Path(directory).glob("*.csv"))
+    if files == [] :
+        return pd.DataFrame()
+    return pd.concat([pd.read_csv(file) for file in files], ignore_index = True)
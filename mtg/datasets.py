@@ -0,0 +1,70 @@
+"""Where the data sets live, and how to load them.
+
+    from mtg.datasets import load_clean
+    data = load_clean(columns = ["Date", "Rank", "Lands"], start = "2010-01-01")
+"""
+
+import os
+from pathlib import Path
+
+import pandas as pd
+
+from mtg.profiling import span
+from mtg.storage import is_stale, load_csv_table, load_table, save_table
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+
+RAW_FILE = DATA_DIR / "raw_magic.csv"
+CLEAN_FILE = DATA_DIR / "magic.csv"
+CORRECTIONS_FILE = DATA_DIR / "rank_corrections.csv"
+STORE_DIR = DATA_DIR / "store"
+CACHE_DIR = DATA_DIR / "http_cache"
+CARDS_DIR = DATA_DIR / "cards"
+ARCHIVE_DIR = DATA_DIR / "archive"
+CRAWL_DIR = DATA_DIR / "crawl"
+TRENDS_FILE = STORE_DIR / "trends.json"
+
+# the card type counts of the cleaned data set
+CARD_COUNTS = ["Creatures", "Instants_Sorceries", "Other_spells", "Lands"]
+
+
+def load_raw(data_dir = DATA_DIR) :
+    """The raw data set, through its columnar copy (see `mtg.storage`)."""
+    with span("load_raw") :
+        return load_csv_table(Path(data_dir, RAW_FILE.name), Path(data_dir, "store", "raw_magic"))
+
+
+def save_clean(data, data_dir = DATA_DIR) :
+    """Write the cleaned data set as csv and in the columnar store.
+
+    The csv is written to a new file replacing the old one, so that its
+    readers (e.g. `mtg.trends.TrendEngine.refresh`) tell a rewrite from an
+    append by the inode.
+    """
+    with span("save_clean", rows = len(data)) :
+        clean_file = Path(data_dir, CLEAN_FILE.name)
+        tmp = clean_file.with_name(f"{clean_file.name}.{os.getpid()}.tmp")
+        data.to_csv(tmp, index = False)
+        os.replace(tmp, clean_file)
+        save_table(data, Path(data_dir, "store", "magic"), categories = ["Rank", "Event", "Deck"])
+
+
+def load_clean(columns = None, start = None, end = None, data_dir = DATA_DIR) :
+    """The cleaned data set, or only some `columns` and dates (see `mtg.storage.load_table`).
+
+    The columnar store is built from `magic.csv` the first time, and again
+    when rows were appended to `magic.csv` (see `mtg.cleaning.StreamingCleaner`).
+    """
+    store = Path(data_dir, "store", "magic")
+    clean_file = Path(data_dir, CLEAN_FILE.name)
+    with span("load_clean") :
+        if is_stale(store, clean_file) :
+            data = pd.read_csv(clean_file, parse_dates = ["Date"])
+            save_table(data, store, categories = ["Rank", "Event", "Deck"])
+        return load_table(store, columns, start, end)
+
+
+def load_decklists(data_dir = DATA_DIR) :
+    """The decklists scraped with `python -m mtg scrape --cards` (a `mtg.cards.CardMatrix`)."""
+    from mtg.cards import load_cards
+    return load_cards(Path(data_dir, CARDS_DIR.name))
@@ -0,0 +1,91 @@
+"""Bookkeeping of the pages and decks already ingested in `raw_magic.csv`.
+
+The manifest is a JSON file recording, for every scraped shard (a search on
+mtgtop8, e.g. the Worlds of a year, see `mtg.scraping.Shard`), the
+(page, deck id) pairs already written to the raw data set and whether the
+shard is complete, i.e. whether its search pages were walked until the
+empty page closing the results. Incomplete shards (a non-200 status
+halfway, or a date window including today, in which new events can still
+appear) are walked again on the next run, fetching only the decks which are
+not in the manifest. The key of the Worlds of a year is the year itself.
+"""
+
+import datetime
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+
+
+class Manifest :
+
+    def __init__(self, path) :
+        self.path = Path(path)
+        if self.path.exists() :
+            self.shards = json.loads(self.path.read_text())["shards"]
+        else :
+            self.shards = {}
+
+    def _shard(self, key) :
+        return self.shards.setdefault(str(key), {"complete" : False, "decks" : []})
+
+    def known(self, key) :
+        """The ids of the decks of the shard `key` already ingested."""
+        return {deck_id for _, deck_id in self.shards.get(str(key), {}).get("decks", [])}
+
+    def is_complete(self, key) :
+        return self.shards.get(str(key), {}).get("complete", False)
+
+    def add(self, key, page, deck_id) :
+        self._shard(key)["decks"].append([page, deck_id])
+
+    def mark_complete(self, key) :
+        self._shard(key)["complete"] = True
+
+    def reset(self) :
+        """Forget all the shards, e.g. when the data set they describe is gone."""
+        self.shards = {}
+
+    def bootstrap(self, data_file, keys = None) :
+        """Mark as complete the years already present in `data_file`.
+
+        Used for a raw data set scraped before the manifest existed, whose
+        deck ids are unknown: we trust that those years were scraped fully.
+        With `keys`, the shards to scrape whose results can no longer grow,
+        they are all marked complete, with or without decks in `data_file`
+        (the Worlds of 2019 have none on mtgtop8, yet they were scraped).
+        """
+        if keys is not None :
+            for key in keys :
+                self.mark_complete(key)
+            return
+        dates = pd.read_csv(data_file, usecols = ["Date"])["Date"]
+        for year in pd.to_datetime(dates, format = "%d/%m/%y").dt.year.unique() :
+            # the results of the current year can still grow
+            if year < datetime.date.today().year :
+                self.mark_complete(int(year))
+
+    def save(self) :
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps({"shards" : self.shards}))
+        os.replace(tmp, self.path)
+
+
+def append_rows(data_file, new_rows) :
+    """Append `new_rows` to the csv `data_file` without rewriting it.
+
+    The rows are aligned to the columns of the existing file. Only when they
+    bring a column the file does not have yet (e.g. a new `LANDS_(NN)`) the
+    file is rewritten, with the new column appended to the header.
+    """
+    data_file = Path(data_file)
+    if not data_file.exists() :
+        new_rows.to_csv(data_file, index = False)
+        return
+    header = list(pd.read_csv(data_file, nrows = 0).columns)
+    if set(new_rows.columns) <= set(header) :
+        new_rows.reindex(columns = header).to_csv(data_file, mode = "a", header = False, index = False)
+    else :
+        merged = pd.concat([pd.read_csv(data_file), new_rows], ignore_index = True)
+        merged.to_csv(data_file, index = False)
@@ -0,0 +1,256 @@
+"""Extraction of the data we need from the pages of mtgtop8.
+
+We only need a few kinds of elements: the rows `tr.hover_tr` of the search
+table with the link `a[href*=&d=]` to their deck, the summary blocks `div.O14`
+of a deck page and, for the decklists, its card lines `div.deck_line`. Instead of building the whole document tree with
+html5lib (the slowest parser BeautifulSoup supports), the parsers below
+stream through the page with the tokenizer of the standard library and only
+keep the text of those elements, in constant memory with respect to the
+rest of the page.
+
+The BeautifulSoup/html5lib versions (`*_soup`) are kept as the reference
+the fast path is checked and benchmarked against (see benchmarks/parsing.py).
+
+The rows of a search page are read cell by cell and keyed by the id of the
+deck they link to: a row with an empty cell (e.g. a deck without a name)
+keeps its columns in place, and the deck pages can be matched to their row
+by id, whatever the order in which they are downloaded.
+"""
+
+import re
+from html.parser import HTMLParser
+from urllib.parse import parse_qs, urlsplit
+
+DECK_LINK = re.compile(".*&d=.*")
+
+
+def deck_id(link) :
+    """The mtgtop8 id of the deck behind `link` (its `d` parameter)."""
+    return parse_qs(urlsplit(link).query)["d"][0]
+
+
+def _classes(attrs) :
+    return (dict(attrs).get("class") or "").split()
+
+
+class _Extractor(HTMLParser) :
+    """Collect the text of the elements `tag.css_class` of a page.
+
+    Nested elements with the same tag are tracked, so that the text of an
+    element ends with its own closing tag. An element left open is closed
+    by the next one, as HTML does with unclosed rows.
+    """
+
+    def __init__(self, tag, css_class) :
+        super().__init__(convert_charrefs = True)
+        self.tag = tag
+        self.css_class = css_class
+        self.texts = []
+        self._depth = 0
+        self._chunks = None
+
+    def _close(self) :
+        self.texts.append("".join(self._chunks))
+        self._chunks = None
+        self._depth = 0
+
+    def handle_starttag(self, tag, attrs) :
+        if tag != self.tag :
+            return
+        if self._chunks is not None :
+            if self.tag == "tr" :
+                self._close()
+            else :
+                self._depth += 1
+                return
+        if self.css_class in _classes(attrs) :
+            self._chunks = []
+            self._depth = 1
+
+    def handle_endtag(self, tag) :
+        if self._chunks is None :
+            return
+        if tag == "table" and self.tag == "tr" :
+            self._close()
+        elif tag == self.tag :
+            self._depth -= 1
+            if self._depth == 0 :
+                self._close()
+
+    def handle_data(self, data) :
+        if self._chunks is not None :
+            self._chunks.append(data)
+
+    def extract(self, html) :
+        # html5lib normalises newlines as the HTML specification requires
+        self.feed(html.replace("\r\n", "\n").replace("\r", "\n"))
+        self.close()
+        if self._chunks is not None :
+            self._close()
+        return self
+
+
+class _SearchExtractor(_Extractor) :
+    """Collect the rows `tr.hover_tr` of a search page, cell by cell, with their deck link.
+
+    The cells of a row start with the one holding the link to its deck (the
+    ones before, such as the checkbox, hold no data).
+    """
+
+    def __init__(self) :
+        super().__init__("tr", "hover_tr")
+        self.rows = []
+        self._cells = None
+        self._cell = None
+        self._link = None
+        self._first = None
+
+    def _close(self) :
+        super()._close()
+        if self._link is not None :
+            self.rows.append((self._link, ["".join(cell) for cell in self._cells[self._first:]]))
+        self._cells = self._link = self._cell = None
+
+    def handle_starttag(self, tag, attrs) :
+        super().handle_starttag(tag, attrs)
+        if self._chunks is None :
+            return
+        if tag == "tr" :
+            self._cells = []
+        elif tag == "td" :
+            self._cell = []
+            self._cells.append(self._cell)
+        elif tag == "a" and self._link is None and self._cell is not None :
+            href = dict(attrs).get("href")
+            if href and DECK_LINK.search(href) :
+                self._link = href
+                self._first = len(self._cells) - 1
+
+    def handle_endtag(self, tag) :
+        if tag == "td" :
+            self._cell = None
+        super().handle_endtag(tag)
+
+    def handle_data(self, data) :
+        super().handle_data(data)
+        if self._cell is not None :
+            self._cell.append(data)
+
+
+def parse_search_page(html) :
+    """Return the rows of a search page by the id of their deck, as id -> (cells, deck link).
+
+    The rows are in the order of the page; the rows without a deck link are
+    left out.
+    """
+    extractor = _SearchExtractor().extract(html)
+    return {deck_id(link) : (cells, link) for link, cells in extractor.rows}
+
+
+def deck_counts(texts) :
+    """Turn the texts of the `div.O14` blocks into card type counts.
+
+    A block such as "24 LANDS (29)" becomes the entry {"LANDS_(29)" : 24}.
+    """
+    deck = {}
+    for text_string in texts :
+        name = ""
+        value = 0
+        for text in text_string.split() :
+            if text.isdigit() :
+                value = int(text)
+            else :
+                name = name + text + "_"
+        deck[name.strip("_")] = value
+    return deck
+
+
+def parse_deck_page(html) :
+    """Return the card type counts (the `div.O14` blocks) of a deck page."""
+    return deck_counts(_Extractor("div", "O14").extract(html).texts)
+
+
+class _DeckExtractor(_Extractor) :
+    """Collect the `div.O14` blocks of a deck page and its card lines.
+
+    A card line is a `div.deck_line` whose id starts with "md" (mainboard)
+    or "sb" (sideboard), with the quantity as text and the name of the card
+    in a `span.L14`.
+    """
+
+    def __init__(self) :
+        super().__init__("div", "O14")
+        self.cards = []
+        self._board = None
+        self._quantity = None
+        self._name = None
+
+    def handle_starttag(self, tag, attrs) :
+        super().handle_starttag(tag, attrs)
+        if tag == "div" and "deck_line" in _classes(attrs) :
+            self._board = (dict(attrs).get("id") or "")[:2]
+            self._quantity = []
+        elif tag == "span" and self._quantity is not None and "L14" in _classes(attrs) :
+            self._name = []
+
+    def handle_endtag(self, tag) :
+        super().handle_endtag(tag)
+        if tag == "span" and self._name is not None :
+            quantity = "".join(self._quantity).strip()
+            if quantity.isdigit() :
+                self.cards.append((self._board, int(quantity), "".join(self._name).strip()))
+            self._quantity = self._name = None
+        elif tag == "div" :
+            self._quantity = self._name = None
+
+    def handle_data(self, data) :
+        super().handle_data(data)
+        if self._name is not None :
+            self._name.append(data)
+        elif self._quantity is not None :
+            self._quantity.append(data)
+
+
+def parse_decklist(html) :
+    """Return the card type counts of a deck page and its cards.
+
+    The cards are a list of (board, quantity, name), the board being "md"
+    for the mainboard and "sb" for the sideboard.
+    """
+    extractor = _DeckExtractor().extract(html)
+    return deck_counts(extractor.texts), extractor.cards
+
+
+def parse_search_page_soup(html) :
+    """Reference version of `parse_search_page`, on a full html5lib tree."""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, "html5lib")
+    listing = {}
+    for row in soup.find_all("tr", class_ = "hover_tr") :
+        link = row.find("a", href = DECK_LINK)
+        if link is None :
+            continue
+        cells = row.find_all("td")
+        first = cells.index(link.find_parent("td"))
+        listing[deck_id(link["href"])] = ([cell.text for cell in cells[first:]], link["href"])
+    return listing
+
+
+def parse_deck_page_soup(html) :
+    """Reference version of `parse_deck_page`, on a full html5lib tree."""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, "html5lib")
+    return deck_counts(elem.text for elem in soup.find_all("div", class_ = "O14"))
+
+
+def parse_decklist_soup(html) :
+    """Reference version of `parse_decklist`, on a full html5lib tree."""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, "html5lib")
+    cards = []
+    for line in soup.find_all("div", class_ = "deck_line") :
+        name = line.find("span", class_ = "L14")
+        quantity = line.find(string = True, recursive = False)
+        if name is not None and quantity is not None and quantity.strip().isdigit() :
+            cards.append((line.get("id", "")[:2], int(quantity.strip()), name.text.strip()))
+    return deck_counts(elem.text for elem in soup.find_all("div", class_ = "O14")), cards
@@ -0,0 +1,253 @@
+"""The analysis as a graph of memoized stages.
+
+Every stage (the scrape, the selection of the events, the rank corrections,
+the merge of the lands, the tests, the figures) is a function of the
+results of the stages it depends on. Its key is the hash of
+- the source of the function and of the modules it relies on,
+- its configuration (e.g. the years, `as_lands`),
+- the content of the files it reads (e.g. `rank_corrections.csv`),
+- the digests of the results of its inputs,
+and its result is kept under that key in an `mtg.artifacts.ArtifactCache`.
+A stage only runs again when one of these changed: editing a correction
+re-runs the corrections and what comes after them, never the scrape, and a
+stage giving the same result as before (say, a comment added to
+`mtg/cleaning.py`) leaves the stages downstream cached.
+
+The scrape stage is keyed by the years, its code, `raw_magic.csv` and its
+manifest (see `mtg.manifest`): deleting the csv runs the stage again, which
+rebuilds the csv from the pages of `data/archive` (see `mtg.archive`),
+without the network, then scrapes the decks missing from it (the manifest
+of a deleted csv is never trusted).
+
+    from mtg.pipeline import default_pipeline
+    pipeline = default_pipeline()
+    results = pipeline.run(["clean", "tests"])
+    pipeline.report()   # which stages ran, which were cached
+"""
+
+import hashlib
+import importlib.util
+import inspect
+import io
+import json
+import time
+from pathlib import Path
+
+from mtg.artifacts import ArtifactCache
+from mtg.datasets import ARCHIVE_DIR, CACHE_DIR, CORRECTIONS_FILE, DATA_DIR, RAW_FILE
+from mtg.profiling import count, span
+
+ARTIFACTS_DIR = DATA_DIR / "artifacts"
+
+# the artifacts of a few dozen runs of the analysis
+MAX_BYTES = 512 * 2 ** 20
+
+
+def file_digest(path) :
+    """The sha256 of the content of `path` (None if it does not exist)."""
+    try :
+        return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+    except FileNotFoundError :
+        return None
+
+
+def _source(code) :
+    """The source of a function, or of a module given by name (without importing it)."""
+    if isinstance(code, str) :
+        return Path(importlib.util.find_spec(code).origin).read_text()
+    return inspect.getsource(code)
+
+
+class Stage :
+    """A step of the pipeline: `function(*results of inputs, **config)`.
+
+    `files` are the paths the function reads, `code` the functions or
+    module names (e.g. "mtg.cleaning") whose source, as well as the one of
+    `function`, is part of the key.
+    """
+
+    def __init__(self, name, function, inputs = (), config = None, files = (), code = ()) :
+        self.name = name
+        self.function = function
+        self.inputs = tuple(inputs)
+        self.config = dict(config or {})
+        self.files = tuple(Path(file) for file in files)
+        self.code = tuple(code)
+
+    def key(self, input_digests) :
+        description = {"stage" : self.name,
+                       "code" : [hashlib.sha256(_source(code).encode()).hexdigest()
+                                 for code in (self.function,) + self.code],
+                       "config" : repr(sorted(self.config.items())),
+                       "files" : {str(file) : file_digest(file) for file in self.files},
+                       "inputs" : list(input_digests)}
+        return hashlib.sha256(json.dumps(description, sort_keys = True).encode()).hexdigest()
+
+    def __repr__(self) :
+        return f"Stage({self.name!r}, inputs = {self.inputs})"
+
+
+class Pipeline :
+
+    def __init__(self, stages, cache) :
+        self.stages = {}
+        for stage in stages :
+            missing = [name for name in stage.inputs if name not in self.stages]
+            if missing :
+                raise ValueError(f"stage {stage.name!r} depends on {missing}, which must come before it")
+            self.stages[stage.name] = stage
+        self.cache = cache
+        self.runs = []
+
+    def run(self, targets = None, force = ()) :
+        """The results of the stages `targets` (all by default), as a dictionary.
+
+        Only the stages whose key is missing from the cache are run, and
+        the ones in `force` (e.g. the scrape, to look for new decks); the
+        others are loaded from the cache when their result is needed.
+        """
+        targets = list(self.stages) if targets is None else list(targets)
+        unknown = [name for name in targets + list(force) if name not in self.stages]
+        if unknown :
+            raise KeyError(f"unknown stages {unknown}, not in {list(self.stages)}")
+        self.runs = []
+        keys, digests, results = {}, {}, {}
+
+        def execute(name) :
+            stage = self.stages[name]
+            inputs = [result(input_name) for input_name in stage.inputs]
+            start = time.perf_counter()
+            print(f"Running {name}...")
+            with span(f"stage.{name}") :
+                results[name] = stage.function(*inputs, **stage.config)
+            digests[name] = self.cache.store(keys[name], results[name], stage = name)
+            self.runs.append((name, "ran", time.perf_counter() - start))
+
+        def digest(name) :
+            # the key of a stage needs the digests of its inputs, not their results
+            if name not in digests :
+                stage = self.stages[name]
+                keys[name] = stage.key([digest(input_name) for input_name in stage.inputs])
+                entry = self.cache.entry(keys[name])
+                if entry is None or name in force :
+                    execute(name)
+                else :
+                    digests[name] = entry["digest"]
+            return digests[name]
+
+        def result(name) :
+            digest(name)
+            if name not in results :
+                start = time.perf_counter()
+                try :
+                    results[name] = self.cache.load(keys[name])
+                    count("artifacts_loaded")
+                    self.runs.append((name, "cached", time.perf_counter() - start))
+                except KeyError :
+                    # evicted in the meantime
+                    execute(name)
+            return results[name]
+
+        return {name : result(name) for name in targets}
+
+    def report(self) :
+        """Which stages the last `run` ran or loaded from the cache, and in how long."""
+        for name, status, seconds in self.runs :
+            print(f"{name:<12} {status:<7} {seconds:.2f} s")
+
+
+def _restore(raw_file, archive, years) :
+    """Rebuild the missing `raw_file` and its manifest from the pages of `archive`."""
+    from mtg.archive import reparse
+    from mtg.manifest import Manifest, append_rows
+    from mtg.records import KEY_COLUMNS
+    from mtg.scraping import worlds_shard
+    rows = reparse(archive, {year : worlds_shard(year) for year in years}, keys = True)
+    if rows.empty :
+        return
+    # the decks are listed, but no shard is complete: the next scrape looks for the missing ones
+    manifest = Manifest(raw_file.with_suffix(".manifest.json"))
+    manifest.reset()
+    append_rows(raw_file, rows.drop(columns = KEY_COLUMNS))
+    for key, page, deck in rows[KEY_COLUMNS].itertuples(index = False) :
+        manifest.add(key, int(page), deck)
+    manifest.save()
+
+
+def _scrape(years, data_dir, offline) :
+    from mtg.archive import PageArchive
+    from mtg.cache import ResponseCache
+    from mtg.datasets import load_raw
+    from mtg.scraping import scrape_incremental
+    raw_file = Path(data_dir, RAW_FILE.name)
+    archive = PageArchive(Path(data_dir, ARCHIVE_DIR.name))
+    if not raw_file.exists() and len(archive) :
+        _restore(raw_file, archive, years)
+    scrape_incremental(raw_file, years, cache = ResponseCache(Path(data_dir, CACHE_DIR.name)), offline = offline,
+                       archive = archive)
+    if not raw_file.exists() :
+        raise FileNotFoundError(f"{raw_file} is missing and no deck could be scraped nor found in {archive.directory}")
+    return load_raw(data_dir)
+
+
+def _events(raw) :
+    from mtg.cleaning import select_events
+    return select_events(raw)
+
+
+def _corrections(events, corrections_file) :
+    from mtg.cleaning import correct_ranks, load_corrections
+    return correct_ranks(events, load_corrections(corrections_file))
+
+
+def _lands(corrected, as_lands) :
+    from mtg.cleaning import finish
+    return finish(corrected, as_lands)
+
+
+def _validate(events, data) :
+    """The anomaly reports of the individual events and of the cleaned data set, in one table."""
+    import pandas as pd
+    from mtg.validation import CLEAN_SCHEMA, EVENTS_SCHEMA, validate
+    reports = {"events" : validate(events, EVENTS_SCHEMA), "clean" : validate(data, CLEAN_SCHEMA)}
+    return pd.concat(reports, names = ["Table"]).reset_index(level = 0).reset_index(drop = True)
+
+
+def _tests(data) :
+    from mtg import stats
+    return stats.tests(data)
+
+
+def _figures(data) :
+    """The png of every figure of `mtg.plots.FIGURES`."""
+    import matplotlib.pyplot as plt
+    from mtg.plots import FIGURES
+    images = {}
+    for name, draw in FIGURES.items() :
+        figure = draw(data)
+        buffer = io.BytesIO()
+        figure.savefig(buffer, format = "png")
+        plt.close(figure)
+        images[name] = buffer.getvalue()
+    return images
+
+
+def default_pipeline(data_dir = DATA_DIR, years = range(1994, 2023), as_lands = False, offline = False,
+                     cache_dir = None, max_bytes = MAX_BYTES) :
+    """The stages of MTG_project.py: raw -> events -> corrections -> clean -> validate, tests, figures."""
+    data_dir = Path(data_dir)
+    corrections_file = data_dir / CORRECTIONS_FILE.name
+    stages = [Stage("raw", _scrape, config = {"years" : list(years), "data_dir" : str(data_dir),
+                                               "offline" : offline},
+                    files = [data_dir / RAW_FILE.name, data_dir / RAW_FILE.with_suffix(".manifest.json").name],
+                    code = ["mtg.scraping", "mtg.parsing", "mtg.records", "mtg.manifest", "mtg.cache",
+                            "mtg.archive", "mtg.datasets", "mtg.storage"]),
+              Stage("events", _events, ["raw"], code = ["mtg.cleaning"]),
+              Stage("corrections", _corrections, ["events"], config = {"corrections_file" : str(corrections_file)},
+                    files = [corrections_file], code = ["mtg.cleaning", "mtg.players"]),
+              Stage("clean", _lands, ["corrections"], config = {"as_lands" : as_lands}, code = ["mtg.cleaning"]),
+              Stage("validate", _validate, ["events", "clean"], code = ["mtg.validation"]),
+              Stage("tests", _tests, ["clean"], code = ["mtg.stats"]),
+              Stage("figures", _figures, ["clean"], code = ["mtg.plots"])]
+    cache = ArtifactCache(cache_dir or data_dir / ARTIFACTS_DIR.name, max_bytes)
+    return Pipeline(stages, cache)
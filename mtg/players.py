@@ -0,0 +1,153 @@
+"""Resolution of the spellings of a player's name to a single identity.
+
+mtgtop8 spells the same player in several ways ("Ben Stark" and "Benjamin
+Stark", "Josh Utter-leyton" and "Josh Utter-Leyton", "Dave Humpherys" and
+"David Humpherys"), which used to be fixed by hand in the corrections
+table. Here
+- `player_key` normalizes a name: accents, case and punctuation are
+  dropped ("Olle Råde" -> "olle rade") and a nickname given name becomes
+  the full one ("dave" -> "david"). The corrections are joined to the
+  decks by year and player key, so they no longer depend on a spelling.
+- `resolve_players` groups the spellings of the same player: the names are
+  only compared within blocks of names sharing the surname and the initial
+  of the given name, never all pairs, and two names are the same player
+  when their given names are equal, when the names are close enough
+  (`threshold`), or when a given name is the beginning of the other and of
+  no other given name of the block ("J Smith" is left alone when there are
+  both a "John Smith" and a "Jane Smith"). Surnames are never matched
+  approximately: "Lee Shi Tian" and "Lee Shi Tan" are two players. Two
+  groups are only merged when all of their names are the same player
+  pairwise, so that no chain of links joins two different full names.
+  Every group is written with its most frequent spelling.
+
+The names are resolved once per distinct spelling, so tens of thousands
+of decks take about a second.
+
+    from mtg.players import player_clusters, resolve_players
+    data["Player"] = resolve_players(data["Player"])
+    player_clusters(data["Player"])     # the merged spellings, to check them
+"""
+
+import re
+import unicodedata
+from collections import defaultdict
+from difflib import SequenceMatcher
+
+import numpy as np
+import pandas as pd
+
+# given names and their nicknames
+NICKNAMES = {"alex" : "alexander", "andy" : "andrew", "ben" : "benjamin", "bob" : "robert", "chris" : "christopher",
+             "dan" : "daniel", "danny" : "daniel", "dave" : "david", "jim" : "james", "joe" : "joseph",
+             "jon" : "jonathan", "josh" : "joshua", "ken" : "kenneth", "matt" : "matthew", "mike" : "michael",
+             "nick" : "nicholas", "pat" : "patrick", "rob" : "robert", "sam" : "samuel", "steve" : "steven",
+             "tom" : "thomas", "tony" : "anthony", "will" : "william"}
+
+# similarity (see difflib.SequenceMatcher) above which two names in a block are the same player
+THRESHOLD = 0.92
+
+
+def normalize(name) :
+    """`name` without accents, case and punctuation."""
+    name = unicodedata.normalize("NFKD", str(name))
+    name = "".join(char for char in name if not unicodedata.combining(char)).casefold()
+    return " ".join(re.sub(r"[^\w]+", " ", name).split())
+
+
+def player_key(name, nicknames = NICKNAMES) :
+    """The normalized `name`, with its given name in full."""
+    tokens = normalize(name).split()
+    if len(tokens) > 1 :
+        tokens[0] = nicknames.get(tokens[0], tokens[0])
+    return " ".join(tokens)
+
+
+def player_keys(names) :
+    """The player key of every name of the Series `names`, computed once per distinct name."""
+    names = pd.Series(names)
+    return names.map({name : player_key(name) for name in names.dropna().unique()})
+
+
+def _parts(key) :
+    """The given name and the surname (its other tokens, joined) of a player key."""
+    given, _, surname = key.partition(" ")
+    return given, surname.replace(" ", "")
+
+
+def _blocks(keys) :
+    """The positions of the player keys by block (surname and initial): only the keys of a block are compared."""
+    blocks = defaultdict(list)
+    for position, key in enumerate(keys) :
+        given, surname = _parts(key)
+        blocks[surname, given[:1]].append(position)
+    return blocks.values()
+
+
+def same_player(first, second, threshold = THRESHOLD, givens = ()) :
+    """Whether the player keys `first` and `second` are the same player.
+
+    A given name which is the beginning of the other one only matches it
+    if it is the beginning of none of the other given names `givens`.
+    """
+    given, surname = _parts(first)
+    other_given, other_surname = _parts(second)
+    if surname != other_surname :
+        return False
+    if given == other_given :
+        return True
+    short, long = sorted((given, other_given), key = len)
+    if long.startswith(short) :
+        return not any(name.startswith(short) for name in givens if name not in (short, long))
+    # the cheap upper bounds of the ratio first
+    matcher = SequenceMatcher(None, first, second)
+    return matcher.real_quick_ratio() >= threshold and matcher.quick_ratio() >= threshold \
+        and matcher.ratio() >= threshold
+
+
+def _find(parent, position) :
+    while parent[position] != position :
+        parent[position] = parent[parent[position]]
+        position = parent[position]
+    return position
+
+
+def _groups(keys, threshold) :
+    """The group of every player key (the position of one key of the group)."""
+    parent = list(range(len(keys)))
+    members = [[position] for position in range(len(keys))]
+    for block in _blocks(keys) :
+        givens = {_parts(keys[position])[0] for position in block}
+        for i, first in enumerate(block) :
+            for second in block[i + 1:] :
+                a, b = _find(parent, first), _find(parent, second)
+                if a == b or not same_player(keys[first], keys[second], threshold, givens) :
+                    continue
+                # complete linkage: every name of a group must be the same player as every name of the other
+                if all(same_player(keys[x], keys[y], threshold, givens) for x in members[a] for y in members[b]) :
+                    root, other = min(a, b), max(a, b)
+                    parent[other] = root
+                    members[root] += members[other]
+                    members[other] = []
+    return np.array([_find(parent, position) for position in range(len(keys))])
+
+
+def player_clusters(names, threshold = THRESHOLD) :
+    """The spellings of `names` with their number of decks and their resolved name, sorted by resolved name."""
+    names = pd.Series(names, dtype = object)
+    spellings = names.value_counts(dropna = True).rename_axis("Player").rename("Decks").reset_index()
+    keys = spellings["Player"].map(player_key)
+    # the groups are found among the distinct keys, then spread to their spellings
+    codes, distinct = pd.factorize(keys)
+    group = _groups(list(distinct), threshold)[codes]
+    # the most frequent spelling names the group (then the longest: "Benjamin" rather than "Ben")
+    order = np.lexsort((spellings["Player"].to_numpy(), -spellings["Player"].str.len().to_numpy(),
+                        -spellings["Decks"].to_numpy()))
+    first = pd.Series(order, index = group[order]).groupby(level = 0).first()
+    spellings["Resolved"] = spellings["Player"].to_numpy()[first.loc[group].to_numpy()]
+    return spellings.sort_values(["Resolved", "Decks"], ascending = [True, False], ignore_index = True)
+
+
+def resolve_players(names, threshold = THRESHOLD) :
+    """`names` (a Series) with every spelling of a player replaced by the one of its group."""
+    clusters = player_clusters(names, threshold)
+    return pd.Series(names).map(dict(zip(clusters["Player"], clusters["Resolved"])))
@@ -0,0 +1,120 @@
+"""The figures of the analysis.
+
+Every function draws one figure of MTG_project.py from the cleaned data set
+and returns it, without showing it: the script shows them, `python -m mtg
+plots` saves them. matplotlib and seaborn are imported on the first call.
+"""
+
+import numpy as np
+
+from mtg.datasets import CARD_COUNTS
+from mtg.stats import RANKS, rank_groups
+
+# panel of every card type in the 2 x 2 figures, with its colour and label
+PANELS = {"Lands" : ((0, 0), "r.-", "Lands"),
+          "Creatures" : ((0, 1), "b.-", "Creatures"),
+          "Instants_Sorceries" : ((1, 0), "g.-", "Instants & Sorceries"),
+          "Other_spells" : ((1, 1), "y.-", "Other spells")}
+
+# the violin and box plots put the card types in another order
+RANK_PANELS = {"Lands" : (0, 0), "Creatures" : (1, 0),
+               "Instants_Sorceries" : (0, 1), "Other_spells" : (1, 1)}
+
+LABELS = {"Lands" : "Lands", "Creatures" : "Creatures",
+          "Instants_Sorceries" : "Instants & Sorceries", "Other_spells" : "Others"}
+
+
+def _pyplot() :
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def _seaborn() :
+    import seaborn as sns
+    return sns
+
+
+def _time_series(dates, data) :
+    figure, axis = _pyplot().subplots(2, 2, figsize = (12, 8))
+    for column, (panel, style, label) in PANELS.items() :
+        axis[panel].plot(dates, data[column], style, label = label)
+        axis[panel].set(xlabel = label, ylabel = "Count")
+    return figure
+
+
+def year_means(data) :
+    """The mean composition of the top 4 decks, year by year."""
+    means = data[["Date"] + CARD_COUNTS].groupby("Date", observed = False).mean()
+    return _time_series(means.index, means)
+
+
+def champions(data) :
+    """The composition of the winning decks, year by year."""
+    champs = data[data["Rank"] == 1].reset_index(drop = True)
+    return _time_series(champs["Date"], champs)
+
+
+def violins(data) :
+    """The distribution of the card counts by rank, as violin plots."""
+    sns = _seaborn()
+    figure, axis = _pyplot().subplots(2, 2, figsize = (12, 8))
+    for column, panel in RANK_PANELS.items() :
+        sns.violinplot(x = "Rank", y = column, data = data, fill = False, inner = "quart", ax = axis[panel])
+        sns.stripplot(x = "Rank", y = column, data = data, alpha = 0.3, color = "navy", jitter = 0.05, ax = axis[panel])
+        axis[panel].set(xlabel = "Rank", ylabel = PANELS[column][2])
+    return figure
+
+
+def boxes(data) :
+    """The distribution of the card counts by rank, as box plots."""
+    sns = _seaborn()
+    figure, axis = _pyplot().subplots(2, 2, figsize = (12, 8))
+    for column, panel in RANK_PANELS.items() :
+        sns.boxplot(x = "Rank", y = column, data = data, ax = axis[panel])
+        axis[panel].set(xlabel = "Rank", ylabel = PANELS[column][2])
+    return figure
+
+
+def histograms(data, ranks = RANKS) :
+    """The frequency of the card counts of every type and rank, with the fitted normal law."""
+    import scipy.stats as ss
+    figure, axis = _pyplot().subplots(4, len(ranks), figsize = (12, 12))
+    for i, column in enumerate(LABELS) :
+        for j, group in enumerate(rank_groups(data, column, ranks)) :
+            axis[i, j].hist(group, density = True)
+            mu, std = ss.norm.fit(group)
+            xmin, xmax = axis[i, j].get_xlim()
+            x = np.linspace(xmin, xmax, 100)
+            axis[i, j].plot(x, ss.norm.pdf(x, mu, std), "k", linewidth = 2)
+            axis[i, j].get_yaxis().set_ticks([])
+        axis[i, 0].set(ylabel = LABELS[column])
+    for j, rank in enumerate(ranks) :
+        axis[0, j].set(title = f"Rank {rank}")
+    return figure
+
+
+def trends(data, column) :
+    """The evolution of `column` over time, one panel per rank."""
+    grid = _seaborn().relplot(kind = "line", data = data, x = "Date", y = column, hue = "Rank",
+                              col = "Rank", col_wrap = 2, legend = False)
+    grid.set_axis_labels("Year", LABELS[column])
+    return grid.figure
+
+
+# the figures saved by `python -m mtg plots`, by file name
+FIGURES = {"year_means" : year_means,
+           "champions" : champions,
+           "violins" : violins,
+           "boxes" : boxes,
+           "histograms" : histograms}
+FIGURES.update({f"trends_{column}" : (lambda data, column = column : trends(data, column))
+                for column in CARD_COUNTS})
+
+# the columns every figure is drawn from: `mtg.rendering` draws a figure again
+# only when they changed
+COLUMNS = {"year_means" : ["Date"] + CARD_COUNTS,
+           "champions" : ["Date", "Rank"] + CARD_COUNTS,
+           "violins" : ["Rank"] + CARD_COUNTS,
+           "boxes" : ["Rank"] + CARD_COUNTS,
+           "histograms" : ["Rank"] + CARD_COUNTS}
+COLUMNS.update({f"trends_{column}" : ["Date", "Rank", column] for column in CARD_COUNTS})
@@ -0,0 +1,234 @@
+"""Timing and resource instrumentation of the pipeline.
+
+The steps of the pipeline report what they do to a process-wide profiler:
+- `span(name, **args)` times a block (wall and CPU time, peak memory of
+  the process at its end),
+- `count(name, value)` adds to a counter (requests, bytes downloaded, rows
+  appended, cache hits, ...),
+- `observe(name, value)` records a measure whose distribution matters
+  (the latency of every request).
+The profiler is off by default, and then these calls cost next to nothing.
+It is switched on by `python -m mtg --profile report.json ...`, or for any
+script (e.g. MTG_project.py) by the environment variable `MTG_PROFILE`
+naming the report, which is written when the process exits.
+
+The profiler of a worker process (`concurrent.futures.ProcessPoolExecutor`)
+is not the one of the process writing the report: the functions run in
+workers are wrapped by `traced(function)`, which returns their spans,
+counters and measures along with their result, and `collect` merges them
+into the profiler of this process (the events keep the pid of the worker,
+so the timeline has a row per process):
+
+    results = map(collect, pool.map(traced(task), chunks))
+
+The report is a JSON file in the trace event format: the spans are
+"complete" events that chrome://tracing or https://ui.perfetto.dev show as
+a timeline, and the `summary` key has the totals by span name, the
+counters and the percentiles of the observed measures, e.g. to compare the
+runs of two versions:
+
+    python -m mtg --profile before.json scrape --offline
+    python -c "import json; print(json.load(open('before.json'))['summary'])"
+"""
+
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+
+ENVIRONMENT_VARIABLE = "MTG_PROFILE"
+
+
+def _peak_memory() :
+    """The peak resident memory of the process, in MB (None if unknown)."""
+    try :
+        import resource
+    except ImportError :
+        # Windows
+        try :
+            import psutil
+            return psutil.Process().memory_info().peak_wset / 2 ** 20
+        except (ImportError, AttributeError) :
+            return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kB elsewhere
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+class _Span :
+
+    def __init__(self, profiler, name, args) :
+        self.profiler = profiler
+        self.name = name
+        self.args = args
+
+    def __enter__(self) :
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        return self
+
+    def __exit__(self, *exc_info) :
+        wall = time.perf_counter() - self.wall
+        cpu = time.process_time() - self.cpu
+        self.profiler._record(self.name, self.wall, wall, cpu, self.args)
+        return False
+
+
+class _Off :
+    """The span of a disabled profiler."""
+
+    def __enter__(self) :
+        return self
+
+    def __exit__(self, *exc_info) :
+        return False
+
+
+_OFF = _Off()
+
+
+class Profiler :
+
+    def __init__(self) :
+        self.enabled = False
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) :
+        self.origin = time.perf_counter()
+        self.events = []
+        self.stages = defaultdict(lambda : {"calls" : 0, "wall_s" : 0.0, "cpu_s" : 0.0})
+        self.counters = defaultdict(int)
+        self.measures = defaultdict(list)
+
+    def enable(self) :
+        if not self.enabled :
+            self.reset()
+        self.enabled = True
+
+    def disable(self) :
+        self.enabled = False
+
+    def span(self, name, **args) :
+        """A context manager timing the block it runs, reported under `name` with `args`."""
+        return _Span(self, name, args) if self.enabled else _OFF
+
+    def count(self, name, value = 1) :
+        if self.enabled :
+            with self._lock :
+                self.counters[name] += value
+
+    def observe(self, name, value) :
+        if self.enabled :
+            with self._lock :
+                self.measures[name].append(value)
+
+    def _record(self, name, start, wall, cpu, args) :
+        memory = _peak_memory()
+        with self._lock :
+            stage = self.stages[name]
+            stage["calls"] += 1
+            stage["wall_s"] += wall
+            stage["cpu_s"] += cpu
+            self.events.append({"name" : name, "ph" : "X", "pid" : os.getpid(), "tid" : threading.get_ident(),
+                                "ts" : (start - self.origin) * 1e6, "dur" : wall * 1e6,
+                                "args" : dict(args, cpu_ms = cpu * 1000, peak_memory_mb = memory)})
+
+    def export(self) :
+        """The events, stages, counters and measures, to be merged by another profiler."""
+        with self._lock :
+            return {"origin" : self.origin, "events" : list(self.events),
+                    "stages" : {name : dict(stage) for name, stage in self.stages.items()},
+                    "counters" : dict(self.counters), "measures" : {name : list(values)
+                                                                   for name, values in self.measures.items()}}
+
+    def merge(self, profile) :
+        """Add the `export` of another profiler (e.g. of a worker process); None is ignored."""
+        if profile is None or not self.enabled :
+            return
+        # perf_counter is the same clock in all the processes of the machine
+        shift = (profile["origin"] - self.origin) * 1e6
+        with self._lock :
+            self.events.extend(dict(event, ts = event["ts"] + shift) for event in profile["events"])
+            for name, stage in profile["stages"].items() :
+                for key, value in stage.items() :
+                    self.stages[name][key] += value
+            for name, value in profile["counters"].items() :
+                self.counters[name] += value
+            for name, values in profile["measures"].items() :
+                self.measures[name].extend(values)
+
+    def summary(self) :
+        """Totals by span name, counters and distribution of the measures."""
+        measures = {}
+        for name, values in self.measures.items() :
+            values = np.asarray(values, dtype = float)
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            measures[name] = {"count" : len(values), "mean" : values.mean(), "p50" : p50, "p95" : p95,
+                              "p99" : p99, "max" : values.max()}
+        return {"stages" : {name : dict(stage) for name, stage in self.stages.items()},
+                "counters" : dict(self.counters),
+                "measures" : measures,
+                "wall_s" : time.perf_counter() - self.origin,
+                "cpu_s" : time.process_time(),
+                "peak_memory_mb" : _peak_memory()}
+
+    def save(self, path) :
+        """Write the trace events and the summary to the JSON file `path`."""
+        report = {"traceEvents" : self.events, "displayTimeUnit" : "ms", "summary" : self.summary()}
+        with open(path, "w") as file :
+            json.dump(report, file, indent = 1, default = float)
+        print(f"Profile written to {path}.")
+
+
+PROFILER = Profiler()
+
+span = PROFILER.span
+count = PROFILER.count
+observe = PROFILER.observe
+
+
+class _Traced :
+    """`function` returning (result, profile of the call) when run in another process."""
+
+    def __init__(self, function, enabled) :
+        self.function = function
+        self.enabled = enabled
+        self.parent = os.getpid()
+
+    def __call__(self, *args, **kwargs) :
+        if not self.enabled or os.getpid() == self.parent :
+            # disabled, or run in this process (a pool of one worker): the spans are already ours
+            return self.function(*args, **kwargs), None
+        # a forked worker inherits the events of its parent: we start from scratch
+        PROFILER.reset()
+        PROFILER.enabled = True
+        result = self.function(*args, **kwargs)
+        return result, PROFILER.export()
+
+
+def traced(function) :
+    """Wrap `function`, run in a worker process, to bring its profile back (see `collect`)."""
+    return _Traced(function, PROFILER.enabled)
+
+
+def collect(output) :
+    """The result of a `traced` call, its profile merged into the profiler of this process."""
+    result, profile = output
+    PROFILER.merge(profile)
+    return result
+
+
+def profile_to(path) :
+    """Enable the profiler and write its report to `path` when the process exits."""
+    PROFILER.enable()
+    atexit.register(PROFILER.save, path)
+
+
+if os.environ.get(ENVIRONMENT_VARIABLE) :
+    profile_to(os.environ[ENVIRONMENT_VARIABLE])
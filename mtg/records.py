@@ -0,0 +1,114 @@
+"""Column buffers accumulating the scraped decks.
+
+Every scraped deck is a record, i.e. a dictionary with the columns of the
+search table (strings), the card type counts of the deck page (numbers) and
+the key of the deck (the shard it was scraped from, e.g. the year, the page
+and the deck id). Instead of growing a DataFrame
+one row at a time, records are appended to one buffer per column: strings
+go into lists, counts into compact `array("d")` buffers padded with NaN for
+the decks missing a card type. A single DataFrame is built at the end, or
+every `chunk_size` records, which are then handed to a `sink` (e.g. a
+function appending them to disk) and dropped from memory.
+"""
+
+import math
+from array import array
+
+import numpy as np
+import pandas as pd
+
+PLAYER_COLUMNS = ["Deck", "Player", "Format", "Event", "Level", "Rank", "Date"]
+
+# identify the deck a record comes from; they are not part of raw_magic.csv
+KEY_COLUMNS = ["shard", "page", "deck_id"]
+
+TEXT_COLUMNS = PLAYER_COLUMNS + ["shard", "deck_id"]
+
+INTEGER_COLUMNS = ["page"]
+
+
+def deck_record(row, deck, shard, page, deck_id) :
+    """The record of a deck: its row in the search table and its counts."""
+    record = dict(zip(PLAYER_COLUMNS, row))
+    record.update(deck)
+    record.update(shard = str(shard), page = page, deck_id = deck_id)
+    return record
+
+
+def _missing(column) :
+    """The value filling `column` for the records which lack it."""
+    if not isinstance(column, array) :
+        return None
+    return 0 if column.typecode == "q" else math.nan
+
+
+def _pad(column, length) :
+    if len(column) < length :
+        column.extend([_missing(column)] * (length - len(column)))
+
+
+class ColumnBuffer :
+
+    def __init__(self, chunk_size = None, sink = None) :
+        self.chunk_size = chunk_size
+        self.sink = sink
+        self.columns = {}
+        self.length = 0
+
+    def __len__(self) :
+        return self.length
+
+    def _column(self, name) :
+        if name not in self.columns :
+            # a column seen for the first time is missing in all previous records
+            if name in TEXT_COLUMNS :
+                column = []
+            elif name in INTEGER_COLUMNS :
+                column = array("q")
+            else :
+                column = array("d")
+            _pad(column, self.length)
+            self.columns[name] = column
+        return self.columns[name]
+
+    def append(self, record) :
+        for name, value in record.items() :
+            column = self._column(name)
+            column.append(_missing(column) if value is None else value)
+        self.length += 1
+        for column in self.columns.values() :
+            _pad(column, self.length)
+        if self.sink is not None and self.chunk_size is not None and self.length >= self.chunk_size :
+            self.flush()
+
+    def extend(self, other) :
+        """Append the records of the buffer `other`."""
+        for name, column in other.columns.items() :
+            self._column(name).extend(column)
+        self.length += len(other)
+        for column in self.columns.values() :
+            _pad(column, self.length)
+
+    def to_frame(self, keys = True) :
+        """The records as a DataFrame; with `keys = False` without the key columns."""
+        data = {}
+        for name, column in self.columns.items() :
+            if not keys and name in KEY_COLUMNS :
+                continue
+            if isinstance(column, array) :
+                data[name] = np.frombuffer(column, dtype = np.int64 if column.typecode == "q" else np.float64).copy()
+            else :
+                data[name] = column
+        frame = pd.DataFrame(data, index = pd.RangeIndex(self.length))
+        # the columns of the search table always come first, in their order
+        first = [name for name in PLAYER_COLUMNS if name in frame.columns]
+        return frame[first + [name for name in frame.columns if name not in first]]
+
+    def flush(self) :
+        """Hand the buffered records to the sink (if any) and empty the buffer."""
+        frame = self.to_frame()
+        if self.sink is not None and self.length :
+            self.sink(frame)
+        self.columns = {}
+        self.length = 0
+        return frame
@@ -0,0 +1,87 @@
+"""Render the figures of `mtg.plots` to files, without a display.
+
+`render_figures` draws every figure of `mtg.plots.FIGURES` and saves it in
+one or more formats (png, svg, pdf, ...). The figures are independent, so
+they are drawn by a pool of processes on the Agg backend, which never opens
+a window and never waits on `plt.show()`.
+
+A figure is only drawn again when the data it is drawn from changed: the
+digest of its columns (`mtg.plots.COLUMNS`), of the code of the figures
+(`mtg/plots.py`, `mtg/stats.py`) and of the formats is kept in
+`figures.json` next to the files, and a figure whose digest is the same as
+at the last render, and whose files are still there, is skipped.
+
+    from mtg.datasets import load_clean
+    from mtg.rendering import render_figures
+    render_figures(load_clean(), "figures", formats = ("png", "svg"), workers = 4)
+"""
+
+import hashlib
+import json
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from mtg import plots, stats
+from mtg.artifacts import content_digest
+from mtg.profiling import collect, span, traced
+
+STATE_FILE = "figures.json"
+
+
+def _headless() :
+    import matplotlib
+    matplotlib.use("Agg")
+
+
+def _draw(name, data, directory, formats) :
+    """Draw the figure `name` and save it in every format; runs in the workers."""
+    plt = plots._pyplot()
+    with span(f"figure.{name}") :
+        figure = plots.FIGURES[name](data)
+        for extension in formats :
+            figure.savefig(Path(directory, f"{name}.{extension}"))
+        plt.close(figure)
+    return name
+
+
+def figure_digest(name, data, formats, code) :
+    """The digest of everything the files of the figure `name` depend on."""
+    digest = hashlib.sha256(code)
+    digest.update(repr((name, sorted(formats))).encode())
+    digest.update(content_digest(data[plots.COLUMNS[name]].reset_index(drop = True)).encode())
+    return digest.hexdigest()
+
+
+def render_figures(data, directory, formats = ("png",), workers = 1, names = None, force = False) :
+    """Save the figures `names` (all by default) drawn from `data` in `directory`.
+
+    Only the figures whose data, code or formats changed since the last
+    render are drawn, all of them with `force = True`. With more than one
+    worker they are drawn in parallel; with one, in this process and with
+    its backend. Returns the names of the figures drawn.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents = True, exist_ok = True)
+    state_file = directory / STATE_FILE
+    state = json.loads(state_file.read_text()) if state_file.exists() else {}
+    code = b"".join(Path(module.__file__).read_bytes() for module in (plots, stats))
+    names = list(plots.FIGURES) if names is None else list(names)
+
+    digests = {name : figure_digest(name, data, formats, code) for name in names}
+    todo = [name for name in names
+            if force or state.get(name) != digests[name]
+            or not all(Path(directory, f"{name}.{extension}").exists() for extension in formats)]
+    slices = [data[plots.COLUMNS[name]] for name in todo]
+    if workers == 1 or len(todo) <= 1 :
+        drawn = [_draw(name, part, directory, formats) for name, part in zip(todo, slices)]
+    else :
+        # imported once here, the workers forked from this process inherit them
+        plots._seaborn()
+        with ProcessPoolExecutor(max_workers = min(workers, len(todo)), initializer = _headless) as pool :
+            drawn = list(map(collect, pool.map(traced(_draw), todo, slices, [directory] * len(todo),
+                                               [formats] * len(todo))))
+
+    state.update({name : digests[name] for name in drawn})
+    state_file.write_text(json.dumps(state, indent = 1))
+    print(f"{len(drawn)} figures drawn, {len(names) - len(drawn)} unchanged in {directory}.")
+    return drawn
@@ -0,0 +1,431 @@
+"""Incremental HTML report of the `# %%` cells of MTG_project.py.
+
+The notebook and its HTML export embed every figure in base64 and have to be
+executed and written again whole for the smallest change. `build_report`
+runs the cells of the script itself, one after the other in a single
+namespace as Jupyter would, and keeps the outcome of every code cell (its
+printed text, the value of its last expression, its figures and the
+variables it defines) in an `mtg.artifacts.ArtifactCache` under the hash of
+- the source of the cell,
+- the digests of the variables it reads, as left by the cells before it
+  (the content of a DataFrame, the source of a module of `mtg` and of the
+  modules of `mtg` it imports, ...),
+and a cell is only run again when one of these changed, or when one of the
+files of the repository it opened (e.g. `data/rank_corrections.csv`) was
+modified since. The variables of a cached cell which the cells after it
+read are restored from the cache; a cell defining variables that cannot be
+pickled (the imports) is always run.
+
+The figures are written to `figures/` next to the report, one png file per
+figure named by the hash of its content, and the page only links to them
+(`loading = "lazy"`): the HTML file itself is some 50 kB of text and tables,
+and an unchanged figure keeps its file. Once the cache is warm, rebuilding
+the report after an edit takes about a second plus the cells to run again.
+
+    from mtg.report import build_report
+    build_report("MTG_project.py", "report")    # report/MTG_project.html, report/figures/*.png
+"""
+
+import ast
+import hashlib
+import html
+import io
+import os
+import re
+import sys
+import time
+import types
+import warnings
+from collections import namedtuple
+from contextlib import redirect_stderr, redirect_stdout
+from pathlib import Path
+
+from mtg.artifacts import ArtifactCache, content_digest
+from mtg.pipeline import ARTIFACTS_DIR, MAX_BYTES
+from mtg.profiling import span
+
+CACHE_DIR = ARTIFACTS_DIR / "report"
+
+FIGURES_DIR = "figures"
+
+# changed whenever what is kept of a cell changes, to leave the old entries aside
+CACHE_VERSION = 1
+
+Cell = namedtuple("Cell", ["kind", "source", "line"])
+
+STYLE = """body { max-width : 60em; margin : auto; font-family : sans-serif; line-height : 1.4; }
+pre { background : #f6f6f6; padding : 0.5em; overflow-x : auto; }
+pre.output { background : none; border-left : 3px solid #ddd; }
+table { border-collapse : collapse; font-size : 0.9em; } td, th { padding : 0.2em 0.5em; text-align : right; }
+img { max-width : 100%; }"""
+
+
+def read_cells(path) :
+    """The cells of the script `path`, split at its `# %%` lines (`# %% [markdown]` for the text)."""
+    cells = []
+    kind, lines, start = "code", [], 1
+    for number, line in enumerate(Path(path).read_text().splitlines(), 1) :
+        if line.startswith("# %%") :
+            if kind == "markdown" or "".join(lines).strip() :
+                cells.append(Cell(kind, "\n".join(lines).strip("\n"), start))
+            kind = "markdown" if "[markdown]" in line else "code"
+            lines, start = [], number + 1
+        elif kind == "markdown" :
+            lines.append(re.sub(r"^# ?", "", line))
+        else :
+            lines.append(line)
+    if kind == "markdown" or "".join(lines).strip() :
+        cells.append(Cell(kind, "\n".join(lines).strip("\n"), start))
+    return cells
+
+
+def _inline(text) :
+    text = html.escape(text, quote = False)
+    text = re.sub(r"`([^`]+)`", r"<code>\1</code>", text)
+    text = re.sub(r"\[([^\]]+)\]\(([^)\s]+)\)", r'<a href="\2">\1</a>', text)
+    text = re.sub(r"\*\*(?!\s)(.+?)(?<!\s)\*\*", r"<strong>\1</strong>", text)
+    return re.sub(r"\*(?!\s)(.+?)(?<!\s)\*", r"<em>\1</em>", text)
+
+
+def markdown_html(text) :
+    """The HTML of the markdown of the cells: headings, paragraphs, lists and inline emphasis, code and links."""
+    text = re.sub(r"<!--.*?-->", "", text, flags = re.S)
+    blocks = []
+    paragraph, items = [], []
+
+    def flush() :
+        if paragraph :
+            blocks.append(f"<p>{_inline(' '.join(paragraph))}</p>")
+        if items :
+            blocks.append("<ul>" + "".join(f"<li>{_inline(item)}</li>" for item in items) + "</ul>")
+        paragraph.clear()
+        items.clear()
+
+    for line in text.splitlines() :
+        line = line.strip()
+        heading = re.match(r"(#{1,6}) (.*)", line)
+        if not line or heading :
+            flush()
+            if heading :
+                level = len(heading.group(1))
+                blocks.append(f"<h{level}>{_inline(heading.group(2))}</h{level}>")
+        elif re.match(r"[-*] ", line) :
+            if paragraph :
+                flush()
+            items.append(line[2:])
+        elif items :
+            items[-1] += " " + line
+        else :
+            paragraph.append(line)
+    flush()
+    return "\n".join(blocks)
+
+
+class _Names(ast.NodeVisitor) :
+    """The names a cell reads before binding them (`free`) and the names it binds (`bound`)."""
+
+    def __init__(self) :
+        self.free = set()
+        self.bound = set()
+
+    def visit_Name(self, node) :
+        if isinstance(node.ctx, ast.Load) :
+            if node.id not in self.bound :
+                self.free.add(node.id)
+        else :
+            self.bound.add(node.id)
+
+    def visit_Assign(self, node) :
+        self.visit(node.value)
+        for target in node.targets :
+            self.visit(target)
+
+    def visit_AugAssign(self, node) :
+        if isinstance(node.target, ast.Name) and node.target.id not in self.bound :
+            self.free.add(node.target.id)
+        self.visit(node.value)
+        self.visit(node.target)
+
+    def visit_For(self, node) :
+        self.visit(node.iter)
+        self.visit(node.target)
+        for statement in node.body + node.orelse :
+            self.visit(statement)
+
+    def visit_Import(self, node) :
+        self.bound.update((alias.asname or alias.name).split(".")[0] for alias in node.names)
+
+    visit_ImportFrom = visit_Import
+
+    def visit_FunctionDef(self, node) :
+        self.bound.add(node.name)
+        self.generic_visit(node)
+
+    visit_ClassDef = visit_FunctionDef
+
+    def _comprehension(self, node) :
+        # the variables of a comprehension do not leak out of it
+        bound = set(self.bound)
+        for generator in node.generators :
+            self.visit(generator.iter)
+            self.visit(generator.target)
+            for condition in generator.ifs :
+                self.visit(condition)
+        for field in ("elt", "key", "value") :
+            if hasattr(node, field) :
+                self.visit(getattr(node, field))
+        self.bound = bound
+
+    visit_ListComp = visit_SetComp = visit_GeneratorExp = visit_DictComp = _comprehension
+
+    def visit_Lambda(self, node) :
+        bound = set(self.bound)
+        self.bound.update(argument.arg for argument in ast.walk(node.args) if isinstance(argument, ast.arg))
+        self.visit(node.body)
+        self.bound = bound
+
+
+def _names(tree) :
+    names = _Names()
+    names.visit(tree)
+    return names.free, names.bound
+
+
+class _Digests :
+    """The digests of the values of the namespace, with the sources of the modules read once.
+
+    A module of the repository (under `root`) is digested with its source
+    and the sources of all the modules of the repository it imports, directly
+    or not; any other module (numpy, pandas) by its name and version.
+    """
+
+    def __init__(self, root) :
+        self.root = Path(root).resolve()
+        self.modules = {}
+
+    def _local(self, module) :
+        path = getattr(module, "__file__", None)
+        return path is not None and Path(path).resolve().is_relative_to(self.root)
+
+    def _imports(self, module) :
+        """The modules of the repository imported by `module`, itself included."""
+        modules = {module.__name__ : module}
+        pending = [module]
+        while pending :
+            for value in vars(pending.pop()).values() :
+                if not isinstance(value, types.ModuleType) :
+                    value = sys.modules.get(getattr(value, "__module__", None) or "")
+                if value is not None and value.__name__ not in modules and self._local(value) :
+                    modules[value.__name__] = value
+                    pending.append(value)
+        return modules
+
+    def module(self, module) :
+        name = module.__name__
+        if name not in self.modules :
+            digest = hashlib.sha256(name.encode())
+            if self._local(module) :
+                for other, imported in sorted(self._imports(module).items()) :
+                    digest.update(other.encode() + Path(imported.__file__).read_bytes())
+            else :
+                digest.update(str(getattr(module, "__version__", "")).encode())
+            self.modules[name] = digest.hexdigest()
+        return self.modules[name]
+
+    def __call__(self, value) :
+        if isinstance(value, types.ModuleType) :
+            return self.module(value)
+        if isinstance(value, (type, types.FunctionType, types.BuiltinFunctionType)) \
+                and getattr(value, "__module__", None) in sys.modules :
+            return f"{self.module(sys.modules[value.__module__])}:{value.__qualname__}"
+        try :
+            return content_digest(value)
+        except Exception :
+            # e.g. the rows of `itertuples`, whose class cannot be pickled
+            return hashlib.sha256(f"{type(value).__qualname__}:{value!r}".encode()).hexdigest()
+
+
+# the paths opened by the running cell (see `_audit`)
+_opened = None
+
+
+def _audit(event, args) :
+    if event == "open" and _opened is not None and isinstance(args[0], (str, os.PathLike)) :
+        _opened.add(os.fspath(args[0]))
+
+
+_audit_installed = False
+
+
+def _watch_files() :
+    """Install the audit hook recording the files the cells open (it cannot be removed, so only once)."""
+    global _audit_installed
+    if not _audit_installed :
+        sys.addaudithook(_audit)
+        _audit_installed = True
+
+
+def _file_state(path) :
+    try :
+        stat = os.stat(path)
+    except OSError :
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _files(opened, root, ignored) :
+    """The state (size, modification time) of the files under `root` in `opened`, but the code and `ignored`."""
+    files = {}
+    for path in opened :
+        path = Path(path).resolve()
+        if path.suffix in (".py", ".pyc") or not path.is_relative_to(root) \
+                or any(path.is_relative_to(directory) for directory in ignored) or not path.is_file() :
+            continue
+        files[str(path)] = _file_state(path)
+    return files
+
+
+def _display(value) :
+    """The HTML of the value of the last expression of a cell, as Jupyter shows it."""
+    if value is None or type(value).__name__ == "Figure" :
+        return None
+    if hasattr(value, "_repr_html_") :
+        return value._repr_html_()
+    return f'<pre class="output">{html.escape(repr(value))}</pre>'
+
+
+def _figures() :
+    """The png images of the open matplotlib figures, which are then closed."""
+    plt = sys.modules.get("matplotlib.pyplot")
+    if plt is None :
+        return {}
+    images = {}
+    for number in plt.get_fignums() :
+        figure = plt.figure(number)
+        buffer = io.BytesIO()
+        figure.savefig(buffer, format = "png", metadata = {"Software" : None})
+        plt.close(figure)
+        image = buffer.getvalue()
+        images[hashlib.sha256(image).hexdigest()[:16] + ".png"] = image
+    return images
+
+
+def _run(cell, filename, namespace) :
+    """Execute `cell` in `namespace`: its outputs (HTML fragments) and figures (file name -> png)."""
+    tree = ast.parse(cell.source)
+    ast.increment_lineno(tree, cell.line - 1)
+    last = tree.body.pop() if tree.body and isinstance(tree.body[-1], ast.Expr) else None
+    printed = io.StringIO()
+    with redirect_stdout(printed), redirect_stderr(printed), warnings.catch_warnings() :
+        # `plt.show()` on the Agg backend
+        warnings.filterwarnings("ignore", message = ".*non-interactive")
+        exec(compile(tree, filename, "exec"), namespace)
+        value = eval(compile(ast.Expression(last.value), filename, "eval"), namespace) if last else None
+    figures = _figures()
+    outputs = []
+    if printed.getvalue() :
+        outputs.append(f'<pre class="output">{html.escape(printed.getvalue())}</pre>')
+    outputs += [f'<img src="{FIGURES_DIR}/{name}" loading="lazy" alt="figure">' for name in figures]
+    shown = _display(value)
+    if shown :
+        outputs.append(shown)
+    return outputs, figures
+
+
+def _picklable(value) :
+    try :
+        content_digest(value)
+    except Exception :
+        return False
+    return True
+
+
+def _load(cache, key) :
+    """The cached outcome of a cell, if the files it opened did not change since."""
+    try :
+        entry = cache.load(key)
+    except KeyError :
+        return None
+    if any(_file_state(path) != state for path, state in entry["files"].items()) :
+        return None
+    return entry
+
+
+def build_report(notebook = "MTG_project.py", output = "report", cache_dir = CACHE_DIR, force = False) :
+    """Write the report of the cells of `notebook` to `output`, running only the cells whose inputs changed.
+
+    The page is `output/<name of notebook>.html`, its figures are in
+    `output/figures`. With `force = True` every cell is run. Returns the
+    path of the page.
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    start = time.perf_counter()
+    notebook = Path(notebook).resolve()
+    output = Path(output)
+    figures_dir = output / FIGURES_DIR
+    figures_dir.mkdir(parents = True, exist_ok = True)
+    cache = ArtifactCache(cache_dir, MAX_BYTES)
+    cells = read_cells(notebook)
+    names = [_names(ast.parse(cell.source)) if cell.kind == "code" else (set(), set()) for cell in cells]
+    # the variables read by the cells after every cell
+    read_after = [set().union(*(free for free, _ in names[position + 1:])) for position in range(len(cells))]
+    ignored = [Path(cache_dir).resolve(), output.resolve()]
+    _watch_files()
+
+    global _opened
+    namespace = {"__name__" : "__main__", "__file__" : str(notebook)}
+    digest = _Digests(notebook.parent)
+    sections = []
+    figures = {}
+    ran = cached = 0
+    for position, cell in enumerate(cells) :
+        if cell.kind == "markdown" :
+            sections.append(markdown_html(cell.source))
+            continue
+        free, bound = names[position]
+        key = hashlib.sha256(repr((CACHE_VERSION, cell.source)).encode())
+        for name in sorted(free & namespace.keys()) :
+            key.update(f"{name}={digest(namespace[name])}".encode())
+        key = key.hexdigest()
+        entry = None if force else _load(cache, key)
+        with span("report.cell", line = cell.line, cached = entry is not None) :
+            if entry is None :
+                before = {name : digest(namespace[name]) for name in (free | bound) & namespace.keys()}
+                _opened = set()
+                try :
+                    outputs, images = _run(cell, str(notebook), namespace)
+                finally :
+                    opened, _opened = _opened, None
+                changed = {name for name in (free | bound) & namespace.keys()
+                           if name not in before or digest(namespace[name]) != before[name]}
+                values = {name : namespace[name] for name in changed & read_after[position]}
+                entry = {"outputs" : outputs, "figures" : images, "values" : values,
+                         "files" : _files(opened, notebook.parent, ignored)}
+                if all(_picklable(value) for value in values.values()) :
+                    cache.store(key, entry, stage = f"report:{cell.line}")
+                ran += 1
+            else :
+                namespace.update(entry["values"])
+                cached += 1
+        code = f'<pre class="source"><code>{html.escape(cell.source)}</code></pre>'
+        sections.append("\n".join([code] + entry["outputs"]))
+        figures.update(entry["figures"])
+
+    for name, image in figures.items() :
+        path = figures_dir / name
+        if not path.exists() :
+            path.write_bytes(image)
+    for path in figures_dir.glob("*.png") :
+        if path.name not in figures :
+            path.unlink()
+    title = next((heading.group(1) for cell in cells if cell.kind == "markdown"
+                  for heading in [re.search(r"^# (.*)$", re.sub(r"<!--.*?-->", "", cell.source, flags = re.S), re.M)]
+                  if heading), notebook.stem)
+    page = output / (notebook.stem + ".html")
+    page.write_text(f'<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n<title>{html.escape(title)}</title>\n'
+                    f"<style>\n{STYLE}\n</style>\n</head>\n<body>\n" + "\n".join(sections) + "\n</body>\n</html>\n")
+    print(f"{ran} cells run, {cached} cached in {time.perf_counter() - start:.1f} s: {page} "
+          f"({page.stat().st_size / 1000:.0f} kB, {len(figures)} figures).")
+    return page
+
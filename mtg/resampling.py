@@ -0,0 +1,220 @@
+"""Permutation and bootstrap versions of the tests of `mtg.stats`.
+
+The card counts are far from normal for several card types and ranks (see
+`mtg.stats.normality`), so besides the parametric tests we provide:
+- `permutation_anova`: the p-value of the ANOVA F statistic under random
+  relabellings of the ranks (within every group of `by`),
+- `bootstrap_intervals`: percentile confidence intervals of the difference
+  between the mean counts of every pair of ranks.
+
+Resamples are drawn in vectorized blocks (a block of permutations is a
+fancy-indexing of the pooled counts, in batches holding at most
+`BATCH_BYTES` of resampled counts, so that memory does not grow with the
+number of decks) and the blocks are spread over a pool of processes. Every block has its own seed, derived from `seed` and
+from the position of the block, so the results do not depend on the number
+of workers. Permutations run in rounds: after every round, the p-values
+whose standard error is below `precision` are final and only the others
+get more permutations.
+
+    from mtg.datasets import load_clean
+    from mtg import resampling
+    resampling.permutation_anova(load_clean(), resamples = 20000, workers = 4)
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+
+from mtg.datasets import CARD_COUNTS
+from mtg.profiling import collect, traced
+from mtg.stats import RANKS, anova_test, pair_levels, pivot, rank_pairs, tidy
+
+# blocks of every group in a round of permutations
+BLOCKS_PER_ROUND = 4
+
+# blocks handed to a worker at once
+TASKS_PER_CHUNK = 32
+
+# the resampled counts (types x resamples x decks, as float64) held at once by a block
+BATCH_BYTES = 32 * 2 ** 20
+
+
+class _Inline :
+    """Stand-in for a process pool with a single worker."""
+
+    def __enter__(self) :
+        return self
+
+    def __exit__(self, *exc_info) :
+        return False
+
+    def map(self, function, *iterables) :
+        return map(function, *iterables)
+
+
+def _pool(workers) :
+    return _Inline() if workers == 1 else ProcessPoolExecutor(max_workers = workers)
+
+
+def _chunks(tasks) :
+    return [tasks[start:start + TASKS_PER_CHUNK] for start in range(0, len(tasks), TASKS_PER_CHUNK)]
+
+
+def _generator(seed, *key) :
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key = key))
+
+
+def _batches(size, decks, types) :
+    """The sizes of the batches in which `size` resamples of `decks` decks and `types` types are drawn."""
+    step = max(1, BATCH_BYTES // (8 * max(decks, 1) * (types + 1)))
+    return [min(step, size - start) for start in range(0, size, step)]
+
+
+def _pooled(samples, group) :
+    """The counts of `group` (type x deck), ranks one after the other, and the size of the ranks."""
+    sizes = samples.counts[group]
+    ranks = np.flatnonzero(sizes)
+    pooled = np.concatenate([samples.values[group, :, rank, :sizes[rank]] for rank in ranks], axis = -1)
+    return pooled, sizes[ranks]
+
+
+def _between(values, sizes) :
+    """The sum over the ranks of (sum of the counts)^2 / size, along the last axis.
+
+    The total sum of squares does not change under permutations, so this
+    part of the between-ranks sum of squares orders them as F does.
+    """
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    return (np.add.reduceat(values, starts, axis = -1) ** 2 / sizes).sum(axis = -1)
+
+
+def permutation_blocks(tasks, seed, size) :
+    """For every task, how many of `size` permutations reach the observed statistic, by type."""
+    results = []
+    for group, round_, block, pooled, sizes, observed in tasks :
+        generator = _generator(seed, 0, group, round_, block)
+        decks = pooled.shape[-1]
+        reached = np.zeros(len(pooled), dtype = np.int64)
+        for batch in _batches(size, decks, len(pooled)) :
+            order = generator.permuted(np.tile(np.arange(decks), (batch, 1)), axis = -1)
+            statistic = _between(pooled[:, order], sizes)
+            # allow for rounding errors on the permutations equal to the observed data
+            reached += (statistic >= observed[:, None] * (1 - 1e-12)).sum(axis = -1)
+        results.append(reached)
+    return results
+
+
+def permutation_anova(data, types = CARD_COUNTS, ranks = RANKS, by = None, resamples = 10000,
+                      precision = 0.005, block = 1000, workers = 1, seed = 0) :
+    """One-way ANOVA of every card type among the ranks, with permutation p-values.
+
+    Every p-value gets blocks of `block` permutations until its standard
+    error is below `precision`, or `resamples` permutations (rounded up to
+    whole rounds) have been drawn. The column `Resamples` of the result
+    counts the permutations drawn for it.
+    """
+    samples = pivot(data, sorted(types), ranks, by)
+    f_val, _ = anova_test(samples)
+    groups, types = samples.counts.shape[0], len(samples.types)
+    reached = np.zeros((groups, types))
+    drawn = np.zeros((groups, types), dtype = np.int64)
+
+    pooled = {}
+    for group in range(groups) :
+        values, sizes = _pooled(samples, group)
+        # no test with fewer than two ranks, or without a deck more than the ranks
+        if len(sizes) >= 2 and sizes.sum() > len(sizes) :
+            pooled[group] = values, sizes, _between(values, sizes)
+    active = np.zeros((groups, types), dtype = bool)
+    active[list(pooled)] = np.isfinite(f_val[list(pooled)])
+
+    round_ = 0
+    with _pool(workers) as pool :
+        while active.any() :
+            tasks = []
+            for group in np.flatnonzero(active.any(axis = 1)) :
+                values, sizes, observed = pooled[group]
+                rows = active[group]
+                tasks.extend((group, round_, number, values[rows], sizes, observed[rows])
+                             for number in range(BLOCKS_PER_ROUND))
+            chunks = pool.map(traced(permutation_blocks), _chunks(tasks), repeat(seed), repeat(block))
+            chunks = map(collect, chunks)
+            results = [counts for chunk in chunks for counts in chunk]
+            for task, counts in zip(tasks, results) :
+                group = task[0]
+                rows = np.flatnonzero(active[group])
+                reached[group, rows] += counts
+                drawn[group, rows] += block
+            p_val = (reached + 1) / (drawn + 1)
+            error = np.sqrt(p_val * (1 - p_val) / np.maximum(drawn, 1))
+            active &= (error > precision) & (drawn < resamples)
+            round_ += 1
+
+    p_val = np.where(drawn > 0, (reached + 1) / (drawn + 1), np.nan)
+    return tidy(samples, {"F" : f_val, "p" : p_val, "Resamples" : drawn})
+
+
+def bootstrap_blocks(tasks, seed, size) :
+    """For every task, `size` bootstrap differences of the mean counts (type x resample x pair)."""
+    results = []
+    for group, block, by_rank, first, second in tasks :
+        generator = _generator(seed, 1, group, block)
+        means = []
+        for values in by_rank :
+            if values.shape[-1] == 0 :
+                means.append(np.full((values.shape[0], size), np.nan))
+                continue
+            decks = values.shape[-1]
+            rank_means = np.empty((values.shape[0], size))
+            start = 0
+            for batch in _batches(size, decks, values.shape[0]) :
+                picks = generator.integers(0, decks, (batch, decks))
+                rank_means[:, start:start + batch] = values[:, picks].mean(axis = -1)
+                start += batch
+            means.append(rank_means)
+        means = np.stack(means, axis = -1)
+        results.append(means[..., first] - means[..., second])
+    return results
+
+
+def bootstrap_intervals(data, types = CARD_COUNTS, ranks = RANKS, by = None, resamples = 10000,
+                        confidence = 0.95, block = 1000, workers = 1, seed = 0) :
+    """Bootstrap confidence intervals of the difference between the mean
+    counts of every pair of ranks, for every card type.
+
+    The decks of every rank are resampled with replacement `resamples`
+    times (rounded up to whole blocks); Low and High are the percentiles
+    of the differences leaving out (1 - `confidence`) / 2 on each side.
+    """
+    samples = pivot(data, sorted(types), ranks, by)
+    groups, types = samples.counts.shape[0], len(samples.types)
+    first, second = np.array(rank_pairs(samples)).T
+    with np.errstate(invalid = "ignore", divide = "ignore") :
+        means = np.nansum(samples.values, axis = -1) / samples.counts[:, None, :]
+    blocks = -(-resamples // block)
+
+    tasks = []
+    for group in range(groups) :
+        sizes = samples.counts[group]
+        by_rank = [samples.values[group, :, rank, :sizes[rank]] for rank in range(len(sizes))]
+        tasks.extend((group, number, by_rank, first, second) for number in range(blocks))
+
+    tail = (1 - confidence) / 2 * 100
+    low = np.full((groups, types, len(first)), np.nan)
+    high = np.full((groups, types, len(first)), np.nan)
+    with _pool(workers) as pool :
+        # the blocks come back in order: a group is done after `blocks` of them
+        differences = []
+        group = 0
+        chunks = pool.map(traced(bootstrap_blocks), _chunks(tasks), repeat(seed), repeat(block))
+        for chunk in map(collect, chunks) :
+            for result in chunk :
+                differences.append(result)
+                if len(differences) == blocks :
+                    low[group], high[group] = np.percentile(np.concatenate(differences, axis = 1),
+                                                            [tail, 100 - tail], axis = 1)
+                    differences = []
+                    group += 1
+    return tidy(samples, {"Difference" : means[..., first] - means[..., second], "Low" : low, "High" : high},
+                pair_levels(samples))
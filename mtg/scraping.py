@@ -0,0 +1,458 @@
+"""Asynchronous scraper for the search and deck pages of www.mtgtop8.com.
+
+A search on mtgtop8 is described by a `Shard`: a format, an event filter,
+competition levels and a date window (by default the Standard Worlds of a
+year). The search pages of every shard are walked concurrently and, for
+each search page, all the linked deck pages are requested in parallel. Requests share a
+bounded pool of connections, are rate limited per host and are retried with
+exponential backoff on transient failures. The resulting table has the same
+columns as the historical `raw_magic.csv`; the decklists can also be
+collected, as sparse card matrices (see `mtg.cards`).
+"""
+
+import asyncio
+import random
+import datetime
+import threading
+import time
+from collections import defaultdict, namedtuple
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import httpx
+
+from mtg.cards import CardBuffer, save_cards
+from mtg.manifest import Manifest, append_rows
+from mtg.parsing import parse_deck_page, parse_decklist, parse_search_page
+from mtg.profiling import count, observe, span
+from mtg.records import KEY_COLUMNS, ColumnBuffer, deck_record
+
+BASE_URL = "https://www.mtgtop8.com/"
+
+# status codes worth retrying: the server is busy or temporarily down
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class Shard(namedtuple("Shard", ["format", "event", "levels", "date_start", "date_end"])) :
+    """A search on mtgtop8: the decks of `format` played between `date_start`
+    and `date_end` in the events whose title contains `event` (any event if
+    empty) of the competition `levels` ("P" professional, "M" major,
+    "C" competitive, "R" regular).
+    """
+
+    @property
+    def name(self) :
+        return (f"{self.format}_{self.event or 'all'}_{''.join(self.levels)}_"
+                f"{self.date_start:%Y%m%d}_{self.date_end:%Y%m%d}")
+
+    def ongoing(self) :
+        """Whether the results of the shard can still grow."""
+        return self.date_end >= datetime.date.today()
+
+    def parameters(self, page) :
+        """Query string of the search page `page`."""
+        parameters = {"current_page" : f"{page}",
+                      "event_titre" : self.event,
+                      "format" : self.format}
+        for level in self.levels :
+            parameters[f"compet_check[{level}]"] = "1"
+        parameters["date_start"] = f"{self.date_start:%d/%m/%Y}"
+        parameters["date_end"] = f"{self.date_end:%d/%m/%Y}"
+        return parameters
+
+
+def worlds_shard(year) :
+    """The Standard decks of the World Championship of `year`."""
+    return Shard("ST", "world", ("P",), datetime.date(year, 1, 1), datetime.date(year, 12, 31))
+
+
+def search_parameters(year, page) :
+    """Query string of the search page `page` for the Worlds of `year`."""
+    return worlds_shard(year).parameters(page)
+
+
+class HostRateLimiter :
+    """Space out the start of consecutive requests to the same host.
+
+    `rate` is the maximum number of requests per second per host.
+    """
+
+    def __init__(self, rate) :
+        self.interval = 1 / rate if rate else 0
+        self._next_slot = {}
+        self._locks = defaultdict(asyncio.Lock)
+
+    async def wait(self, host) :
+        if not self.interval :
+            return
+        loop = asyncio.get_running_loop()
+        async with self._locks[host] :
+            now = loop.time()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        await asyncio.sleep(slot - now)
+
+
+class Fetcher :
+    """A pool of at most `concurrency` connections with retries and backoff.
+
+    Use it as an asynchronous context manager:
+
+        async with Fetcher() as fetcher :
+            status, text = await fetcher.get(url, params)
+
+    With a `cache` (a `mtg.cache.ResponseCache`) fresh pages are served from
+    disk and stale ones are revalidated with a conditional request. With
+    `offline = True` only the cache is used: pages missing from it are
+    answered with a 504, as HTTP caches do for "only-if-cached" requests.
+    With an `archive` (a `mtg.archive.PageArchive`) every page answered
+    with a 200, from the network or from the cache, is archived.
+    """
+
+    def __init__(self, concurrency = 8, rate = 4.0, retries = 3, backoff = 0.5, timeout = 30.0,
+                 cache = None, offline = False, archive = None) :
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.limiter = HostRateLimiter(rate)
+        self.cache = cache
+        self.offline = offline
+        self.archive = archive
+        self._semaphore = None
+        self._client = None
+
+    async def __aenter__(self) :
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        limits = httpx.Limits(max_connections = self.concurrency,
+                              max_keepalive_connections = self.concurrency)
+        self._client = httpx.AsyncClient(limits = limits, timeout = self.timeout)
+        return self
+
+    async def __aexit__(self, *exc_info) :
+        await self._client.aclose()
+
+    def _delay(self, attempt, response = None) :
+        if response is not None :
+            retry_after = response.headers.get("Retry-After", "")
+            if retry_after.isdigit() :
+                return int(retry_after)
+        return self.backoff * 2 ** attempt * (1 + random.random())
+
+    async def get(self, url, params = None, revalidate = False) :
+        """Return the status code and the text of the page at `url`.
+
+        Transient failures are retried `retries` times; afterwards the last
+        status code is returned (or the last connection error is raised).
+        With `revalidate = True` a cached page is revalidated even if fresh
+        (e.g. the search pages of an ongoing shard, which can still grow).
+        """
+        status, text = await self._get(url, params, revalidate)
+        if status == 200 and self.archive is not None :
+            self.archive.add(url, params, text)
+        return status, text
+
+    async def _get(self, url, params, revalidate = False) :
+        entry = self.cache.lookup(url, params) if self.cache is not None else None
+        if entry is not None and (self.offline or (not revalidate and self.cache.is_fresh(entry))) :
+            count("cache_hits")
+            return 200, self.cache.read(entry)
+        if self.offline :
+            count("cache_misses")
+            return 504, ""
+        headers = self.cache.validators(entry) if entry is not None else {}
+
+        host = urlsplit(url).netloc
+        for attempt in range(self.retries + 1) :
+            response = None
+            async with self._semaphore :
+                await self.limiter.wait(host)
+                start = time.perf_counter()
+                try :
+                    response = await self._client.get(url, params = params, headers = headers)
+                except httpx.TransportError :
+                    count("request_errors")
+                    if attempt == self.retries :
+                        raise
+                observe("request_latency_s", time.perf_counter() - start)
+                count("requests")
+            if response is not None :
+                count("bytes_downloaded", len(response.content))
+                count(f"status_{response.status_code}")
+                if response.status_code == 304 and entry is not None :
+                    return 200, self.cache.revalidated(entry)
+                if response.status_code == 200 and self.cache is not None :
+                    self.cache.store(url, params, response.headers, response.text)
+                if response.status_code not in RETRY_STATUSES or attempt == self.retries :
+                    return response.status_code, response.text
+            count("retries")
+            await asyncio.sleep(self._delay(attempt, response))
+
+
+async def scrape_deck(fetcher, url, cards = False) :
+    """The status code of the deck page at `url`, the card type counts of the
+    deck and, with `cards = True`, its cards (None if the status is not 200)."""
+    status, text = await fetcher.get(url)
+    if status != 200 :
+        return status, None, None
+    with span("parse_deck") :
+        return (status,) + (parse_decklist(text) if cards else (parse_deck_page(text), None))
+
+
+async def _keyed(key, awaitable) :
+    return key, await awaitable
+
+
+ShardScrape = namedtuple("ShardScrape", ["records", "complete", "cards"], defaults = [None])
+
+
+async def scrape_shard(fetcher, shard, key, base_url = BASE_URL, known = (), records = None,
+                       cards = None, known_cards = ()) :
+    """Scrape all the search pages of `shard` and the decks they link to.
+
+    Decks whose id is in `known` are skipped. The record of every new deck,
+    keyed by `key`, is appended to the `ColumnBuffer` `records` (a new one by
+    default), in the order in which the decks appear on the website. The
+    rows of the search pages and the deck pages are joined by deck id, and
+    a deck listed twice (e.g. on two pages, when the results move between
+    two requests) is only recorded once.
+    With a `mtg.cards.CardBuffer` `cards`, the cards of the decks are
+    appended to it too, except for the decks in `known_cards`: a deck is
+    then only skipped when it is both in `known` and in `known_cards`.
+    Returns a `ShardScrape` with the buffers and whether the last page of
+    the results was reached with all of its decks. A deck whose page is not
+    answered with a 200 (missing, still failing after the retries, or not
+    in the cache offline) is not recorded and leaves the shard incomplete,
+    so that the next run downloads it again. A shard whose requests fail
+    (the website cannot be reached) is left incomplete too, with the decks
+    of the pages before, without stopping the other shards.
+    """
+    records = ColumnBuffer() if records is None else records
+    try :
+        return await _scrape_pages(fetcher, shard, key, base_url, known, records, cards, known_cards)
+    except httpx.TransportError as error :
+        count("shards_failed")
+        print(f"Requests of {key} failed ({error!r}); it will resume on the next run.")
+        return ShardScrape(records, False, cards)
+
+
+async def _scrape_pages(fetcher, shard, key, base_url, known, records, cards, known_cards) :
+    known_cards = known_cards if cards is not None else None
+    seen = set()
+    failed = 0
+    page = 1
+    while True :
+        status, text = await fetcher.get(base_url + "search", shard.parameters(page), revalidate = shard.ongoing())
+        if status != 200 :
+            print(f"Status code page {page} or {key} : {status}.")
+            return ShardScrape(records, False, cards)
+        with span("parse_search_page") :
+            listing = parse_search_page(text)
+        count("search_pages")
+        if listing == {} :
+            if failed :
+                print(f"Finished with {key}, but {failed} decks failed; they will be retried on the next run.")
+                return ShardScrape(records, False, cards)
+            print(f"Finished with {key}.")
+            return ShardScrape(records, True, cards)
+        new = [identifier for identifier in listing if identifier not in seen
+               and (identifier not in known or (known_cards is not None and identifier not in known_cards))]
+        seen.update(listing)
+        print(f"I am scraping {key}, page {page} : {len(new)} new decks")
+        decks = dict(await asyncio.gather(*(_keyed(identifier, scrape_deck(fetcher, base_url + listing[identifier][1],
+                                                                           cards is not None))
+                                            for identifier in new)))
+        for identifier in new :
+            status, deck, decklist = decks[identifier]
+            if status != 200 :
+                print(f"Status code deck {identifier} of {key} : {status}.")
+                count("decks_failed")
+                failed += 1
+                seen.discard(identifier)
+                continue
+            if identifier not in known :
+                records.append(deck_record(listing[identifier][0], deck, key, page, identifier))
+            if cards is not None and identifier not in known_cards :
+                cards.append(key, page, identifier, decklist)
+        page += 1
+
+
+async def scrape_shards(shards, base_url = BASE_URL, known = None, chunk_size = None, sink = None,
+                        cards = False, known_cards = None, cards_sink = None, **fetcher_options) :
+    """Scrape the shards of the dictionary `shards` (key -> `Shard`) concurrently.
+
+    Returns a `ShardScrape` per shard. `known` maps a key to the ids of its
+    decks to be skipped. With a `sink`, the records of every shard are handed
+    to it every `chunk_size` decks and when the shard is over, instead of
+    being kept in memory. With `cards = True` the decklists are collected
+    as well, skipping the ids in `known_cards`, and handed to `cards_sink`
+    in the same way.
+    """
+    known = known or {}
+    known_cards = known_cards or {}
+    async with Fetcher(**fetcher_options) as fetcher :
+        results = await asyncio.gather(*(scrape_shard(fetcher, shard, key, base_url, known.get(key, ()),
+                                                      ColumnBuffer(chunk_size, sink),
+                                                      CardBuffer(chunk_size, cards_sink) if cards else None,
+                                                      known_cards.get(key, ()))
+                                         for key, shard in shards.items()))
+    for result in results :
+        if sink is not None :
+            result.records.flush()
+        if cards_sink is not None and result.cards is not None :
+            result.cards.flush()
+    cache = fetcher_options.get("cache")
+    if cache is not None :
+        with span("evict_cache") :
+            dropped = cache.evict()
+        count("cache_evicted", dropped)
+    return results
+
+
+async def scrape_worlds_async(years, base_url = BASE_URL, **fetcher_options) :
+    """Asynchronous version of `scrape_worlds`."""
+    records = ColumnBuffer()
+    shards = {year : worlds_shard(year) for year in years}
+    for result in await scrape_shards(shards, base_url, **fetcher_options) :
+        records.extend(result.records)
+    return records.to_frame(keys = False)
+
+
+def run(coroutine) :
+    """Run `coroutine` to completion, also from inside a running event loop.
+
+    Jupyter kernels already run an event loop, in which case the coroutine
+    is executed in a separate thread.
+    """
+    try :
+        asyncio.get_running_loop()
+    except RuntimeError :
+        return asyncio.run(coroutine)
+
+    result = {}
+
+    def target() :
+        try :
+            result["value"] = asyncio.run(coroutine)
+        except BaseException as error :
+            result["error"] = error
+
+    thread = threading.Thread(target = target)
+    thread.start()
+    thread.join()
+    if "error" in result :
+        raise result["error"]
+    return result["value"]
+
+
+def scrape_worlds(years, base_url = BASE_URL, **fetcher_options) :
+    """Scrape the Standard decks played in the Worlds of the given years.
+
+    `fetcher_options` are passed to `Fetcher` (concurrency, rate, retries,
+    backoff, timeout, cache, offline, archive). Returns a DataFrame with the columns
+    of `raw_magic.csv`.
+    """
+    return run(scrape_worlds_async(years, base_url, **fetcher_options))
+
+
+def ingest(data_file, shards, manifest_file = None, refresh = False, chunk_size = 500,
+           base_url = BASE_URL, cards_dir = None, on_rows = None, **fetcher_options) :
+    """Add to the raw data set `data_file` the decks of `shards` it does not contain yet.
+
+    `shards` maps a key (e.g. a year) to a `Shard`. Only the shards which are
+    not complete in the manifest (by default `data_file` with the suffix
+    `.manifest.json`) are scraped, or all of them with `refresh = True`;
+    within them, only the decks missing from the manifest are downloaded.
+    A manifest listing decks while `data_file` is missing is reset, so that
+    all the shards are scraped again.
+    The new rows are appended to `data_file` (which is created if needed)
+    every `chunk_size` decks, so that memory does not grow with the size of
+    the crawl, and the manifest is saved with them: an interrupted run
+    resumes where it stopped. Returns the number of new decks.
+
+    With a `cards_dir`, the decklists are saved in the card store
+    `cards_dir` (see `mtg.cards`), which has a manifest of its own: the
+    shards whose decklists are missing are walked again, even when their
+    rows are already in `data_file`, and only the decklists are added.
+
+    `on_rows` is called with every chunk of new rows once they are in
+    `data_file` and before the manifest lists them, e.g. a
+    `mtg.cleaning.StreamingCleaner` appending them, cleaned, to `magic.csv`.
+    """
+    data_file = Path(data_file)
+    manifest = Manifest(manifest_file or data_file.with_suffix(".manifest.json"))
+    if not data_file.exists() and any(shard["decks"] for shard in manifest.shards.values()) :
+        # the rows the manifest lists are gone with the file: they are scraped again
+        # (a shard complete without decks, e.g. an event with no results, writes no file)
+        print(f"{data_file.name} is missing : its manifest is reset.")
+        manifest.reset()
+        manifest.save()
+    if not manifest.path.exists() and data_file.exists() :
+        manifest.bootstrap(data_file, [key for key, shard in shards.items() if not shard.ongoing()])
+        manifest.save()
+
+    card_manifest = None
+    if cards_dir is not None :
+        Path(cards_dir).mkdir(parents = True, exist_ok = True)
+        card_manifest = Manifest(Path(cards_dir, "manifest.json"))
+    todo = {key : shard for key, shard in shards.items()
+            if refresh or not manifest.is_complete(key)
+            or (card_manifest is not None and not card_manifest.is_complete(key))}
+    if todo == {} :
+        print(f"All the shards of {data_file.name} are already scraped.")
+    known = {key : manifest.known(key) for key in todo}
+    # shards walked again only for their decklists
+    rows_done = {str(key) for key in todo if not refresh and manifest.is_complete(key)}
+    added = 0
+
+    def sink(frame) :
+        # the rows are on disk before the manifest lists them: a crash in
+        # between costs a duplicated row, never a missing one
+        nonlocal added
+        frame = frame[~frame["shard"].isin(rows_done)]
+        if frame.empty :
+            return
+        with span("append_rows", rows = len(frame)) :
+            rows = frame.drop(columns = KEY_COLUMNS)
+            append_rows(data_file, rows)
+            if on_rows is not None :
+                on_rows(rows)
+            for key, page, deck in frame[KEY_COLUMNS].itertuples(index = False) :
+                manifest.add(key, int(page), deck)
+            manifest.save()
+        count("rows_appended", len(frame))
+        added += len(frame)
+
+    def cards_sink(matrix, keys) :
+        with span("save_cards", decks = len(matrix)) :
+            save_cards(matrix, cards_dir)
+            for key, page, deck in keys :
+                card_manifest.add(key, int(page), deck)
+            card_manifest.save()
+        count("decklists_saved", len(matrix))
+
+    known_cards = {key : card_manifest.known(key) for key in todo} if card_manifest is not None else None
+    with span("scrape", shards = len(todo)) :
+        results = run(scrape_shards(todo, base_url, known, chunk_size, sink, card_manifest is not None,
+                                    known_cards, cards_sink, **fetcher_options))
+    for (key, shard), result in zip(todo.items(), results) :
+        if result.complete and not shard.ongoing() :
+            manifest.mark_complete(key)
+            if card_manifest is not None :
+                card_manifest.mark_complete(key)
+    manifest.save()
+    if card_manifest is not None :
+        card_manifest.save()
+    print(f"{added} new decks added to {data_file}.")
+    return added
+
+
+def scrape_incremental(data_file, years, manifest_file = None, refresh = False, chunk_size = 500,
+                       base_url = BASE_URL, cards_dir = None, on_rows = None, **fetcher_options) :
+    """Add to the raw data set `data_file` the Worlds decks it does not contain yet.
+
+    See `ingest`: the shards are the Worlds of the given years.
+    """
+    shards = {year : worlds_shard(year) for year in years}
+    return ingest(data_file, shards, manifest_file, refresh, chunk_size, base_url, cards_dir, on_rows,
+                  **fetcher_options)
@@ -0,0 +1,165 @@
+"""A local HTTP/JSON service answering queries on the cleaned data set.
+
+The data set is loaded once, and the rows of every value of Year, Rank,
+Event and Deck are listed once as well: selecting the decks of some years,
+ranks, events or decks is then an intersection of those lists instead of a
+scan of the whole table. The answers (aggregates and tests) are kept in a
+LRU cache keyed by the query, so that a dashboard asking the same questions
+again gets them without anything being computed.
+
+    python -m mtg serve --port 8050
+    curl "localhost:8050/means?by=Year&rank=1"
+    curl "localhost:8050/tests/anova?year=2010&year=2011"
+
+The queries (GET, filtered by the parameters year, rank, event and deck,
+each of which can be repeated) are
+- /decks: the decks selected (the first `limit`),
+- /champions: the decks ranked first,
+- /means: the mean card counts by `by` (Year by default),
+- /variances: the variances of the card counts by rank,
+- /tests/<test>: anova, normality, welch or all of them in one table (see
+  `mtg.stats`), for every value of `by` if given,
+- /info: the number of decks and the statistics of the cache.
+/reload loads the data set again (e.g. after `python -m mtg scrape --clean`).
+Flask is only imported by `create_app`: `QueryService` answers the same
+queries from Python.
+"""
+
+import json
+from functools import lru_cache
+
+import numpy as np
+
+from mtg import stats
+from mtg.datasets import CARD_COUNTS, DATA_DIR, load_clean
+from mtg.profiling import span
+
+# the columns the decks can be selected by
+INDEXED = ["Year", "Rank", "Event", "Deck"]
+
+TESTS = {"anova" : stats.anova, "normality" : stats.normality, "welch" : stats.welch, "all" : stats.tests}
+
+QUERIES = ["decks", "champions", "means", "variances"] + [f"tests/{test}" for test in TESTS]
+
+
+def _records(frame) :
+    """The rows of `frame` as JSON objects (missing values as null, dates in ISO format)."""
+    return json.loads(frame.to_json(orient = "records", date_format = "iso"))
+
+
+class QueryService :
+    """The queries of the service on the data set `data`, with the last `cache_size` answers cached."""
+
+    def __init__(self, data, cache_size = 256, data_dir = None) :
+        self.cache_size = cache_size
+        self.data_dir = data_dir
+        self.load(data)
+
+    @classmethod
+    def from_store(cls, data_dir = DATA_DIR, cache_size = 256) :
+        """The service on the cleaned data set of `data_dir` (see `mtg.datasets.load_clean`)."""
+        return cls(load_clean(data_dir = data_dir), cache_size, data_dir)
+
+    def reload(self) :
+        """Load the cleaned data set again (only for a service built by `from_store`)."""
+        if self.data_dir is None :
+            raise ValueError("the data set of this service was not loaded from a data directory")
+        self.load(load_clean(data_dir = self.data_dir))
+
+    def load(self, data) :
+        """Index `data` and empty the cache."""
+        with span("service.index", rows = len(data)) :
+            self.data = data.assign(Year = data["Date"].dt.year).reset_index(drop = True)
+            # value (as a string, as in a query) -> positions of its rows
+            self.indexes = {column : {str(value) : positions for value, positions
+                                      in self.data.groupby(column, observed = True).indices.items()}
+                            for column in INDEXED}
+        self.answer = lru_cache(maxsize = self.cache_size)(self._answer)
+
+    def select(self, filters = ()) :
+        """The decks whose values are among the ones of `filters`, pairs (column, values)."""
+        positions = None
+        for column, values in filters :
+            if column not in self.indexes :
+                raise ValueError(f"the decks can be selected by {INDEXED}, not by {column!r}")
+            index = self.indexes[column]
+            rows = np.concatenate([index.get(str(value), np.empty(0, dtype = np.intp)) for value in values])
+            positions = rows if positions is None else np.intersect1d(positions, rows, assume_unique = True)
+        if positions is None :
+            return self.data
+        return self.data.iloc[np.sort(positions)]
+
+    def query(self, name, filters = None, by = None, limit = None) :
+        """The answer to the query `name` (see `QUERIES`) on the decks selected by `filters`.
+
+        `filters` maps a column of `INDEXED` to the values to keep; the
+        answers are cached whatever the order of the filters and values.
+        """
+        filters = tuple(sorted((column, tuple(sorted(map(str, values))))
+                               for column, values in (filters or {}).items() if values))
+        by = tuple(by) if by else ()
+        return self.answer(name, filters, by, limit)
+
+    def _answer(self, name, filters, by, limit) :
+        if name not in QUERIES :
+            raise ValueError(f"query must be one of {QUERIES}, not {name!r}")
+        missing = [column for column in by if column not in self.data]
+        if missing :
+            raise ValueError(f"cannot group by {missing}, not in {list(self.data.columns)}")
+        with span(f"service.{name}") :
+            data = self.select(filters)
+            if name == "champions" :
+                data = data[data["Rank"] == 1]
+            if name in ("decks", "champions") :
+                table = data.drop(columns = "Year").head(limit)
+            elif name == "means" :
+                by = list(by or ["Year"])
+                table = data.groupby(by, observed = True)[CARD_COUNTS].mean().reset_index()
+            elif name == "variances" :
+                table = stats.variances(data).reset_index()
+            else :
+                table = TESTS[name.split("/")[1]](data, by = list(by) or None)
+            return {"decks" : len(data), "rows" : _records(table)}
+
+    def info(self) :
+        cache = self.answer.cache_info()
+        return {"decks" : len(self.data), "queries" : QUERIES, "indexed" : INDEXED,
+                "cache" : {"hits" : cache.hits, "misses" : cache.misses, "size" : cache.currsize,
+                           "max_size" : cache.maxsize}}
+
+
+def create_app(service) :
+    """The Flask application serving the queries of the `QueryService` `service`."""
+    from flask import Flask, jsonify, request
+
+    app = Flask(__name__)
+
+    def filters() :
+        return {column : request.args.getlist(column.lower()) for column in INDEXED}
+
+    @app.errorhandler(ValueError)
+    def bad_query(error) :
+        return jsonify(error = str(error)), 400
+
+    @app.get("/info")
+    def info() :
+        return jsonify(service.info())
+
+    @app.post("/reload")
+    def reload() :
+        service.reload()
+        return jsonify(service.info())
+
+    @app.get("/<path:name>")
+    def query(name) :
+        limit = request.args.get("limit", type = int)
+        return jsonify(service.query(name, filters(), request.args.getlist("by"), limit))
+
+    return app
+
+
+def serve(host = "127.0.0.1", port = 8050, data_dir = DATA_DIR, cache_size = 256) :
+    """Load the cleaned data set of `data_dir` and answer the queries on `host:port`."""
+    service = QueryService.from_store(data_dir, cache_size)
+    print(f"{len(service.data)} decks loaded, serving on http://{host}:{port}/")
+    create_app(service).run(host = host, port = port, threaded = True)
@@ -0,0 +1,232 @@
+"""Similarity of the decklists, nearest decks and archetypes.
+
+The names of the decks on mtgtop8 ("RG Aggro", "Wug Control", ...) are
+free text and change from year to year and from player to player; the
+decklists (see `mtg.cards`) say what a deck actually is. Two decks are
+similar when they share most of their cards, copies included: a deck is
+the multiset of its mainboard cards and we compare them with the
+(multiset) Jaccard similarity.
+
+Comparing every deck with every other one is quadratic, so we index them
+with MinHash and locality sensitive hashing (LSH):
+- the signature of a deck is the minimum of `num_perm` hash functions over
+  its cards, computed for all the decks at once with `np.minimum.reduceat`;
+  the fraction of equal entries of two signatures estimates their Jaccard
+  similarity,
+- the signatures are cut in `bands` bands: decks with an identical band
+  fall in the same bucket of that band and are candidates to be similar.
+  With 32 bands of 4 rows, decks with a similarity of 0.5 meet with a
+  probability of 0.87, decks with a similarity of 0.2 with 0.05.
+A query only compares the deck with the candidates of its buckets (by the
+cosine of the card count vectors), and `archetypes` links every deck to the
+first deck of each of its buckets when their estimated similarity reaches a
+threshold: the archetypes are the connected components of these links,
+found without comparing all the pairs.
+
+    from mtg.datasets import load_decklists
+    from mtg.similarity import SimilarityIndex
+    index = SimilarityIndex(load_decklists())
+    index.query("10001", k = 5)
+    labels = index.archetypes(threshold = 0.5)
+"""
+
+import numpy as np
+import pandas as pd
+
+NUM_PERM = 128
+
+BANDS = 32
+
+# a card played more than that is counted this many times (basic lands)
+MAX_COPIES = 255
+
+
+def _row_sums(indptr, values) :
+    """The sum of `values` over the rows of a CSR matrix (0 for the empty rows)."""
+    cumulative = np.concatenate([[0], np.cumsum(values)])
+    return cumulative[indptr[1:]] - cumulative[indptr[:-1]]
+
+
+def _tokens(indptr, indices, counts) :
+    """The cards of every deck as a multiset: one token per copy of every card."""
+    copies = np.minimum(counts, MAX_COPIES).astype(np.int64)
+    card = np.repeat(indices.astype(np.uint64), copies)
+    # the number of the copy, 0 for the first one
+    starts = np.cumsum(copies) - copies
+    copy = np.arange(copies.sum()) - np.repeat(starts, copies)
+    tokens = (card << np.uint64(8)) | copy.astype(np.uint64)
+    return _row_sums(indptr, copies), tokens
+
+
+def hash_parameters(num_perm = NUM_PERM, seed = 0) :
+    """Multipliers (odd) and increments of the `num_perm` hash functions."""
+    generator = np.random.default_rng(seed)
+    high = np.iinfo(np.uint64).max
+    multipliers = generator.integers(0, high, num_perm, dtype = np.uint64, endpoint = True) | np.uint64(1)
+    increments = generator.integers(0, high, num_perm, dtype = np.uint64, endpoint = True)
+    return multipliers, increments
+
+
+def signatures(indptr, indices, counts, parameters, block = 512) :
+    """The MinHash signatures (decks x hash functions) of the decks of a CSR matrix.
+
+    The hash functions are `a * x + b` on 64 bits (the multiply-shift
+    family); the decks are processed `block` at a time to bound memory.
+    Empty decks get a signature of maximum values.
+    """
+    multipliers, increments = parameters
+    decks = len(indptr) - 1
+    result = np.full((decks, len(multipliers)), np.iinfo(np.uint64).max, dtype = np.uint64)
+    for first in range(0, decks, block) :
+        last = min(first + block, decks)
+        start, end = indptr[first], indptr[last]
+        sizes, tokens = _tokens(indptr[first:last + 1] - start, indices[start:end], counts[start:end])
+        if len(tokens) == 0 :
+            continue
+        # hash functions x tokens: the reduction runs along contiguous memory
+        hashes = np.multiply.outer(multipliers, tokens)
+        hashes += increments[:, None]
+        filled = np.flatnonzero(sizes)
+        offsets = (np.cumsum(sizes) - sizes)[filled]
+        result[first + filled] = np.minimum.reduceat(hashes, offsets, axis = 1).T
+    return result
+
+
+def band_keys(signature, bands = BANDS) :
+    """One 64 bits key per band of the signatures (decks x bands)."""
+    rows = signature.shape[-1] // bands
+    if rows * bands != signature.shape[-1] :
+        raise ValueError(f"{signature.shape[-1]} hash functions cannot be cut in {bands} bands")
+    mixers = hash_parameters(rows, seed = 1)[0]
+    # combine the rows of a band (wrapping around 64 bits)
+    return (signature[..., :bands * rows].reshape(*signature.shape[:-1], bands, rows) * mixers).sum(axis = -1)
+
+
+class SimilarityIndex :
+    """MinHash/LSH index of the mainboards (or `board = "sb"` sideboards) of a
+    `mtg.cards.CardMatrix`."""
+
+    def __init__(self, matrix, num_perm = NUM_PERM, bands = BANDS, seed = 0, board = "md") :
+        self.matrix = matrix
+        self.board = board
+        self.csr = matrix.board(board)
+        self.parameters = hash_parameters(num_perm, seed)
+        self.bands = bands
+        self.signatures = signatures(*self.csr, self.parameters)
+        self.empty = np.diff(self.csr.indptr) == 0
+        keys = band_keys(self.signatures, bands)
+        # the decks of every band sorted by key: a bucket is a run of equal keys
+        self.order = np.argsort(keys, axis = 0, kind = "stable")
+        self.keys = np.take_along_axis(keys, self.order, axis = 0)
+        self.norms = np.sqrt(_row_sums(self.csr.indptr, self.csr.counts.astype(np.float64) ** 2))
+        self.rows = pd.Index(matrix.deck_ids)
+
+    def __len__(self) :
+        return len(self.matrix)
+
+    def _row(self, deck) :
+        row = self.rows.get_indexer([str(deck)])[0]
+        if row < 0 :
+            raise KeyError(deck)
+        return row
+
+    def _vector(self, deck) :
+        """The CSR arrays (indptr, indices, counts) of a deck id or of a decklist name -> copies."""
+        if not isinstance(deck, dict) :
+            row = self._row(deck)
+            start, end = self.csr.indptr[row], self.csr.indptr[row + 1]
+            return np.array([0, end - start]), self.csr.indices[start:end], self.csr.counts[start:end]
+        ids = self.matrix.card_ids(deck)
+        # the cards never seen get ids of their own, matching no other deck
+        unknown = ids < 0
+        ids[unknown] = len(self.matrix.names) + np.arange(unknown.sum())
+        return (np.array([0, len(ids)]), ids.astype(np.uint32),
+                np.fromiter(deck.values(), dtype = np.uint16, count = len(ids)))
+
+    def candidates(self, deck) :
+        """The rows of the decks sharing a bucket with `deck` (a deck id or a decklist)."""
+        vector = self._vector(deck)
+        keys = band_keys(signatures(*vector, self.parameters), self.bands)[0]
+        found = []
+        for band, key in enumerate(keys) :
+            first = np.searchsorted(self.keys[:, band], key, "left")
+            last = np.searchsorted(self.keys[:, band], key, "right")
+            found.append(self.order[first:last, band])
+        rows = np.unique(np.concatenate(found))
+        return rows[~self.empty[rows]]
+
+    def cosine(self, deck, rows = None) :
+        """Cosine similarity of the card counts of `deck` with the decks `rows` (all by default)."""
+        _, indices, counts = self._vector(deck)
+        query = np.zeros(max(len(self.matrix.names), int(indices.max(initial = 0)) + 1))
+        query[indices] = counts
+        csr = self.csr if rows is None else self.matrix.take(rows).board(self.board)
+        dots = _row_sums(csr.indptr, query[csr.indices] * csr.counts)
+        norms = self.norms if rows is None else self.norms[rows]
+        with np.errstate(invalid = "ignore", divide = "ignore") :
+            return np.nan_to_num(dots / (norms * np.sqrt((query ** 2).sum())))
+
+    def query(self, deck, k = 10, exhaustive = False) :
+        """The `k` decks most similar to `deck` (a deck id or a decklist name -> copies).
+
+        Only the LSH candidates are compared with the deck, unless
+        `exhaustive`, in which case the cosine is computed for every deck in
+        a single vectorized pass. The deck itself is left out.
+        """
+        rows = np.flatnonzero(~self.empty) if exhaustive else self.candidates(deck)
+        if not isinstance(deck, dict) :
+            rows = rows[rows != self._row(deck)]
+        similarity = self.cosine(deck, rows)
+        best = np.argsort(-similarity, kind = "stable")[:k]
+        return pd.DataFrame({"deck_id" : self.matrix.deck_ids[rows[best]], "Similarity" : similarity[best]})
+
+    def estimated_similarity(self, first, second) :
+        """The MinHash estimate of the Jaccard similarity of the decks at the rows `first` and `second`."""
+        return (self.signatures[first] == self.signatures[second]).mean(axis = -1)
+
+    def archetypes(self, threshold = 0.5) :
+        """Cluster the decks: returns an archetype number for every deck (-1 for the empty ones).
+
+        In every bucket, each deck is linked to the first deck of the bucket
+        if their estimated similarity is at least `threshold`; archetypes
+        are the connected components of the links. Every deck is compared
+        with at most one deck per band.
+        """
+        from scipy.sparse import coo_matrix
+        from scipy.sparse.csgraph import connected_components
+        decks = len(self)
+        sources, targets = [], []
+        for band in range(self.bands) :
+            keys, order = self.keys[:, band], self.order[:, band]
+            starts = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]]))
+            leader = order[np.repeat(starts, np.diff(np.append(starts, decks)))]
+            linked = (leader != order) & ~self.empty[order]
+            sources.append(order[linked])
+            targets.append(leader[linked])
+        # the same link is often found in several bands
+        links = np.unique(np.concatenate(sources).astype(np.int64) * decks + np.concatenate(targets))
+        sources, targets = links // decks, links % decks
+        close = self.estimated_similarity(sources, targets) >= threshold
+        graph = coo_matrix((np.ones(close.sum()), (sources[close], targets[close])), shape = (decks, decks))
+        _, labels = connected_components(graph, directed = False)
+        # number the archetypes by decreasing size, the empty decks apart
+        labels = np.where(self.empty, -1, labels)
+        kept = labels[labels >= 0]
+        ranking = np.argsort(-np.bincount(kept, minlength = labels.max(initial = -1) + 1), kind = "stable")
+        renumber = np.empty_like(ranking)
+        renumber[ranking] = np.arange(len(ranking))
+        return np.where(labels >= 0, renumber[np.maximum(labels, 0)], -1)
+
+
+def archetype_names(labels, deck_ids, names) :
+    """The most common deck name of every archetype.
+
+    `names` maps the deck ids to their names (e.g. a Series indexed by
+    deck id); returns a table with the archetype, its most common name and
+    its number of decks.
+    """
+    frame = pd.DataFrame({"Archetype" : labels, "Deck" : pd.Series(names).reindex(deck_ids).to_numpy()})
+    frame = frame[frame["Archetype"] >= 0]
+    counts = frame.groupby("Archetype")["Deck"].agg(lambda decks : decks.mode().iat[0] if decks.notna().any() else None)
+    return pd.DataFrame({"Archetype" : counts.index, "Deck" : counts.to_numpy(),
+                         "Decks" : frame.groupby("Archetype").size().to_numpy()})
@@ -0,0 +1,205 @@
+"""Statistical tests for the equality of the mean card counts among the ranks.
+
+Every test takes the cleaned data set (see `mtg.datasets.load_clean`) and
+returns a table, one row per card type (and rank, or pair of ranks), which
+is printed by `python -m mtg stats`. scipy is only imported when a test is
+actually run, so that importing this module costs no more than pandas.
+
+The data are not split with a groupby per test: `pivot` scatters them once
+into a dense array (group x type x rank x sample, padded with NaN), and
+every test is computed on the whole array at once, along its last axis.
+Running the tests for every format and year (`by = ["Format", "Year"]`)
+therefore costs about as much as running them once. `tests` gathers all of
+them in a single tidy table.
+
+    from mtg.datasets import load_clean
+    from mtg import stats
+    stats.anova(load_clean(columns = ["Rank", "Lands", "Creatures"]), ["Lands", "Creatures"])
+"""
+
+from collections import namedtuple
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+from mtg.datasets import CARD_COUNTS
+from mtg.profiling import span
+
+RANKS = [1, 2, 3, 4]
+
+
+def rank_groups(data, column, ranks = RANKS) :
+    """The values of `column`, one group per rank."""
+    return [data.loc[data["Rank"] == rank, column] for rank in ranks]
+
+
+def variances(data, types = CARD_COUNTS) :
+    """The (population) variance of every card type, by rank."""
+    return data[["Rank"] + list(types)].groupby("Rank", observed = False).var(ddof = 0)
+
+
+def long_format(data, types = CARD_COUNTS) :
+    """One row per deck and card type, with the columns `Type` and `Count`."""
+    id_vars = [column for column in data.columns if column not in types]
+    return pd.melt(frame = data, id_vars = id_vars, value_vars = list(types),
+                   var_name = "Type", value_name = "Count")
+
+
+class Samples(namedtuple("Samples", ["values", "counts", "keys", "types", "ranks"])) :
+    """The card counts of `pivot`.
+
+    `values[g, t, r, i]` is the count of type `types[t]` in the `i`-th deck
+    ranked `ranks[r]` of the group `g` (NaN past the `counts[g, r]` decks
+    of the group with that rank); `keys` holds the keys of the groups (a
+    DataFrame, with no columns without groups).
+    """
+
+
+def pivot(data, types = CARD_COUNTS, ranks = RANKS, by = None) :
+    """The card counts `types` of `data` as dense `Samples`.
+
+    The decks ranked outside `ranks` are left out; `by` is a list of columns
+    whose distinct values split the data in groups.
+    """
+    with span("pivot", rows = len(data)) :
+        return _pivot(data, list(types), list(ranks), by)
+
+
+def _pivot(data, types, ranks, by) :
+    rank = pd.Index(ranks).get_indexer(np.asarray(data["Rank"]))
+    kept = rank >= 0
+    data, rank = data[kept], rank[kept]
+    if by :
+        grouped = data.groupby(list(by), observed = True, sort = True)
+        group = grouped.ngroup().to_numpy()
+        keys = grouped.size().index.to_frame(index = False)
+    else :
+        group = np.zeros(len(data), dtype = np.int64)
+        keys = pd.DataFrame(index = pd.RangeIndex(1))
+
+    # position of every deck among the decks of its cell (group, rank)
+    cell = group * len(ranks) + rank
+    counts = np.bincount(cell, minlength = len(keys) * len(ranks))
+    order = np.argsort(cell, kind = "stable")
+    position = np.empty(len(cell), dtype = np.int64)
+    position[order] = np.arange(len(cell)) - (np.cumsum(counts) - counts)[cell[order]]
+
+    values = np.full((len(keys), len(ranks), max(counts.max(initial = 0), 1), len(types)), np.nan)
+    values[group, rank, position] = data[types].to_numpy(dtype = float)
+    return Samples(values.transpose(0, 3, 1, 2), counts.reshape(len(keys), len(ranks)), keys,
+                   types, ranks)
+
+
+def _moments(samples) :
+    """Size, mean and sum of the squared deviations of every (group, type, rank)."""
+    n = np.broadcast_to(samples.counts[:, None, :], samples.values.shape[:3])
+    with np.errstate(invalid = "ignore", divide = "ignore") :
+        mean = np.nansum(samples.values, axis = -1) / n
+        squares = np.nansum((samples.values - mean[..., None]) ** 2, axis = -1)
+    return n, mean, squares
+
+
+def anova_test(samples) :
+    """F statistic and p-value of the one-way ANOVA among the ranks, by group and type."""
+    import scipy.stats as ss
+    n, mean, squares = _moments(samples)
+    total = n.sum(axis = -1)
+    k = (n > 0).sum(axis = -1)
+    with np.errstate(invalid = "ignore", divide = "ignore") :
+        grand = np.nansum(mean * n, axis = -1) / total
+        between = np.nansum(n * (mean - grand[..., None]) ** 2, axis = -1) / (k - 1)
+        within = squares.sum(axis = -1) / (total - k)
+        f_val = between / within
+    return f_val, ss.f.sf(f_val, k - 1, total - k)
+
+
+def shapiro_test(samples) :
+    """W statistic and p-value of the Shapiro-Wilk test, by group, type and rank."""
+    import scipy.stats as ss
+    result = ss.shapiro(samples.values, axis = -1, nan_policy = "omit")
+    return result.statistic, result.pvalue
+
+
+def rank_pairs(samples) :
+    return list(combinations(range(len(samples.ranks)), 2))
+
+
+def pair_levels(samples) :
+    """The pairs of `rank_pairs`, as the columns Rank and Other_rank of a table."""
+    return pd.DataFrame([(samples.ranks[i], samples.ranks[j]) for i, j in rank_pairs(samples)],
+                        columns = ["Rank", "Other_rank"])
+
+
+def welch_test(samples) :
+    """T statistic and p-value of Welch's t-test, by group, type and pair of ranks."""
+    import scipy.stats as ss
+    n, mean, squares = _moments(samples)
+    first, second = np.array(rank_pairs(samples)).T
+    with np.errstate(invalid = "ignore", divide = "ignore") :
+        error = squares / (n - 1) / n
+        pooled = error[..., first] + error[..., second]
+        t_val = (mean[..., first] - mean[..., second]) / np.sqrt(pooled)
+        df = pooled ** 2 / (error[..., first] ** 2 / (n[..., first] - 1)
+                            + error[..., second] ** 2 / (n[..., second] - 1))
+    return t_val, 2 * ss.t.sf(np.abs(t_val), df)
+
+
+def tidy(samples, statistics, levels = None) :
+    """A tidy table of the `statistics` arrays (group x type x `levels`)."""
+    groups, types = len(samples.keys), len(samples.types)
+    levels = pd.DataFrame(index = pd.RangeIndex(1)) if levels is None else levels
+    inner = types * len(levels)
+    frame = pd.concat([samples.keys.loc[np.repeat(np.arange(groups), inner)].reset_index(drop = True),
+                       pd.DataFrame({"Type" : np.tile(np.repeat(samples.types, len(levels)), groups)}),
+                       levels.loc[np.tile(np.arange(len(levels)), groups * types)].reset_index(drop = True)],
+                      axis = 1)
+    for name, values in statistics.items() :
+        frame[name] = np.asarray(values).reshape(-1)
+    return frame
+
+
+def anova(data, types = CARD_COUNTS, ranks = RANKS, by = None) :
+    """One-way ANOVA of every card type among the ranks."""
+    samples = pivot(data, sorted(types), ranks, by)
+    with span("anova_test") :
+        f_val, p_val = anova_test(samples)
+    return tidy(samples, {"F" : f_val, "p" : p_val})
+
+
+def normality(data, types = CARD_COUNTS, ranks = RANKS, by = None) :
+    """Shapiro-Wilk test of every card type, rank by rank."""
+    samples = pivot(data, sorted(types), ranks, by)
+    with span("shapiro_test") :
+        w_val, p_val = shapiro_test(samples)
+    return tidy(samples, {"W" : w_val, "p" : p_val}, pd.DataFrame({"Rank" : samples.ranks}))
+
+
+def welch(data, types = CARD_COUNTS, ranks = RANKS, by = None) :
+    """Welch's t-test of every card type, for every pair of ranks."""
+    samples = pivot(data, sorted(types), ranks, by)
+    with span("welch_test") :
+        t_val, p_val = welch_test(samples)
+    pairs = pair_levels(samples)
+    return tidy(samples, {"T" : t_val, "p" : p_val}, pairs)
+
+
+def tests(data, types = CARD_COUNTS, ranks = RANKS, by = None) :
+    """All the tests in one table, with the columns `by`, Type, Test, Rank,
+    Other_rank (the ranks tested, if any), Statistic and p."""
+    samples = pivot(data, sorted(types), ranks, by)
+    pairs = pair_levels(samples)
+    tables = []
+    for test, compute, levels in (("ANOVA", anova_test, None),
+                                  ("Shapiro-Wilk", shapiro_test, pd.DataFrame({"Rank" : samples.ranks})),
+                                  ("Welch", welch_test, pairs)) :
+        with span(compute.__name__) :
+            statistic, p_val = compute(samples)
+        table = tidy(samples, {"Statistic" : statistic, "p" : p_val}, levels)
+        table.insert(len(samples.keys.columns) + 1, "Test", test)
+        tables.append(table)
+    frame = pd.concat(tables, ignore_index = True)
+    for column in ("Rank", "Other_rank") :
+        frame[column] = frame[column].astype("Int64")
+    columns = list(samples.keys.columns) + ["Type", "Test", "Rank", "Other_rank", "Statistic", "p"]
+    return frame[columns]
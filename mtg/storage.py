@@ -0,0 +1,168 @@
+"""Typed columnar storage of the raw and cleaned data sets.
+
+A table is stored as a directory with one `.npy` file per column and a
+`schema.json` describing how to turn them back into a DataFrame:
+- dates are stored as `datetime64[ns]`,
+- strings are dictionary encoded: the file holds small integer codes, the
+  schema the distinct values; they come back as categoricals or as plain
+  strings, as they were saved,
+- whole numbers (the card counts) are stored in the smallest integer type
+  holding them, and come back as `int64`, so that arithmetic on them
+  does not overflow; other numbers (e.g. counts with some missing) are
+  stored and come back as `float64`.
+
+Loading is therefore free of any parsing, and the files are memory-mapped:
+only the columns (and the rows) asked for are actually read. Rows are
+stored sorted by date, so that a date range is a contiguous slice found by
+a binary search, together with their original positions: they come back
+in the order in which they were saved (the order of the csv). Parquet/Feather would do the same, but would add pyarrow to the
+requirements; numpy's format is all we need here.
+"""
+
+import json
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+SCHEMA = "schema.json"
+
+# the original position of every row of a table sorted by date
+ORDER_FILE = "order.npy"
+
+
+def _integer_type(values) :
+    for dtype in (np.int8, np.int16, np.int32) :
+        info = np.iinfo(dtype)
+        if values.min() >= info.min and values.max() <= info.max :
+            return dtype
+    return np.int64
+
+
+def _encode(column) :
+    """Return the array to save for `column` and its entry in the schema."""
+    if pd.api.types.is_datetime64_any_dtype(column) :
+        # a view drops the (empty) metadata numpy attaches to unpickled datetimes
+        return column.to_numpy(dtype = "datetime64[ns]").view("datetime64[ns]"), {"kind" : "datetime"}
+    if isinstance(column.dtype, pd.CategoricalDtype) or column.dtype == object :
+        categorical = isinstance(column.dtype, pd.CategoricalDtype)
+        values = column if categorical else column.astype("category")
+        categories = values.cat.categories.tolist()
+        codes = values.cat.codes.to_numpy()
+        codes = codes.astype(_integer_type(np.array([-1, len(categories)])))
+        return codes, {"kind" : "category" if categorical else "string",
+                       "categories" : [category.item() if hasattr(category, "item") else category
+                                       for category in categories],
+                       "ordered" : bool(categorical and values.cat.ordered)}
+    if pd.api.types.is_bool_dtype(column) :
+        return column.to_numpy(), {"kind" : "number"}
+    values = column.to_numpy()
+    if pd.api.types.is_numeric_dtype(column) and len(values) and not np.isnan(values.astype(float)).any() \
+       and (values == np.round(values)).all() :
+        return values.astype(_integer_type(values)), {"kind" : "number"}
+    return values, {"kind" : "number"}
+
+
+def save_table(frame, directory, categories = (), sort_by = "Date") :
+    """Save `frame` in the columnar store `directory` (replacing it).
+
+    The string columns in `categories` are saved as categoricals; rows are
+    stored sorted by the date column `sort_by` (if present), with their
+    positions in `frame`, to be loaded back in the same order.
+    """
+    directory = Path(directory)
+    frame = frame.reset_index(drop = True)
+    for name in categories :
+        frame[name] = frame[name].astype("category")
+    order = None
+    if sort_by in frame.columns :
+        order = np.argsort(frame[sort_by].to_numpy(), kind = "stable")
+        frame = frame.take(order).reset_index(drop = True)
+    else :
+        sort_by = None
+
+    tmp = directory.with_name(directory.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors = True)
+    tmp.mkdir(parents = True)
+    if order is not None :
+        np.save(tmp / ORDER_FILE, order.astype(_integer_type(np.array([0, len(frame)]))), allow_pickle = False)
+    columns = []
+    for position, name in enumerate(frame.columns) :
+        values, entry = _encode(frame[name])
+        entry.update(name = name, file = f"{position}.npy")
+        np.save(tmp / entry["file"], values, allow_pickle = False)
+        columns.append(entry)
+    schema = {"rows" : len(frame), "sorted_by" : sort_by, "order" : ORDER_FILE if order is not None else None,
+              "columns" : columns}
+    (tmp / SCHEMA).write_text(json.dumps(schema, indent = 1))
+    shutil.rmtree(directory, ignore_errors = True)
+    tmp.rename(directory)
+
+
+def read_schema(directory) :
+    return json.loads(Path(directory, SCHEMA).read_text())
+
+
+def load_table(directory, columns = None, start = None, end = None) :
+    """Load the table saved in `directory`.
+
+    Only the `columns` listed are read (all by default); `start` and `end`
+    (dates, both included) restrict the rows to a date range. The rows are
+    in the order of the saved table; the whole numbers are `int64`.
+    """
+    directory = Path(directory)
+    schema = read_schema(directory)
+    entries = {entry["name"] : entry for entry in schema["columns"]}
+    names = list(entries) if columns is None else list(columns)
+
+    rows = slice(0, schema["rows"])
+    if start is not None or end is not None :
+        if schema["sorted_by"] is None :
+            raise ValueError(f"the table in {directory} has no date column to select a range")
+        dates = np.load(directory / entries[schema["sorted_by"]]["file"], mmap_mode = "r")
+        first = 0 if start is None else np.searchsorted(dates, np.datetime64(pd.Timestamp(start)), "left")
+        last = len(dates) if end is None else np.searchsorted(dates, np.datetime64(pd.Timestamp(end)), "right")
+        rows = slice(int(first), int(last))
+
+    # the rows of the slice back in their original order
+    positions = None
+    if schema.get("order") :
+        positions = np.argsort(np.load(directory / schema["order"], mmap_mode = "r")[rows], kind = "stable")
+
+    data = {}
+    for name in names :
+        entry = entries[name]
+        values = np.load(directory / entry["file"], mmap_mode = "r")[rows]
+        if positions is not None :
+            values = values[positions]
+        if entry["kind"] == "number" and np.issubdtype(values.dtype, np.integer) :
+            values = values.astype(np.int64)
+        if entry["kind"] in ("category", "string") :
+            values = pd.Categorical.from_codes(values, entry["categories"], ordered = entry["ordered"])
+            if entry["kind"] == "string" :
+                values = np.asarray(values.astype(object))
+        data[name] = values
+    return pd.DataFrame(data, index = pd.RangeIndex(rows.stop - rows.start))
+
+
+def is_stale(directory, csv_file) :
+    """Whether the columnar copy `directory` of `csv_file` is missing, older
+    than the csv, or in an older layout (without the order of the rows)."""
+    schema = Path(directory, SCHEMA)
+    return not schema.exists() or schema.stat().st_mtime < Path(csv_file).stat().st_mtime \
+        or "order" not in read_schema(directory)
+
+
+def load_csv_table(csv_file, directory, date_format = "%d/%m/%y") :
+    """Load the csv `csv_file` through its columnar copy in `directory`, rows in the order of the csv.
+
+    The copy is (re)built, parsing the dates with `date_format`, whenever the
+    csv file is newer than it, e.g. after new decks have been appended.
+    """
+    csv_file = Path(csv_file)
+    if is_stale(directory, csv_file) :
+        frame = pd.read_csv(csv_file)
+        frame["Date"] = pd.to_datetime(frame["Date"], format = date_format)
+        save_table(frame, directory)
+    return load_table(directory)
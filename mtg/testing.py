@@ -0,0 +1,120 @@
+"""A local stand-in for www.mtgtop8.com serving recorded HTML fixtures.
+
+The fixtures directory contains
+- `search_<year>_<page>.html` : the search page `page` for the Worlds of `year`,
+- `deck_<d>.html` : the page of the deck with id `d`.
+
+Search pages without a fixture are answered with an empty result table
+(which is how the website signals the end of the results), unknown decks
+with a 404. Fixtures are served with an ETag and a Last-Modified header and
+conditional requests are answered with a 304 when the page is unchanged.
+Usage:
+
+    with FixtureServer("fixtures/mtgtop8") as server :
+        df = scrape_worlds([1994], base_url = server.base_url, rate = 0)
+"""
+
+import hashlib
+import threading
+from collections import Counter
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES_DIR = Path(__file__).resolve().parent.parent / "fixtures" / "mtgtop8"
+
+EMPTY_SEARCH_PAGE = "<html><body><table class=Stable></table></body></html>"
+
+
+class FixtureServer :
+    """Serve the fixtures in `directory` on a free port of 127.0.0.1.
+
+    Every distinct URL is answered with a 503 for its first
+    `transient_failures` requests, to exercise retries. The number of
+    requests received per path is recorded in `hits`, the number of pages
+    answered with a 304 in `not_modified`.
+    """
+
+    def __init__(self, directory = FIXTURES_DIR, transient_failures = 0) :
+        self.directory = Path(directory)
+        self.transient_failures = transient_failures
+        self.hits = Counter()
+        self.not_modified = 0
+        self._attempts = Counter()
+        self._lock = threading.Lock()
+        self._httpd = None
+        self._thread = None
+
+    @property
+    def base_url(self) :
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def fixture(self, path, query) :
+        """Return the name of the fixture answering `path` with `query`."""
+        if path == "/search" :
+            year = query.get("date_start", ["//"])[0].split("/")[-1]
+            page = query.get("current_page", ["1"])[0]
+            return f"search_{year}_{page}.html"
+        if path == "/event" :
+            return f"deck_{query.get('d', [''])[0]}.html"
+        return None
+
+    def respond(self, request) :
+        url = urlsplit(request.path)
+        query = parse_qs(url.query)
+        with self._lock :
+            self.hits[url.path] += 1
+            self._attempts[request.path] += 1
+            failing = self._attempts[request.path] <= self.transient_failures
+        if failing :
+            return 503, b"", {}
+
+        name = self.fixture(url.path, query)
+        file = self.directory / name if name else None
+        if file is not None and file.exists() :
+            body = file.read_bytes()
+            modified = formatdate(file.stat().st_mtime, usegmt = True)
+        elif url.path == "/search" :
+            body = EMPTY_SEARCH_PAGE.encode()
+            modified = None
+        else :
+            return 404, b"", {}
+
+        headers = {"ETag" : '"' + hashlib.md5(body).hexdigest() + '"'}
+        if modified is not None :
+            headers["Last-Modified"] = modified
+        if request.headers.get("If-None-Match") == headers["ETag"] :
+            with self._lock :
+                self.not_modified += 1
+            return 304, b"", headers
+        return 200, body, headers
+
+    def __enter__(self) :
+        server = self
+
+        class Handler(BaseHTTPRequestHandler) :
+
+            def do_GET(self) :
+                status, body, headers = server.respond(self)
+                self.send_response(status)
+                for name, value in headers.items() :
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args) :
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target = self._httpd.serve_forever, daemon = True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) :
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._thread.join()
@@ -0,0 +1,177 @@
+"""Running aggregates of the card counts, updated with the new decks only.
+
+The mean composition of the decks year by year, or the variances by rank,
+are sums in disguise: a `TrendEngine` keeps, for every event date and rank
+(and any other key, e.g. the format of a multi-format crawl), the number
+of decks and the sums and sums of squares of their card counts. Adding
+decks only groups the new rows and adds their sums to the table, whose
+size is the number of events times the number of ranks, whatever the
+number of decks; the means and variances by year, by rank or over rolling
+windows of years are then read off the sums.
+
+`refresh` follows a cleaned csv file as it grows (see
+`mtg.cleaning.StreamingCleaner`): only the bytes appended since the last
+refresh are read, so that a refresh costs the new rows only, and the file
+is read again from the start when it was rewritten. A rewrite is told
+without reading the file again: the cleaned data set is always rewritten
+as a new file (see `mtg.cleaning.clean_csv`, `mtg.datasets.save_clean`),
+with a new inode, while appending keeps it; a file shorter than what was
+read, or whose sampled blocks of the part already read changed, is also
+read again. The engine is kept between two runs with `save` and `load`.
+
+    engine = TrendEngine.load("data/store/trends.json")
+    engine.refresh("data/magic.csv")
+    engine.means("Year"), engine.variances(), engine.rolling(3)
+    engine.save("data/store/trends.json")
+"""
+
+import hashlib
+import io
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from mtg.datasets import CARD_COUNTS
+from mtg.profiling import span
+
+SQUARES = "_squares"
+
+# the blocks of the part of the file already read which are checked at every refresh
+SAMPLES = 8
+SAMPLE_BYTES = 4096
+
+
+def _fingerprint(path, offset) :
+    """The sha256 of `SAMPLES` blocks spread over the first `offset` bytes of
+    the file `path`, the first one at its start and the last one ending at `offset`."""
+    digest = hashlib.sha256()
+    starts = np.linspace(0, max(offset - SAMPLE_BYTES, 0), SAMPLES).astype(np.int64)
+    with open(path, "rb") as file :
+        for start in np.unique(starts) :
+            file.seek(int(start))
+            digest.update(file.read(min(SAMPLE_BYTES, offset - int(start))))
+    return digest.hexdigest()
+
+
+class TrendEngine :
+    """Number of decks, sums and sums of squares of the card counts `types` by `keys`."""
+
+    def __init__(self, keys = ("Date", "Rank"), types = CARD_COUNTS) :
+        self.keys = list(keys)
+        self.types = list(types)
+        self.sums = None
+        # the file followed by `refresh`, and how much of it was read
+        self.source = None
+
+    def __len__(self) :
+        return 0 if self.sums is None else int(self.sums["n"].sum())
+
+    def update(self, data) :
+        """Add the decks of `data` to the aggregates."""
+        with span("trends.update", rows = len(data)) :
+            values = data[self.types].astype(float)
+            frame = pd.concat([values, (values ** 2).add_suffix(SQUARES)], axis = 1).assign(n = 1)
+            for key in self.keys :
+                frame[key] = np.asarray(data[key])
+            new = frame.groupby(self.keys).sum()
+            self.sums = new if self.sums is None else self.sums.add(new, fill_value = 0)
+        return self
+
+    def refresh(self, clean_file) :
+        """Add the decks appended to the csv file `clean_file` since the last refresh; returns their number."""
+        path = Path(clean_file)
+        stat = path.stat()
+        size = stat.st_size
+        source = self.source
+        appended = (source is not None and source["file"] == str(path) and source.get("inode") == stat.st_ino
+                    and source["offset"] <= size and _fingerprint(path, source["offset"]) == source["sample"])
+        if appended :
+            with open(path, "rb") as file :
+                header = file.readline()
+                file.seek(source["offset"])
+                rows = file.read(size - source["offset"])
+            new = pd.read_csv(io.BytesIO(header + rows), parse_dates = ["Date"])
+        else :
+            # a new file, or a file written again: everything is summed again
+            self.sums = None
+            content = path.read_bytes()
+            size = len(content)
+            new = pd.read_csv(io.BytesIO(content), parse_dates = ["Date"])
+        if len(new) :
+            self.update(new)
+        self.source = {"file" : str(path), "offset" : size, "inode" : stat.st_ino, "sample" : _fingerprint(path, size)}
+        return len(new)
+
+    def _totals(self, by) :
+        """The aggregates summed by the columns `by` (Year is the year of Date)."""
+        sums = self.sums.reset_index()
+        if "Year" in by and "Year" not in sums :
+            sums["Year"] = sums["Date"].dt.year
+        return sums.groupby(list(by)).sum(numeric_only = True)
+
+    @staticmethod
+    def _moments(totals, types) :
+        """Number of decks, means and (population) variances of `types` from summed aggregates."""
+        n = totals["n"]
+        means = totals[types].div(n, axis = 0)
+        squares = totals[[column + SQUARES for column in types]].set_axis(types, axis = 1).div(n, axis = 0)
+        return n, means, (squares - means ** 2).clip(lower = 0)
+
+    def means(self, by = "Date") :
+        """The mean card counts by `by` (a column or a list of columns)."""
+        by = [by] if isinstance(by, str) else list(by)
+        return self._moments(self._totals(by), self.types)[1]
+
+    def variances(self, by = "Rank") :
+        """The (population) variances of the card counts by `by`, as `mtg.stats.variances`."""
+        by = [by] if isinstance(by, str) else list(by)
+        return self._moments(self._totals(by), self.types)[2]
+
+    def rolling(self, window, by = "Rank") :
+        """Mean and variance of the card counts over the last `window` years, by `by` and year.
+
+        A tidy table with the columns `by`, Year, Type, n (the decks in
+        the window), Mean and Variance; the years without decks count as
+        empty, so that a window always spans `window` calendar years.
+        """
+        by = [by] if isinstance(by, str) else list(by)
+        totals = self._totals(by + ["Year"])
+        years = totals.index.get_level_values("Year")
+        groups = totals.index.droplevel("Year").unique()
+        full = pd.MultiIndex.from_tuples([(group if isinstance(group, tuple) else (group,)) + (year,)
+                                          for group in groups for year in range(years.min(), years.max() + 1)],
+                                         names = by + ["Year"])
+        totals = totals.reindex(full, fill_value = 0)
+        windowed = totals.groupby(level = by, group_keys = False).apply(
+            lambda group : group.rolling(window, min_periods = 1).sum())
+        windowed = windowed[windowed["n"] > 0]
+        n, means, variances = self._moments(windowed, self.types)
+        table = pd.concat([means.stack().rename("Mean"), variances.stack().rename("Variance")], axis = 1)
+        table.index = table.index.set_names("Type", level = -1)
+        table = table.join(n.astype(int)).reset_index()
+        return table[by + ["Year", "Type", "n", "Mean", "Variance"]]
+
+    def save(self, path) :
+        """Write the aggregates and the state of `refresh` to the JSON file `path`."""
+        sums = self.sums.reset_index() if self.sums is not None else pd.DataFrame()
+        state = {"keys" : self.keys, "types" : self.types, "source" : self.source,
+                 "sums" : json.loads(sums.to_json(orient = "split", index = False, date_format = "iso"))}
+        Path(path).parent.mkdir(parents = True, exist_ok = True)
+        Path(path).write_text(json.dumps(state))
+
+    @classmethod
+    def load(cls, path, keys = ("Date", "Rank"), types = CARD_COUNTS) :
+        """The engine saved in `path`, or a new one with `keys` and `types` if there is none."""
+        if not Path(path).exists() :
+            return cls(keys, types)
+        state = json.loads(Path(path).read_text())
+        engine = cls(state["keys"], state["types"])
+        engine.source = state["source"]
+        if state["sums"]["data"] :
+            sums = pd.DataFrame(state["sums"]["data"], columns = state["sums"]["columns"])
+            if "Date" in sums :
+                sums["Date"] = pd.to_datetime(sums["Date"]).dt.tz_localize(None)
+            engine.sums = sums.set_index(engine.keys)
+        return engine
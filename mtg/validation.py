@@ -0,0 +1,148 @@
+"""Checks of the quality of the data sets against a declarative schema.
+
+The problems of the raw data (the `Day 1 undefeated`, `Other` and missing
+ranks, the 3rd and 4th places both reported as `3-4`, the events without a
+4th place) used to be found by printing the ranks year by year. A `Schema`
+states what a table should look like:
+- `required`: the columns it must have,
+- `not_null`: the columns which must always be filled,
+- `ranks`: a regular expression every rank must match,
+- `event`, `podium`: the columns identifying an event, and the ranks every
+  event must have exactly once (a shared rank such as `3-4` holds both
+  the 3rd and the 4th place),
+- `counts`, `deck_size`: a regular expression matching the columns of the
+  card counts, which must be whole non-negative numbers, and the range of
+  their sum, the size of the main deck.
+`validate` checks all of them with whole-column operations, whatever the
+number of decks: the ranks are parsed once, the podium of every event is
+counted with a single `np.bincount`, and the result is an anomaly report,
+one row per problem found, with the check, the row of the table (or the
+event) concerned and the offending value.
+
+    from mtg.validation import EVENTS_SCHEMA, validate
+    report = validate(select_events(load_raw()), EVENTS_SCHEMA)
+    report.groupby("Check").size()
+"""
+
+import re
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from mtg.cleaning import CLEAN_COLUMNS
+from mtg.profiling import span
+
+Schema = namedtuple("Schema", ["required", "not_null", "ranks", "event", "podium", "counts", "deck_size"])
+
+# a main deck has 60 cards at least, and never many more
+DECK_SIZE = (60, 75)
+
+# the raw decks of the individual events (see `mtg.cleaning.select_events`): any rank or range of ranks
+EVENTS_SCHEMA = Schema(required = ["Deck", "Player", "Event", "Rank", "Date", "LANDS", "CREATURES",
+                                   "INSTANTS_and_SORC.", "OTHER_SPELLS"],
+                       not_null = ["Player", "Event", "Rank", "Date"],
+                       ranks = r"\d+(-\d+)?",
+                       event = ["Event", "Date"],
+                       podium = [1, 2, 3, 4],
+                       counts = r"LANDS(_\(\d+\))?|CREATURES|INSTANTS_and_SORC\.|OTHER_SPELLS",
+                       deck_size = DECK_SIZE)
+
+# the cleaned data set magic.csv: the top 4 only
+CLEAN_SCHEMA = Schema(required = CLEAN_COLUMNS,
+                      not_null = ["Player", "Event", "Rank", "Date", "Creatures", "Instants_Sorceries",
+                                  "Other_spells", "Lands"],
+                      ranks = r"[1-4]",
+                      event = ["Event", "Date"],
+                      podium = [1, 2, 3, 4],
+                      counts = r"Creatures|Instants_Sorceries|Other_spells|Lands",
+                      deck_size = DECK_SIZE)
+
+REPORT_COLUMNS = ["Check", "Row", "Event", "Date", "Column", "Value", "Count"]
+
+
+def _anomalies(check, data, rows, column = None, values = None, counts = None) :
+    """The report rows of the anomalies `check` of the rows (positions) `rows` of `data`."""
+    rows = np.asarray(rows, dtype = np.intp)
+    return pd.DataFrame({"Check" : check, "Row" : data.index[rows],
+                         "Event" : data["Event"].to_numpy()[rows] if "Event" in data else None,
+                         "Date" : data["Date"].to_numpy()[rows] if "Date" in data else None,
+                         "Column" : column, "Value" : np.asarray(values, dtype = object) if values is not None else None,
+                         "Count" : counts})
+
+
+def _podium(data, schema, low, high) :
+    """The missing and duplicated podium ranks of every event."""
+    events = data.groupby(schema.event, sort = False, dropna = False, observed = True).ngroup().to_numpy()
+    podium = np.asarray(schema.podium)
+    # the podium places held by every deck (a range of ranks holds all of its places)
+    held = (low[:, None] <= podium) & (high[:, None] >= podium)
+    decks, places = np.nonzero(held)
+    counts = np.bincount(events[decks] * len(podium) + places,
+                         minlength = (events.max() + 1) * len(podium)).reshape(-1, len(podium))
+    # a row of every event, to report it
+    first = np.full(len(counts), -1)
+    first[events[::-1]] = np.arange(len(events))[::-1]
+    reports = []
+    for check, (event, place) in (("missing_rank", np.nonzero(counts == 0)),
+                                  ("duplicate_rank", np.nonzero(counts > 1))) :
+        report = _anomalies(check, data, first[event], "Rank", podium[place], counts[event, place])
+        reports.append(report.assign(Row = None))
+    return reports
+
+
+def validate(data, schema = CLEAN_SCHEMA) :
+    """The anomaly report of `data` against `schema`, one row per problem (empty if none).
+
+    The columns are the check, the index of the row concerned (empty for
+    the checks of a whole event or of the table), its event and date, the
+    column and value at fault and, for the podium checks, the number of
+    decks holding the rank. The checks are
+    - missing_column: a required column is not in the table (the checks of
+      the column are then skipped),
+    - missing_value: a value of a `not_null` column is missing,
+    - rank_value: a rank not matching `schema.ranks`,
+    - missing_rank, duplicate_rank: a rank of the podium held by no deck or
+      by more than one deck of an event,
+    - card_count: a card count which is negative or not a whole number,
+    - deck_size: the card counts of a deck do not sum to `deck_size`.
+    """
+    reports = []
+    with span("validate", rows = len(data)) :
+        missing = [column for column in schema.required if column not in data]
+        if missing :
+            reports.append(pd.DataFrame({"Check" : "missing_column", "Column" : missing}))
+
+        columns = [column for column in schema.not_null if column in data]
+        rows, positions = np.nonzero(data[columns].isna().to_numpy())
+        reports.append(_anomalies("missing_value", data, rows, np.asarray(columns, dtype = object)[positions]))
+
+        if "Rank" in data :
+            # the ranks take a few distinct values: they are parsed once each
+            codes, values = pd.factorize(data["Rank"].astype(object))
+            values = pd.Series(values, dtype = object).astype(str)
+            allowed = np.append(values.str.fullmatch(schema.ranks).to_numpy(dtype = bool), True)
+            wrong = ~allowed[codes]
+            reports.append(_anomalies("rank_value", data, np.flatnonzero(wrong), "Rank",
+                                      values.to_numpy()[codes[wrong]]))
+            if all(column in data for column in schema.event) and len(data) :
+                bounds = values.str.extract(r"^(\d+)(?:-(\d+))?$").astype(float).to_numpy()
+                bounds[:, 1] = np.where(np.isnan(bounds[:, 1]), bounds[:, 0], bounds[:, 1])
+                # the missing ranks (code -1) hold no place
+                bounds = np.vstack([bounds, [np.nan, np.nan]])[codes]
+                reports += _podium(data, schema, bounds[:, 0], bounds[:, 1])
+
+        counts = [column for column in data.columns if re.fullmatch(schema.counts, column)]
+        if counts :
+            values = data[counts].to_numpy(dtype = float)
+            rows, positions = np.nonzero(~np.isnan(values) & ((values < 0) | (values % 1 != 0)))
+            reports.append(_anomalies("card_count", data, rows, np.asarray(counts, dtype = object)[positions],
+                                      values[rows, positions]))
+            sizes = np.nansum(values, axis = 1)
+            wrong = (sizes < schema.deck_size[0]) | (sizes > schema.deck_size[1])
+            reports.append(_anomalies("deck_size", data, np.flatnonzero(wrong), "cards", sizes[wrong]))
+
+    reports = [report for report in reports if len(report)]
+    if not reports :
+        return pd.DataFrame(columns = REPORT_COLUMNS)
+    return pd.concat(reports, ignore_index = True).reindex(columns = REPORT_COLUMNS)
@@ -0,0 +1,74 @@
+"""The page archive: appending, indexing and parsing the pages again."""
+
+import gzip
+
+import pandas as pd
+
+from mtg.archive import INDEX_DTYPE, INDEX_FILE, PageArchive, reparse
+from mtg.scraping import scrape_incremental, worlds_shard
+from mtg.testing import FixtureServer
+
+URL = "https://www.mtgtop8.com/event"
+
+
+def test_add_and_get(tmp_path) :
+    archive = PageArchive(tmp_path, segment_bytes = 200)
+    assert archive.add(URL, {"e" : 1}, "first version")
+    # the same page is not written twice, a new version is
+    assert not archive.add(URL, {"e" : 1}, "first version")
+    assert archive.add(URL, {"e" : 1}, "second version")
+    for number in range(2, 10) :
+        archive.add(URL, {"e" : number}, f"event {number} " + "x" * 50)
+    assert len(archive) == 9
+    assert (tmp_path / INDEX_FILE).stat().st_size == 10 * INDEX_DTYPE.itemsize
+    assert archive.get(URL, {"e" : 1}) == "second version"
+    assert archive.get(URL, {"e" : 10}) is None
+    # the segments were rolled over, and every one is a gzip file of its own
+    segments = sorted(tmp_path.glob("segment-*.gz"))
+    assert len(segments) > 1
+    text = b"".join(gzip.decompress(segment.read_bytes()) for segment in segments).decode()
+    assert "first version" in text and "event 9" in text
+
+    # the index is read back: the last version of every page
+    reopened = PageArchive(tmp_path, segment_bytes = 200)
+    assert len(reopened) == 9
+    assert reopened.get(URL, {"e" : 1}) == "second version"
+    assert not reopened.add(URL, {"e" : 5}, "event 5 " + "x" * 50)
+    assert reopened.add(URL, {"e" : 10}, "event 10")
+    assert reopened._segment >= archive._segment
+    assert sum(len(members) for members in reopened.segments().values()) == 10
+
+
+def test_reparse(tmp_path) :
+    # small segments, parsed by several tasks
+    archive = PageArchive(tmp_path / "archive", segment_bytes = 4096)
+    data_file = tmp_path / "raw_magic.csv"
+    with FixtureServer() as server :
+        base_url = server.base_url
+        assert scrape_incremental(data_file, [1994, 2021], base_url = base_url, rate = 0, archive = archive) > 0
+    shards = {year : worlds_shard(year) for year in (1994, 2021)}
+    assert len(archive.segments()) > 1
+    # offline, here and in a pool of processes
+    for workers in (1, 2) :
+        reparsed = reparse(PageArchive(tmp_path / "archive"), shards, base_url, workers)
+        reparsed.to_csv(tmp_path / "reparsed.csv", index = False)
+        pd.testing.assert_frame_equal(pd.read_csv(tmp_path / "reparsed.csv"), pd.read_csv(data_file))
+    keys = reparse(archive, shards, base_url, keys = True)
+    assert set(keys["shard"].astype(int)) == {1994, 2021}
+
+
+def test_reparse_missing_deck(tmp_path, capsys) :
+    archive = PageArchive(tmp_path / "archive")
+    with FixtureServer() as server :
+        base_url = server.base_url
+        scrape_incremental(tmp_path / "raw_magic.csv", [1994], base_url = base_url, rate = 0, archive = archive)
+    # an archive holding the search pages only
+    partial = PageArchive(tmp_path / "partial")
+    for segment, members in archive.segments().items() :
+        for offset, length in members :
+            key, _, page = gzip.decompress(
+                archive.segment_path(segment).read_bytes()[offset:offset + length]).partition(b"\n")
+            if b"/search" in key :
+                partial.add(key.decode(), None, page.decode())
+    assert len(reparse(partial, {1994 : worlds_shard(1994)}, base_url)) == 0
+    assert "4 decks missing from the archive" in capsys.readouterr().out
@@ -0,0 +1,66 @@
+"""The on-disk cache of the responses of mtgtop8."""
+
+import os
+import time
+
+import pandas as pd
+
+from mtg import cache as cache_module
+from mtg.cache import ResponseCache
+from mtg.scraping import scrape_worlds
+from mtg.testing import FixtureServer
+
+URL = "https://www.mtgtop8.com/search"
+
+
+def test_fresh_pages_from_disk(tmp_path) :
+    cache = ResponseCache(tmp_path)
+    with FixtureServer() as server :
+        expected = scrape_worlds([1994], base_url = server.base_url, cache = cache, rate = 0)
+        requests = sum(server.hits.values())
+        data = scrape_worlds([1994], base_url = server.base_url, cache = cache, rate = 0)
+        # the Worlds of 1994 are over: nothing is asked again
+        assert sum(server.hits.values()) == requests
+    pd.testing.assert_frame_equal(data, expected)
+
+
+def test_revalidation(tmp_path) :
+    cache = ResponseCache(tmp_path, ttl = 0)
+    with FixtureServer() as server :
+        expected = scrape_worlds([1994], base_url = server.base_url, cache = cache, rate = 0)
+        requests = sum(server.hits.values())
+        data = scrape_worlds([1994], base_url = server.base_url, cache = cache, rate = 0)
+        # every page was asked again, and answered with a 304
+        assert server.not_modified == requests
+    pd.testing.assert_frame_equal(data, expected)
+
+
+def test_identical_pages_stored_once(tmp_path) :
+    cache = ResponseCache(tmp_path)
+    cache.store(URL, {"current_page" : "1"}, {"ETag" : '"a"'}, "<html></html>")
+    cache.store(URL, {"current_page" : "2"}, {}, "<html></html>")
+    assert len(list(cache.objects_dir.iterdir())) == 1
+    entry = cache.lookup(URL, {"current_page" : "2"})
+    assert cache.read(entry) == "<html></html>"
+    assert cache.validators(cache.lookup(URL, {"current_page" : "1"})) == {"If-None-Match" : '"a"'}
+    assert cache.lookup(URL, {"current_page" : "3"}) is None
+
+
+def test_evict(tmp_path, monkeypatch) :
+    cache = ResponseCache(tmp_path, max_bytes = 250, max_age = 3600)
+    now = time.time()
+    for page, used_at in ((1, now - 10), (2, now - 20), (3, now - 30), (4, now - 7200)) :
+        entry = cache.store(URL, {"current_page" : str(page)}, {}, str(page) * 100)
+        entry["used_at"] = used_at
+        cache._save_entry(entry)
+    # a body left by an interrupted store, long ago
+    orphan = cache.objects_dir / ("0" * 64)
+    orphan.write_text("orphan")
+    os.utime(orphan, (now - 2 * cache_module.ORPHAN_GRACE, now - 2 * cache_module.ORPHAN_GRACE))
+
+    # page 4 is too old, page 3 does not fit any more
+    assert cache.evict() == 2
+    assert [cache.lookup(URL, {"current_page" : str(page)}) is not None for page in (1, 2, 3, 4)] \
+        == [True, True, False, False]
+    assert sorted(body.name for body in cache.objects_dir.iterdir()) \
+        == sorted(cache.lookup(URL, {"current_page" : str(page)})["body"] for page in (1, 2))
@@ -0,0 +1,74 @@
+"""The card store: buffering, merging and loading the decklists."""
+
+import numpy as np
+
+from mtg.cards import CardBuffer, concat, load_cards, save_cards
+
+DECKS = [
+    ("1994", 1, "1", [("md", 4, "Lightning Bolt"), ("md", 20, "Mountain"), ("sb", 2, "Shatter")]),
+    ("1994", 1, "2", [("md", 2, "Counterspell"), ("md", 2, "Counterspell"), ("sb", 3, "Lightning Bolt")]),
+    ("2021", 1, "3", [("md", 60, "Island")]),
+    ("2021", 2, "4", [("md", 4, "Lightning Bolt"), ("md", 1, "Black Lotus"), ("xx", 1, "Token")]),
+]
+
+
+def buffered(decks) :
+    buffer = CardBuffer()
+    for deck in decks :
+        buffer.append(*deck)
+    return buffer.to_matrix()
+
+
+def decklists(matrix, board = "md") :
+    return {deck : matrix.decklist(deck, board) for deck in matrix.deck_ids}
+
+
+def test_buffer() :
+    matrix = buffered(DECKS)
+    assert list(matrix.deck_ids) == ["1", "2", "3", "4"]
+    assert matrix.decklist("1") == {"Lightning Bolt" : 4, "Mountain" : 20}
+    assert matrix.decklist("2") == {"Counterspell" : 4}
+    assert matrix.decklist("2", "sb") == {"Lightning Bolt" : 3}
+    assert matrix.decklist("4") == {"Lightning Bolt" : 4, "Black Lotus" : 1}
+    assert "Token" not in matrix.names
+    assert list(matrix.deck_sizes()) == [24, 4, 60, 5]
+    bolt = matrix.card_ids(["Lightning Bolt", "Unknown"])
+    assert bolt[1] == -1
+    assert matrix.copies()[bolt[0]] == 8 and matrix.decks()[bolt[0]] == 2
+    assert matrix.copies("sb")[bolt[0]] == 3
+
+
+def test_flush_to_sink() :
+    chunks = []
+    buffer = CardBuffer(chunk_size = 3, sink = lambda matrix, keys : chunks.append((matrix, keys)))
+    for deck in DECKS :
+        buffer.append(*deck)
+    assert [len(matrix) for matrix, _ in chunks] == [3]
+    assert chunks[0][1] == [("1994", 1, "1"), ("1994", 1, "2"), ("2021", 1, "3")]
+    assert len(buffer) == 1
+    buffer.flush()
+    assert [len(matrix) for matrix, _ in chunks] == [3, 1] and len(buffer) == 0
+
+
+def test_concat_merges_dictionaries() :
+    whole = buffered(DECKS)
+    merged = concat([buffered(DECKS[:2]), buffered(DECKS[2:])])
+    assert list(merged.deck_ids) == list(whole.deck_ids)
+    assert sorted(merged.names) == sorted(whole.names)
+    for board in ("md", "sb") :
+        assert decklists(merged, board) == decklists(whole, board)
+
+
+def test_load_cards(tmp_path) :
+    store = tmp_path / "cards"
+    save_cards(buffered(DECKS[:2]), store)
+    save_cards(buffered(DECKS[2:]), store)
+    # a refreshed deck 2 keeps its last decklist, an interrupted part is ignored
+    save_cards(buffered([("1994", 1, "2", [("md", 3, "Dark Ritual")])]), store)
+    (store / "part-000009.tmp").mkdir()
+    matrix = load_cards(store)
+    assert sorted(matrix.deck_ids) == ["1", "2", "3", "4"]
+    assert matrix.decklist("2") == {"Dark Ritual" : 3}
+    assert matrix.decklist("2", "sb") == {}
+    assert matrix.decklist("4") == {"Lightning Bolt" : 4, "Black Lotus" : 1}
+    assert np.array_equal(matrix.to_scipy().toarray().sum(axis = 1), matrix.deck_sizes())
@@ -0,0 +1,22 @@
+"""The cleaning of raw_magic.csv."""
+
+import pandas as pd
+import pytest
+
+from mtg.cleaning import clean_csv, finish
+from mtg.datasets import CLEAN_FILE, RAW_FILE
+
+
+def test_finish_drops_shared_ranks() :
+    data = pd.DataFrame({"Rank" : ["1", "2", "3-4", "3-4"], "LANDS" : [24, 23, 22, 21],
+                         "CREATURES" : [20, 18, 12, 14], "INSTANTS_and_SORC." : [10, 12, 16, 15],
+                         "OTHER_SPELLS" : [6, 7, 10, 10]})
+    with pytest.warns(UserWarning, match = "3-4") :
+        finished = finish(data)
+    assert finished["Rank"].tolist() == [1, 2]
+
+
+def test_clean_csv_reproduces_magic_csv(tmp_path) :
+    clean_file = tmp_path / "magic.csv"
+    clean_csv(RAW_FILE, clean_file, chunk_size = 100)
+    assert clean_file.read_bytes() == CLEAN_FILE.read_bytes()
@@ -0,0 +1,39 @@
+"""The parallel crawl in shards."""
+
+import datetime
+
+import pytest
+
+from mtg.crawl import CrawlSpec, crawl, load_crawl
+from mtg.testing import FixtureServer
+
+
+def test_shards() :
+    spec = CrawlSpec(formats = ("ST", "MO"), events = ("", "world"), levels = ("P", "M"), start = 2020, end = 2021,
+                     window = "month")
+    shards = spec.shards()
+    assert len(shards) == 2 * 2 * 2 * 12
+    assert len({shard.name for shard in shards}) == len(shards)
+    assert shards[1].date_start == datetime.date(2020, 2, 1) and shards[1].date_end == datetime.date(2020, 2, 29)
+    assert shards[11].date_end == datetime.date(2020, 12, 31)
+    with pytest.raises(ValueError) :
+        CrawlSpec(window = "week").shards()
+
+
+def test_crawl(tmp_path) :
+    spec = CrawlSpec(start = 1994, end = 1995)
+    options = dict(workers = 2, cache_dir = tmp_path / "http_cache", cache_options = {"ttl" : 0}, rate = 0)
+    with FixtureServer() as server :
+        added = crawl(spec, tmp_path / "crawl", base_url = server.base_url, **options)
+        assert added == {"ST_world_P_19940101_19941231" : 4, "ST_world_P_19950101_19951231" : 0}
+        assert len(load_crawl(tmp_path / "crawl")) == 4
+        requests = sum(server.hits.values())
+
+        # the shards are complete: nothing is asked again
+        assert sum(crawl(spec, tmp_path / "crawl", base_url = server.base_url, **options).values()) == 0
+        assert sum(server.hits.values()) == requests
+
+        # walked again, with the cache policy of the crawl (ttl = 0: every cached page is revalidated)
+        crawl(spec, tmp_path / "crawl", refresh = True, base_url = server.base_url, **options)
+        assert server.not_modified > 0
+    assert len(load_crawl(tmp_path / "crawl")) == 4
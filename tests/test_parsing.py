@@ -0,0 +1,24 @@
+"""The streaming parsers against the html5lib ones, on the recorded pages."""
+
+import pytest
+
+from mtg import parsing
+from mtg.testing import FIXTURES_DIR
+
+SEARCH_PAGES = sorted(FIXTURES_DIR.glob("search_*.html"))
+DECK_PAGES = sorted(FIXTURES_DIR.glob("deck_*.html"))
+
+
+@pytest.mark.parametrize("page", SEARCH_PAGES, ids = lambda page : page.stem)
+def test_search_page(page) :
+    html = page.read_text(encoding = "utf-8")
+    listing = parsing.parse_search_page(html)
+    assert listing
+    assert listing == parsing.parse_search_page_soup(html)
+
+
+@pytest.mark.parametrize("page", DECK_PAGES, ids = lambda page : page.stem)
+def test_deck_page(page) :
+    html = page.read_text(encoding = "utf-8")
+    assert parsing.parse_deck_page(html) == parsing.parse_deck_page_soup(html)
+    assert parsing.parse_decklist(html) == parsing.parse_decklist_soup(html)
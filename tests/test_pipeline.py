@@ -0,0 +1,43 @@
+"""The memoized stages of the analysis."""
+
+import pandas as pd
+import pytest
+
+from mtg.archive import PageArchive
+from mtg.manifest import Manifest
+from mtg.parsing import parse_search_page
+from mtg.pipeline import default_pipeline
+from mtg.scraping import BASE_URL, worlds_shard
+from mtg.testing import EMPTY_SEARCH_PAGE, FIXTURES_DIR
+
+
+def archive_fixtures(directory, year = 1994) :
+    """An archive of the recorded pages of the Worlds of 1994, as if downloaded from mtgtop8."""
+    archive = PageArchive(directory)
+    shard = worlds_shard(year)
+    search = (FIXTURES_DIR / "search_1994_1.html").read_text(encoding = "utf-8")
+    archive.add(BASE_URL + "search", shard.parameters(1), search)
+    archive.add(BASE_URL + "search", shard.parameters(2), EMPTY_SEARCH_PAGE)
+    for identifier, (_, link) in parse_search_page(search).items() :
+        archive.add(BASE_URL + link, None, (FIXTURES_DIR / f"deck_{identifier}.html").read_text(encoding = "utf-8"))
+    return archive
+
+
+def test_deleted_raw_file(tmp_path) :
+    # raw_magic.csv is gone, its manifest is not: the raw stage rebuilds the csv from the archive, offline
+    archive_fixtures(tmp_path / "archive")
+    manifest = Manifest(tmp_path / "raw_magic.manifest.json")
+    manifest.mark_complete(1994)
+    manifest.save()
+    raw = default_pipeline(tmp_path, years = [1994], offline = True).run(["raw"])["raw"]
+    assert len(raw) == 4
+    assert len(pd.read_csv(tmp_path / "raw_magic.csv")) == 4
+    assert len(Manifest(tmp_path / "raw_magic.manifest.json").known(1994)) == 4
+
+
+def test_deleted_raw_file_without_archive(tmp_path) :
+    manifest = Manifest(tmp_path / "raw_magic.manifest.json")
+    manifest.mark_complete(1994)
+    manifest.save()
+    with pytest.raises(FileNotFoundError, match = "raw_magic.csv") :
+        default_pipeline(tmp_path, years = [1994], offline = True).run(["raw"])
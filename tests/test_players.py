@@ -0,0 +1,50 @@
+"""The resolution of the spellings of the players' names."""
+
+import pandas as pd
+
+from mtg.players import player_clusters, player_key, resolve_players
+
+
+def resolved(names) :
+    return dict(zip(names, resolve_players(pd.Series(names))))
+
+
+def test_player_key() :
+    assert player_key("Olle Råde") == "olle rade"
+    assert player_key("Dave  Humpherys") == player_key("David Humpherys") == "david humpherys"
+    assert player_key("Josh Utter-leyton") == player_key("Josh Utter-Leyton")
+
+
+def test_spellings_merged() :
+    names = ["Ben Stark", "Benjamin Stark", "Benjamin Stark", "Olle Råde", "Olle Rade", "Ryo Ogura", "Ryou Ogura",
+             "Ryou Ogura"]
+    players = resolved(names)
+    assert players["Ben Stark"] == players["Benjamin Stark"] == "Benjamin Stark"
+    assert players["Olle Råde"] == players["Olle Rade"]
+    assert players["Ryo Ogura"] == "Ryou Ogura"
+
+
+def test_ambiguous_initial() :
+    players = resolved(["J Smith", "John Smith", "Jane Smith"])
+    assert players == {"J Smith" : "J Smith", "John Smith" : "John Smith", "Jane Smith" : "Jane Smith"}
+    # with a single full given name the initial is resolved
+    assert resolved(["J Smith", "John Smith", "John Smith"])["J Smith"] == "John Smith"
+
+
+def test_close_surnames_kept_apart() :
+    players = resolved(["Lee Shi Tian", "Lee Shi Tan"])
+    assert players["Lee Shi Tian"] != players["Lee Shi Tan"]
+
+
+def test_no_chained_clusters() :
+    # "Jo" would link both full names: none of them may end up in the same group
+    clusters = player_clusters(["Jo Smith", "John Smith", "Joan Smith", "Joan Smith"])
+    resolved_names = dict(zip(clusters["Player"], clusters["Resolved"]))
+    assert resolved_names["John Smith"] != resolved_names["Joan Smith"]
+    assert len(clusters) == 3
+
+
+def test_complete_linkage() :
+    # Jonathan is close to both, but Jonathon and Jonatan are not close to each other
+    clusters = player_clusters(["Jonathon Smith", "Jonathan Smith", "Jonatan Smith"])
+    assert clusters["Resolved"].nunique() == 2
@@ -0,0 +1,55 @@
+"""The profiles of the worker processes, merged into the report."""
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from mtg.profiling import PROFILER, collect, count, observe, span, traced
+
+
+def task(number) :
+    with span("task", number = number) :
+        count("tasks")
+        observe("number", number)
+    return number * 2, os.getpid()
+
+
+@pytest.fixture
+def profiler() :
+    PROFILER.enable()
+    yield PROFILER
+    PROFILER.disable()
+
+
+def test_workers_merged(profiler, tmp_path) :
+    with span("parent") :
+        with ProcessPoolExecutor(max_workers = 2) as pool :
+            results = list(map(collect, pool.map(traced(task), range(6))))
+    assert [result for result, _ in results] == [0, 2, 4, 6, 8, 10]
+    assert profiler.stages["task"]["calls"] == 6 and profiler.counters["tasks"] == 6
+    assert sorted(profiler.measures["number"]) == list(range(6))
+    events = {event["name"] : event for event in profiler.events}
+    tasks = [event for event in profiler.events if event["name"] == "task"]
+    assert {event["pid"] for event in tasks} == {pid for _, pid in results} - {os.getpid()} != set()
+    # the worker spans are within the parent span on the timeline
+    parent = events["parent"]
+    assert all(parent["ts"] <= event["ts"] <= parent["ts"] + parent["dur"] for event in tasks)
+    profiler.save(tmp_path / "profile.json")
+    summary = json.loads((tmp_path / "profile.json").read_text())["summary"]
+    assert summary["stages"]["task"]["calls"] == 6
+
+
+def test_in_process(profiler) :
+    # a pool of one worker runs the tasks here: they are counted once
+    assert list(map(collect, map(traced(task), range(3))))[2][0] == 4
+    assert profiler.stages["task"]["calls"] == 3 and profiler.counters["tasks"] == 3
+
+
+def test_disabled() :
+    assert not PROFILER.enabled
+    PROFILER.reset()
+    with ProcessPoolExecutor(max_workers = 1) as pool :
+        assert [result for result, _ in map(collect, pool.map(traced(task), range(2)))] == [0, 2]
+    assert PROFILER.events == [] and PROFILER.counters == {}
@@ -0,0 +1,44 @@
+"""The column buffers of the scraped decks."""
+
+import numpy as np
+import pandas as pd
+
+from mtg.records import KEY_COLUMNS, PLAYER_COLUMNS, ColumnBuffer, deck_record
+
+ROW = ["Burn", "Jane Doe", "ST", "Worlds", "P", "1", "01/01/22"]
+
+
+def test_columns_padded() :
+    buffer = ColumnBuffer()
+    buffer.append(deck_record(ROW, {"LANDS" : 20, "CREATURES" : 12}, 2022, 1, "1"))
+    # a card type seen for the first time, and one missing
+    buffer.append(deck_record(ROW, {"LANDS" : 24, "LANDS_(29)" : 29}, 2022, 2, "2"))
+    frame = buffer.to_frame()
+    assert list(frame.columns) == PLAYER_COLUMNS + ["LANDS", "CREATURES", "shard", "page", "deck_id", "LANDS_(29)"]
+    assert frame["LANDS"].tolist() == [20, 24]
+    assert np.isnan(frame.loc[1, "CREATURES"]) and np.isnan(frame.loc[0, "LANDS_(29)"])
+    assert frame["page"].dtype == np.int64 and frame["shard"].tolist() == ["2022", "2022"]
+    assert KEY_COLUMNS[0] not in buffer.to_frame(keys = False)
+
+
+def test_extend() :
+    first, second = ColumnBuffer(), ColumnBuffer()
+    first.append(deck_record(ROW, {"LANDS" : 20}, 2022, 1, "1"))
+    second.append(deck_record(ROW, {"CREATURES" : 12}, 2022, 1, "2"))
+    first.extend(second)
+    frame = first.to_frame()
+    assert len(first) == 2
+    assert frame["deck_id"].tolist() == ["1", "2"]
+    assert frame["CREATURES"].isna().tolist() == [True, False]
+
+
+def test_sink_every_chunk() :
+    chunks = []
+    buffer = ColumnBuffer(chunk_size = 2, sink = chunks.append)
+    for deck_id in range(5) :
+        buffer.append(deck_record(ROW, {"LANDS" : deck_id}, 2022, 1, str(deck_id)))
+    assert [len(chunk) for chunk in chunks] == [2, 2] and len(buffer) == 1
+    buffer.flush()
+    data = pd.concat(chunks, ignore_index = True)
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert data["LANDS"].tolist() == [0, 1, 2, 3, 4]
@@ -0,0 +1,74 @@
+"""The cells of the report, run again only when their inputs change."""
+
+import json
+import re
+
+import pytest
+
+from mtg.report import build_report, read_cells
+
+NOTEBOOK = """# %% [markdown]
+# # Card counts
+# %%
+import json
+# %%
+with open("values.json") as file :
+    values = json.load(file)
+# %%
+total = sum(values)
+print("total", total)
+# %%
+doubled = [2 * value for value in values]
+# %%
+import matplotlib.pyplot as plt
+plt.plot(doubled)
+# %%
+len(doubled)
+"""
+
+
+@pytest.fixture
+def notebook(tmp_path, monkeypatch) :
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "values.json").write_text(json.dumps([1, 2, 3]))
+    path = tmp_path / "notebook.py"
+    path.write_text(NOTEBOOK)
+    return path
+
+
+def build(notebook, capsys, **options) :
+    """The page written and the numbers of cells run and cached."""
+    page = build_report(notebook, notebook.parent / "report", notebook.parent / "cache", **options)
+    ran, cached = re.search(r"(\d+) cells run, (\d+) cached", capsys.readouterr().out).groups()
+    return page.read_text(), int(ran), int(cached)
+
+
+def test_read_cells(notebook) :
+    cells = read_cells(notebook)
+    assert [cell.kind for cell in cells] == ["markdown"] + ["code"] * 6
+    assert cells[0].source == "# Card counts"
+    assert cells[2].line == 6
+
+
+def test_cached_cells(notebook, capsys) :
+    page, ran, cached = build(notebook, capsys)
+    assert (ran, cached) == (6, 0)
+    assert "<title>Card counts</title>" in page and "total 6" in page
+    figures = list((notebook.parent / "report" / "figures").glob("*.png"))
+    assert len(figures) == 1 and figures[0].name in page
+
+    # the imports cannot be cached, the rest is, the same page again
+    assert build(notebook, capsys) == (page, 1, 5)
+
+    # the file read by a cell changed: the cells reading what it defines run again
+    (notebook.parent / "values.json").write_text(json.dumps([1, 2, 3, 4]))
+    page, ran, cached = build(notebook, capsys)
+    assert (ran, cached) == (6, 0) and "total 10" in page
+    assert len(list((notebook.parent / "report" / "figures").glob("*.png"))) == 1
+
+    # an edited cell runs again, the cells after it whose inputs did not change do not
+    notebook.write_text(NOTEBOOK.replace('print("total", total)', 'print("sum", total)'))
+    page, ran, cached = build(notebook, capsys)
+    assert (ran, cached) == (2, 4) and "sum 10" in page
+
+    assert build(notebook, capsys, force = True)[1:] == (6, 0)
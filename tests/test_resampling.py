@@ -0,0 +1,33 @@
+"""The permutation and bootstrap versions of the tests."""
+
+import numpy as np
+import pandas as pd
+
+from mtg import resampling
+from mtg.datasets import CARD_COUNTS
+
+
+def decks(n = 400, seed = 0) :
+    rng = np.random.default_rng(seed)
+    data = pd.DataFrame({card_type : rng.integers(0, 30, n) for card_type in CARD_COUNTS})
+    return data.assign(Rank = rng.integers(1, 5, n))
+
+
+def test_batches_do_not_change_the_results(monkeypatch) :
+    data = decks()
+    permutations = resampling.permutation_anova(data, resamples = 500, block = 250, precision = 0)
+    intervals = resampling.bootstrap_intervals(data, resamples = 500, block = 250)
+    # a batch of a few resamples at a time
+    monkeypatch.setattr(resampling, "BATCH_BYTES", 8 * 400 * 5 * 7)
+    assert resampling._batches(250, 400, 4) == [7] * 35 + [5]
+    pd.testing.assert_frame_equal(resampling.permutation_anova(data, resamples = 500, block = 250, precision = 0),
+                                  permutations)
+    pd.testing.assert_frame_equal(resampling.bootstrap_intervals(data, resamples = 500, block = 250), intervals)
+
+
+def test_types_sorted() :
+    data = decks()
+    types = CARD_COUNTS[::-1]
+    for test in (resampling.permutation_anova, resampling.bootstrap_intervals) :
+        table = test(data, types = types, resamples = 100, block = 100)
+        assert list(table["Type"].unique()) == sorted(types)
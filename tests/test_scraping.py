@@ -0,0 +1,104 @@
+"""The scraper against the local stand-in for mtgtop8 (see `mtg.testing`)."""
+
+import datetime
+import shutil
+
+import pandas as pd
+
+from mtg.cache import ResponseCache
+from mtg.manifest import Manifest
+from mtg.scraping import scrape_incremental, scrape_worlds
+from mtg.testing import FIXTURES_DIR, FixtureServer
+
+# nothing listens on the discard port: every request fails at once
+UNREACHABLE_URL = "http://127.0.0.1:9/"
+
+
+def test_scrape_worlds() :
+    with FixtureServer() as server :
+        data = scrape_worlds([1994], base_url = server.base_url, rate = 0)
+    assert len(data) == 4
+    assert sorted(data["Rank"]) == ["1", "2", "3-4", "3-4"]
+
+
+def test_transient_failures() :
+    with FixtureServer() as server :
+        expected = scrape_worlds([1994], base_url = server.base_url, rate = 0)
+    with FixtureServer(transient_failures = 1) as server :
+        data = scrape_worlds([1994], base_url = server.base_url, rate = 0, backoff = 0)
+        # every page was answered with a 503 first
+        assert server.hits["/search"] == 2 * 2
+    pd.testing.assert_frame_equal(data, expected)
+
+
+def test_ongoing_shard(tmp_path) :
+    # the Worlds of this year have no results yet, then a page of them
+    fixtures = tmp_path / "fixtures"
+    shutil.copytree(FIXTURES_DIR, fixtures)
+    year = datetime.date.today().year
+    data_file = tmp_path / "raw_magic.csv"
+    cache = ResponseCache(tmp_path / "http_cache")
+    with FixtureServer(fixtures) as server :
+        assert scrape_incremental(data_file, [year], base_url = server.base_url, cache = cache, rate = 0) == 0
+        assert not Manifest(data_file.with_suffix(".manifest.json")).is_complete(year)
+        shutil.copy(fixtures / "search_1994_1.html", fixtures / f"search_{year}_1.html")
+        # the cached empty page of the ongoing shard is revalidated, not served as it is
+        assert scrape_incremental(data_file, [year], base_url = server.base_url, cache = cache, rate = 0) == 4
+    assert len(pd.read_csv(data_file)) == 4
+
+
+def test_offline(tmp_path) :
+    cache = ResponseCache(tmp_path / "http_cache")
+    with FixtureServer() as server :
+        expected = scrape_worlds([1994], base_url = server.base_url, cache = cache, rate = 0)
+        base_url = server.base_url
+    # the server is gone: the pages come from the cache only
+    data = scrape_worlds([1994], base_url = base_url, cache = cache, offline = True, rate = 0)
+    pd.testing.assert_frame_equal(data, expected)
+
+
+def test_unreachable(tmp_path) :
+    # a failing shard is reported and left incomplete, the run goes on
+    data_file = tmp_path / "raw_magic.csv"
+    added = scrape_incremental(data_file, [1994], base_url = UNREACHABLE_URL, rate = 0, retries = 0)
+    assert added == 0
+    assert not Manifest(data_file.with_suffix(".manifest.json")).is_complete(1994)
+
+
+def test_missing_deck_page(tmp_path) :
+    # a deck page answered with a 404 is not recorded, and its shard is walked again on the next run
+    fixtures = tmp_path / "fixtures"
+    shutil.copytree(FIXTURES_DIR, fixtures)
+    (fixtures / "deck_10002.html").rename(tmp_path / "deck_10002.html")
+    data_file = tmp_path / "raw_magic.csv"
+    manifest_file = data_file.with_suffix(".manifest.json")
+    with FixtureServer(fixtures) as server :
+        assert scrape_incremental(data_file, [1994], base_url = server.base_url, rate = 0, retries = 0) == 3
+        assert not Manifest(manifest_file).is_complete(1994)
+        assert pd.read_csv(data_file)[["LANDS", "CREATURES"]].notna().all().all()
+        (tmp_path / "deck_10002.html").rename(fixtures / "deck_10002.html")
+        assert scrape_incremental(data_file, [1994], base_url = server.base_url, rate = 0, retries = 0) == 1
+        assert server.hits["/event"] == 4 + 1
+    assert Manifest(manifest_file).is_complete(1994)
+    assert len(pd.read_csv(data_file)) == 4
+
+
+def test_deleted_data_file(tmp_path) :
+    # the manifest of a deleted raw_magic.csv is not trusted
+    data_file = tmp_path / "raw_magic.csv"
+    with FixtureServer() as server :
+        assert scrape_incremental(data_file, [1994], base_url = server.base_url, rate = 0) == 4
+        data_file.unlink()
+        assert scrape_incremental(data_file, [1994], base_url = server.base_url, rate = 0) == 4
+    assert len(pd.read_csv(data_file)) == 4
+
+
+def test_complete_without_decks(tmp_path) :
+    # the Worlds of 1995 have no decks: no file is written, and the shard is not walked again
+    data_file = tmp_path / "raw_magic.csv"
+    with FixtureServer() as server :
+        assert scrape_incremental(data_file, [1995], base_url = server.base_url, rate = 0) == 0
+        requests = sum(server.hits.values())
+        assert scrape_incremental(data_file, [1995], base_url = server.base_url, rate = 0) == 0
+        assert sum(server.hits.values()) == requests
+    assert not data_file.exists()
@@ -0,0 +1,79 @@
+"""The queries of the service, from Python and over HTTP."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from mtg import stats
+from mtg.datasets import CARD_COUNTS, CLEAN_FILE
+from mtg.service import QueryService, create_app
+
+
+@pytest.fixture(scope = "module")
+def data() :
+    return pd.read_csv(CLEAN_FILE, parse_dates = ["Date"])
+
+
+@pytest.fixture
+def service(data) :
+    return QueryService(data, cache_size = 8)
+
+
+def test_select(data, service) :
+    years = data["Date"].dt.year
+    selected = service.select([("Year", [2010, "2011"]), ("Rank", ["1"])])
+    expected = data[years.isin([2010, 2011]) & (data["Rank"] == 1)]
+    assert list(selected.index) == list(expected.index)
+    assert len(service.select([("Deck", ["No such deck"])])) == 0
+    assert len(service.select()) == len(data)
+
+
+def test_queries(data, service) :
+    answer = service.query("means", {"Rank" : [1]})
+    champions = data[data["Rank"] == 1]
+    means = champions.groupby(champions["Date"].dt.year)[CARD_COUNTS].mean()
+    assert answer["decks"] == len(champions)
+    rows = pd.DataFrame(answer["rows"])
+    assert list(rows["Year"]) == list(means.index)
+    np.testing.assert_allclose(rows[CARD_COUNTS].to_numpy(float), means.to_numpy(float))
+    assert service.query("champions", limit = 3)["decks"] == len(champions)
+    assert len(service.query("champions", limit = 3)["rows"]) == 3
+    welch = service.query("tests/welch", {"Year" : ["2010"]})
+    expected = stats.welch(data[data["Date"].dt.year == 2010])
+    # a NaN statistic is null in JSON
+    np.testing.assert_allclose(pd.DataFrame(welch["rows"])["T"].to_numpy(float), expected["T"])
+
+
+def test_cache(service) :
+    first = service.query("variances", {"Year" : ["2011", "2010"], "Rank" : []})
+    # the same query, filters in another order
+    assert service.query("variances", {"Year" : [2010, 2011]}) is first
+    info = service.info()
+    assert info["cache"]["hits"] == 1 and info["cache"]["misses"] == 1
+    service.load(service.data.drop(columns = "Year"))
+    assert service.info()["cache"]["size"] == 0
+
+
+def test_errors(service) :
+    with pytest.raises(ValueError, match = "query must be one of") :
+        service.query("medians")
+    with pytest.raises(ValueError, match = "cannot group by") :
+        service.query("means", by = ["Color"])
+    with pytest.raises(ValueError, match = "selected by") :
+        service.select([("Player", ["Zak Dolan"])])
+    with pytest.raises(ValueError, match = "not loaded from a data directory") :
+        service.reload()
+
+
+def test_app(service) :
+    pytest.importorskip("flask")
+    client = create_app(service).test_client()
+    answer = client.get("/means?by=Rank&year=2010&year=2011")
+    assert answer.status_code == 200
+    assert [row["Rank"] for row in answer.get_json()["rows"]] == [1, 2, 3, 4]
+    assert client.get("/tests/anova?by=Year").get_json()["rows"][0]["Type"] == sorted(CARD_COUNTS)[0]
+    assert client.get("/info").get_json()["cache"]["misses"] == 2
+    for url in ["/tests/kruskal", "/means?by=Color"] :
+        answer = client.get(url)
+        assert answer.status_code == 400 and "error" in answer.get_json()
+    assert client.post("/reload").status_code == 400
@@ -0,0 +1,68 @@
+"""The MinHash index against the exact (multiset) Jaccard similarity."""
+
+import numpy as np
+import pytest
+
+from mtg.cards import CardBuffer
+from mtg.similarity import SimilarityIndex
+
+
+def jaccard(first, second) :
+    cards = set(first) | set(second)
+    common = sum(min(first.get(card, 0), second.get(card, 0)) for card in cards)
+    return common / sum(max(first.get(card, 0), second.get(card, 0)) for card in cards)
+
+
+@pytest.fixture(scope = "module")
+def decks() :
+    """Three families of 20 decks: a core of 12 cards of the family, 3 cards drawn at random."""
+    generator = np.random.default_rng(0)
+    decks = {}
+    for family in range(3) :
+        for number in range(20) :
+            decklist = {f"core {family}-{card}" : 4 for card in range(12)}
+            for card in generator.choice(100, 3, replace = False) :
+                decklist[f"flex {card}"] = int(generator.integers(1, 5))
+            decks[f"{family}{number:02d}"] = decklist
+    decks["empty"] = {}
+    return decks
+
+
+@pytest.fixture(scope = "module")
+def index(decks) :
+    buffer = CardBuffer()
+    for deck_id, decklist in decks.items() :
+        buffer.append("2021", 1, deck_id, [("md", copies, card) for card, copies in decklist.items()])
+    return SimilarityIndex(buffer.to_matrix())
+
+
+def test_estimated_jaccard(decks, index) :
+    ids = list(decks)[:-1]
+    generator = np.random.default_rng(1)
+    first, second = generator.choice(len(ids), (2, 200))
+    estimated = index.estimated_similarity(first, second)
+    exact = np.array([jaccard(decks[ids[i]], decks[ids[j]]) for i, j in zip(first, second)])
+    # the standard error of 128 hash functions is at most 0.045
+    assert np.abs(estimated - exact).max() < 0.2
+    assert np.abs(estimated - exact).mean() < 0.05
+
+
+def test_query(decks, index) :
+    exhaustive = index.query("005", k = 5, exhaustive = True)
+    assert "005" not in set(exhaustive["deck_id"])
+    assert all(deck.startswith("0") for deck in exhaustive["deck_id"])
+    # the candidates of the buckets hold the nearest decks
+    lsh = index.query("005", k = 5)
+    assert list(lsh["deck_id"]) == list(exhaustive["deck_id"])
+    np.testing.assert_allclose(lsh["Similarity"], exhaustive["Similarity"])
+    # a decklist, with a card never seen
+    decklist = dict(decks["105"], **{"Unknown card" : 1})
+    assert index.query(decklist, k = 1)["deck_id"].iat[0] == "105"
+
+
+def test_archetypes(decks, index) :
+    labels = index.archetypes(threshold = 0.5)
+    assert labels[-1] == -1
+    families = [labels[number * 20 : (number + 1) * 20] for number in range(3)]
+    assert all(len(set(family)) == 1 for family in families)
+    assert len({family[0] for family in families}) == 3
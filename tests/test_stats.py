@@ -0,0 +1,59 @@
+"""The batched tests against scipy, group by group."""
+
+import numpy as np
+import pandas as pd
+import pytest
+import scipy.stats as ss
+
+from mtg import stats
+from mtg.datasets import CARD_COUNTS, CLEAN_FILE
+
+
+@pytest.fixture(scope = "module")
+def data() :
+    data = pd.read_csv(CLEAN_FILE, parse_dates = ["Date"])
+    return data.assign(Era = np.where(data["Date"].dt.year < 2008, "old", "new"))
+
+
+def groups(data, by) :
+    return data.groupby(by) if by else [(None, data)]
+
+
+@pytest.mark.parametrize("by", [None, ["Era"]])
+def test_anova(data, by) :
+    table = stats.anova(data, by = by).set_index((by or []) + ["Type"])
+    for key, group in groups(data, by) :
+        for card_type in CARD_COUNTS :
+            f_val, p_val = ss.f_oneway(*stats.rank_groups(group, card_type))
+            row = table.loc[tuple(key) + (card_type,) if by else card_type]
+            assert row["F"] == pytest.approx(f_val) and row["p"] == pytest.approx(p_val)
+
+
+@pytest.mark.parametrize("by", [None, ["Era"]])
+def test_welch(data, by) :
+    table = stats.welch(data, by = by).set_index((by or []) + ["Type", "Rank", "Other_rank"])
+    for key, group in groups(data, by) :
+        for card_type in CARD_COUNTS :
+            samples = stats.rank_groups(group, card_type)
+            for first, second in [(0, 1), (0, 3), (2, 3)] :
+                t_val, p_val = ss.ttest_ind(samples[first], samples[second], equal_var = False)
+                index = (card_type, stats.RANKS[first], stats.RANKS[second])
+                row = table.loc[tuple(key) + index if by else index]
+                assert row["T"] == pytest.approx(t_val) and row["p"] == pytest.approx(p_val)
+
+
+def test_normality(data) :
+    table = stats.normality(data).set_index(["Type", "Rank"])
+    for card_type in CARD_COUNTS :
+        for rank, sample in zip(stats.RANKS, stats.rank_groups(data, card_type)) :
+            w_val, p_val = ss.shapiro(sample)
+            assert table.loc[(card_type, rank), "W"] == pytest.approx(w_val, rel = 1e-6)
+            assert table.loc[(card_type, rank), "p"] == pytest.approx(p_val, rel = 1e-5)
+
+
+def test_tests_table(data) :
+    table = stats.tests(data)
+    assert list(table["Type"].unique()) == sorted(CARD_COUNTS)
+    assert set(table["Test"]) == {"ANOVA", "Shapiro-Wilk", "Welch"}
+    welch = table[table["Test"] == "Welch"].reset_index(drop = True)
+    np.testing.assert_allclose(welch["Statistic"], stats.welch(data)["T"])
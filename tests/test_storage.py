@@ -0,0 +1,45 @@
+"""The typed columnar storage of the data sets."""
+
+import numpy as np
+import pandas as pd
+
+from mtg.datasets import CARD_COUNTS, CLEAN_FILE, RAW_FILE
+from mtg.storage import load_csv_table, load_table, read_schema, save_table
+
+
+def test_round_trip(tmp_path) :
+    data = pd.read_csv(CLEAN_FILE, parse_dates = ["Date"])
+    save_table(data, tmp_path / "magic", categories = ["Rank", "Event", "Deck"])
+    loaded = load_table(tmp_path / "magic")
+    # the rows come back in their order, the whole numbers (the counts) as int64
+    expected = data.astype({"Rank" : "category", "Event" : "category", "Deck" : "category"})
+    expected[CARD_COUNTS] = expected[CARD_COUNTS].astype(np.int64)
+    pd.testing.assert_frame_equal(loaded, expected, check_categorical = False)
+    assert (loaded["Lands"] ** 2).max() == (data["Lands"] ** 2).max()
+    assert read_schema(tmp_path / "magic")["sorted_by"] == "Date"
+
+
+def test_date_range(tmp_path) :
+    # rows out of date order
+    data = pd.read_csv(CLEAN_FILE, parse_dates = ["Date"]).sample(frac = 1, random_state = 0).reset_index(drop = True)
+    save_table(data, tmp_path / "magic")
+    selected = load_table(tmp_path / "magic", columns = ["Player", "Date", "Lands"], start = "2000-01-01",
+                          end = "2004-12-31")
+    expected = data.loc[data["Date"].between("2000-01-01", "2004-12-31"), ["Player", "Date", "Lands"]]
+    expected["Lands"] = expected["Lands"].astype(np.int64)
+    pd.testing.assert_frame_equal(selected, expected.reset_index(drop = True))
+
+
+def test_csv_table(tmp_path) :
+    # the raw data set has missing counts: they stay float64
+    csv_file = tmp_path / "raw_magic.csv"
+    csv_file.write_bytes(RAW_FILE.read_bytes())
+    raw = load_csv_table(csv_file, tmp_path / "raw_magic")
+    expected = pd.read_csv(RAW_FILE)
+    assert raw["Player"].tolist() == expected["Player"].tolist()
+    assert raw["CREATURES"].dtype == np.float64
+    np.testing.assert_array_equal(raw["CREATURES"].to_numpy(), expected["CREATURES"].to_numpy())
+
+    # rows appended to the csv rebuild the copy
+    expected.iloc[:3].to_csv(csv_file, mode = "a", header = False, index = False)
+    assert len(load_csv_table(csv_file, tmp_path / "raw_magic")) == len(expected) + 3
@@ -0,0 +1,35 @@
+"""The running aggregates of the card counts."""
+
+import pandas as pd
+
+from mtg.datasets import CLEAN_FILE, save_clean
+from mtg.manifest import append_rows
+from mtg.trends import TrendEngine
+
+
+def summed(clean_file) :
+    return TrendEngine().update(pd.read_csv(clean_file, parse_dates = ["Date"]))
+
+
+def test_refresh(tmp_path) :
+    data = pd.read_csv(CLEAN_FILE)
+    clean_file = tmp_path / "magic.csv"
+    data.iloc[:60].to_csv(clean_file, index = False)
+    engine = TrendEngine()
+    assert engine.refresh(clean_file) == 60
+    assert engine.refresh(clean_file) == 0
+
+    # appended rows only are read
+    append_rows(clean_file, data.iloc[60:])
+    assert engine.refresh(clean_file) == len(data) - 60
+    pd.testing.assert_frame_equal(engine.means("Year"), summed(clean_file).means("Year"))
+
+    # a rewrite changing a single count in the middle, keeping the size of the file
+    data.loc[30, "Lands"] = 30 if data.loc[30, "Lands"] != 30 else 31
+    save_clean(data, tmp_path)
+    assert engine.refresh(clean_file) == len(data)
+    pd.testing.assert_frame_equal(engine.means("Year"), summed(clean_file).means("Year"))
+
+    # the state survives a save
+    engine.save(tmp_path / "trends.json")
+    assert TrendEngine.load(tmp_path / "trends.json").refresh(clean_file) == 0
@@ -0,0 +1,76 @@
+"""The checks of the data sets against their schema."""
+
+import numpy as np
+import pandas as pd
+
+from mtg.datasets import CLEAN_FILE
+from mtg.validation import CLEAN_SCHEMA, EVENTS_SCHEMA, REPORT_COLUMNS, validate
+
+
+def events(ranks, event = "Worlds", date = "2010-08-01", counts = (24.0, 12.0, 10.0, 14.0)) :
+    return pd.DataFrame({"Deck" : "Jund", "Player" : [f"Player {number}" for number in range(len(ranks))],
+                         "Event" : event, "Rank" : ranks, "Date" : pd.Timestamp(date),
+                         "LANDS" : counts[0], "CREATURES" : counts[1], "INSTANTS_and_SORC." : counts[2],
+                         "OTHER_SPELLS" : counts[3]})
+
+
+def checks(report) :
+    return sorted(report["Check"])
+
+
+def test_valid() :
+    # a range of ranks holds all of its places
+    assert len(validate(events(["1", "2", "3-4"]), EVENTS_SCHEMA)) == 0
+    assert len(validate(events(["1", "2", "3", "4", "5-8"]), EVENTS_SCHEMA)) == 0
+    report = validate(events([]), EVENTS_SCHEMA)
+    assert list(report.columns) == REPORT_COLUMNS and len(report) == 0
+
+
+def test_shared_rank() :
+    # the 3rd and 4th places both reported as 3-4: both places are held twice
+    report = validate(events(["1", "2", "3-4", "3-4"]), EVENTS_SCHEMA)
+    assert checks(report) == ["duplicate_rank", "duplicate_rank"]
+    assert report[["Value", "Count"]].values.tolist() == [[3, 2], [4, 2]]
+
+
+def test_ranks() :
+    data = pd.concat([events(["1", "2", "3-4", "Other"]),
+                      events(["1", "1", "3", "4"], event = "Nationals", date = "2011-06-01")], ignore_index = True)
+    report = validate(data, EVENTS_SCHEMA)
+    assert checks(report) == ["duplicate_rank", "missing_rank", "rank_value"]
+    wrong = report[report["Check"] == "rank_value"].iloc[0]
+    assert (wrong["Row"], wrong["Value"]) == (3, "Other")
+    duplicate = report[report["Check"] == "duplicate_rank"].iloc[0]
+    assert (duplicate["Event"], duplicate["Value"], duplicate["Count"]) == ("Nationals", 1, 2)
+    missing = report[report["Check"] == "missing_rank"].iloc[0]
+    assert (missing["Event"], missing["Value"], missing["Count"]) == ("Nationals", 2, 0)
+
+
+def test_values_and_counts() :
+    data = events(["1", "2", "3", "4"])
+    data.loc[1, "Player"] = None
+    data.loc[2, "CREATURES"] = -1
+    data.loc[3, "LANDS"] = 20.5
+    report = validate(data, EVENTS_SCHEMA)
+    assert checks(report) == ["card_count", "card_count", "deck_size", "deck_size", "missing_value"]
+    assert report.loc[report["Check"] == "missing_value", ["Row", "Column"]].values.tolist() == [[1, "Player"]]
+    counts = report[report["Check"] == "card_count"]
+    assert counts[["Row", "Column", "Value"]].values.tolist() == [[2, "CREATURES", -1.0], [3, "LANDS", 20.5]]
+    assert list(report.loc[report["Check"] == "deck_size", "Value"]) == [47.0, 56.5]
+
+
+def test_missing_columns() :
+    report = validate(events(["1", "2", "3", "4"]).drop(columns = ["Rank", "OTHER_SPELLS"]), EVENTS_SCHEMA)
+    missing = report[report["Check"] == "missing_column"]
+    assert list(missing["Column"]) == ["Rank", "OTHER_SPELLS"]
+    # the deck sizes are checked on the counts left
+    assert set(report["Check"]) == {"missing_column", "deck_size"}
+
+
+def test_clean_data_set() :
+    data = pd.read_csv(CLEAN_FILE, parse_dates = ["Date"])
+    report = validate(data, CLEAN_SCHEMA)
+    # a single event of the data set has no 4th place
+    assert checks(report) == ["missing_rank"]
+    assert report["Value"].iat[0] == 4
+    assert np.isin(report["Event"], data["Event"]).all()